@@ -233,6 +233,7 @@ PAGES = [
         'page': 'layers/normalization.md',
         'classes': [
             layers.BatchNormalization,
+            layers.LRN,
         ],
     },
     {
@@ -332,10 +333,14 @@ PAGES = [
                       utils.get_file,
                       utils.print_summary,
                       utils.plot_model,
-                      utils.multi_gpu_model],
+                      utils.multi_gpu_model,
+                      utils.fold_batch_normalization,
+                      utils.optimize_for_inference,
+                      utils.quantize_model],
         'classes': [utils.CustomObjectScope,
                     utils.HDF5Matrix,
-                    utils.Sequence],
+                    utils.Sequence,
+                    utils.BucketedSequence],
     },
 ]
 
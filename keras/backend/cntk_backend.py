@@ -2395,6 +2395,17 @@ def slice(x, start, size):
     raise NotImplementedError
 
 
+def count_sketch_matrix(h, s, d=16000):
+    # Dense (n, d) projection: row `i` holds `s[i]` in the column `h[i]`.
+    return C.element_times(C.one_hot(h, d), C.reshape(s, (-1, 1)))
+
+
+def count_sketch(h, s, x, d=16000, sketch_matrix=None):
+    if sketch_matrix is None:
+        sketch_matrix = count_sketch_matrix(h, s, d)
+    return dot(x, sketch_matrix)
+
+
 def _reshape_batch(x, shape):
     # there is a bug in cntk 2.1's unpack_batch implementation
     if hasattr(C, 'unpack_batch') and _get_cntk_version() >= 2.2:
@@ -219,3 +219,38 @@ def image_dim_ordering():
         return 'th'
     else:
         return 'tf'
+
+
+def _strip_rnn_states(step_function, initial_states, positions):
+    """Removes some states from the loop of `rnn`.
+
+    # Arguments
+        step_function: Step function of `rnn`.
+        initial_states: List of initial states of `rnn`.
+        positions: Positions of the states to remove.
+
+    # Returns
+        A tuple `(step_function, initial_states, restore_states)`. The step
+        function and the initial states run the loop without the removed
+        states: the original step function receives their initial values at
+        every timestep. `restore_states` inserts the initial values of the
+        removed states back into a list of states.
+    """
+    positions = set(positions)
+    fixed_states = dict((i, initial_states[i]) for i in positions)
+    kept_states = [state for i, state in enumerate(initial_states) if i not in positions]
+    num_states = len(initial_states)
+    num_kept_states = len(kept_states)
+
+    def restore_states(states):
+        states = iter(states)
+        return [fixed_states[i] if i in positions else next(states)
+                for i in range(num_states)]
+
+    def _step_function(inputs, states):
+        states = list(states)
+        all_states = restore_states(states[:num_kept_states]) + states[num_kept_states:]
+        outputs, new_states = step_function(inputs, all_states)
+        return outputs, [state for i, state in enumerate(new_states) if i not in positions]
+
+    return _step_function, kept_states, restore_states
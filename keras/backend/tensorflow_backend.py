@@ -21,6 +21,7 @@ import os
 from .common import floatx
 from .common import epsilon
 from .common import normalize_data_format
+from .common import _strip_rnn_states
 from ..utils.generic_utils import transpose_shape
 from ..utils.generic_utils import has_arg
 
@@ -1244,6 +1245,68 @@ def dot_product(x, kernel):
     return squeeze(dot(x, expand_dims(kernel)), axis=-1)
 
 
+def split_heads(x, n_heads):
+    """Splits the last axis of a 3D tensor into heads stacked along the batch axis.
+
+    Equivalent to concatenating along the first axis the `n_heads` slices
+    of the last axis, but with a single reshape and transposition.
+
+    # Arguments
+        x: Tensor of shape `(batch_size, timesteps, n_heads * dim)`.
+        n_heads: Number of heads.
+
+    # Returns
+        A tensor of shape `(n_heads * batch_size, timesteps, dim)`, where the
+        head `i` of the sample `n` is at the index `i * batch_size + n`.
+    """
+    x_shape = tf.shape(x)
+    head_dim = int_shape(x)[-1]
+    head_dim = x_shape[2] // n_heads if head_dim is None else head_dim // n_heads
+    x = tf.reshape(x, [x_shape[0], x_shape[1], n_heads, head_dim])
+    x = tf.transpose(x, (2, 0, 1, 3))
+    return tf.reshape(x, [n_heads * x_shape[0], x_shape[1], head_dim])
+
+
+def merge_heads(x, n_heads):
+    """Inverse of `split_heads`.
+
+    # Arguments
+        x: Tensor of shape `(n_heads * batch_size, timesteps, dim)`.
+        n_heads: Number of heads.
+
+    # Returns
+        A tensor of shape `(batch_size, timesteps, n_heads * dim)`.
+    """
+    x_shape = tf.shape(x)
+    head_dim = int_shape(x)[-1]
+    head_dim = x_shape[2] if head_dim is None else head_dim
+    x = tf.reshape(x, [n_heads, x_shape[0] // n_heads, x_shape[1], head_dim])
+    x = tf.transpose(x, (1, 2, 0, 3))
+    return tf.reshape(x, [x_shape[0] // n_heads, x_shape[1], n_heads * head_dim])
+
+
+def sparse_matmul(x, indices, values, dense_shape):
+    """Multiplies a 2D tensor by a sparse matrix given by its nonzero values.
+
+    # Arguments
+        x: Tensor of shape `(batch_size, m)`.
+        indices: Numpy integer array of shape `(nnz, 2)` with the (row,
+            column) positions of the nonzero values, sorted by row and then
+            by column.
+        values: Tensor of shape `(nnz,)` with the nonzero values.
+        dense_shape: Tuple `(m, n)`, shape of the sparse matrix.
+
+    # Returns
+        A tensor of shape `(batch_size, n)`.
+    """
+    matrix = tf.SparseTensor(np.asarray(indices, dtype='int64'), values,
+                             dense_shape=dense_shape)
+    # (x . M)^T = M^T . x^T
+    return tf.transpose(tf.sparse_tensor_dense_matmul(matrix, x,
+                                                      adjoint_a=True,
+                                                      adjoint_b=True))
+
+
 def transpose(x):
     """Transposes a tensor and returns it.
 
@@ -1292,6 +1355,59 @@ def gather(reference, indices):
     return tf.nn.embedding_lookup(reference, indices)
 
 
+def fft(x, norm=None):
+    """Fast fourier transform:
+       Compute an n-point fft of frames along given axis.
+
+    # Arguments
+        x: Real tensor of shape `(batch_size, n)`.
+        norm: `None` (unnormalized forward transform) or `'ortho'`.
+
+    # Returns
+        The non-negative frequency terms of the transform, a complex tensor
+        of shape `(batch_size, n // 2 + 1)`.
+    """
+    x_fft = tf.spectral.rfft(tf.cast(x, tf.float32))
+    if norm == 'ortho':
+        x_fft /= tf.sqrt(tf.cast(tf.shape(x)[-1], tf.complex64))
+    return x_fft
+
+
+def ifft(x, norm=None, is_odd=False):
+    """Inverse fast fourier transform
+
+    # Arguments
+        x: Transform returned by `fft` (or a product of them, see
+            `complex_multiply`).
+        norm: `None` (the inverse is normalized by `1 / n`) or `'ortho'`.
+        is_odd: Whether the length `n` of the real signal is odd.
+
+    # Returns
+        The real signal, of shape `(batch_size, n)`.
+    """
+    n = 2 * (tf.shape(x)[-1] - 1) + int(is_odd)
+    x_ifft = tf.spectral.irfft(x, fft_length=tf.expand_dims(n, 0))
+    if norm == 'ortho':
+        x_ifft *= tf.sqrt(tf.cast(n, tf.float32))
+    return x_ifft
+
+
+def complex_multiply(x, y):
+    """Elementwise product of two transforms returned by `fft`.
+
+    The product of the transforms of two signals is the transform of their
+    circular convolution.
+
+    # Arguments
+        x: Complex tensor.
+        y: Complex tensor.
+
+    # Returns
+        The product of `x` and `y`.
+    """
+    return x * y
+
+
 # ELEMENT-WISE OPERATIONS
 
 
@@ -1989,6 +2105,53 @@ def batch_normalization(x, mean, var, beta, gamma, axis=-1, epsilon=1e-3):
     return tf.nn.batch_normalization(x, mean, var, beta, gamma, epsilon)
 
 
+def local_response_normalization(x, alpha=1e-4, k=1., beta=0.75, n=5,
+                                 data_format=None):
+    """Local response normalization across channels.
+
+    Each value is divided by `(k + alpha / n * sum(x_i ** 2)) ** beta`, where
+    the sum runs over the `n` channels centered on its own one (zero padded
+    at the borders), as in Caffe.
+
+    # Arguments
+        x: 4D tensor.
+        alpha: Scaling parameter.
+        k: Offset of the scale.
+        beta: Exponent.
+        n: Number of channels of the local regions.
+        data_format: string, `"channels_last"` or `"channels_first"`.
+
+    # Returns
+        A tensor with the same shape as `x`.
+
+    # Raises
+        ValueError: if `data_format` is neither `channels_last` or `channels_first`.
+    """
+    data_format = normalize_data_format(data_format)
+    if data_format == 'channels_first':
+        x = tf.transpose(x, (0, 2, 3, 1))
+    if n % 2 == 1:
+        # Native op, with symmetric windows
+        y = tf.nn.local_response_normalization(x, depth_radius=n // 2,
+                                               bias=k, alpha=alpha / n,
+                                               beta=beta)
+    else:
+        # Sum of the squares over the channel windows with a single
+        # convolution of a ones kernel, with the channels as the columns of
+        # a one-channel image.
+        half_n = n // 2
+        x_shape = tf.shape(x)
+        x_sqr = tf.reshape(tf.square(x), (x_shape[0], -1, x_shape[3], 1))
+        x_sqr = tf.pad(x_sqr, [[0, 0], [0, 0], [half_n, n - 1 - half_n], [0, 0]])
+        window_sum = tf.nn.conv2d(x_sqr, tf.ones((1, n, 1, 1), dtype=x.dtype),
+                                  strides=(1, 1, 1, 1), padding='VALID')
+        window_sum = tf.reshape(window_sum, x_shape)
+        y = x / (k + alpha / n * window_sum) ** beta
+    if data_format == 'channels_first':
+        y = tf.transpose(y, (0, 3, 1, 2))
+    return y
+
+
 # SHAPE OPERATIONS
 
 def concatenate(tensors, axis=-1):
@@ -2734,6 +2897,34 @@ class Function(object):
         self._feed_symbols = None
         self._symbol_vals = None
         self._session = None
+        # Identity aliases of the fetched tensors that are also fed
+        # (e.g. the `preprocessed_input` of the optimized conditional
+        # models, which is both an input and an output of the model).
+        self._fetch_aliases = {}
+        # Set to True if the callable could not be created for this graph.
+        self._use_legacy_call = False
+
+    def _get_fetch(self, x, fed_names):
+        """Returns a tensor that can be fetched along with `fed_names`.
+
+        `Session._make_callable_from_options` refuses to fetch a tensor
+        that is also fed. In that case, an `identity` of the tensor is
+        fetched instead. Aliases are cached, so the graph does not grow
+        when the callable is refreshed.
+
+        # Arguments
+            x: Tensor to fetch.
+            fed_names: Set with the names of the fed tensors.
+
+        # Returns
+            `x` or an identity alias of `x`.
+        """
+        if x.name not in fed_names:
+            return x
+        if x.name not in self._fetch_aliases:
+            with x.graph.as_default():
+                self._fetch_aliases[x.name] = tf.identity(x)
+        return self._fetch_aliases[x.name]
 
     def _make_callable(self, feed_arrays, feed_symbols, symbol_vals, session):
         """Generates a callable that runs the graph.
@@ -2768,8 +2959,10 @@ class Function(object):
             connection.from_tensor = from_tensor.name  # Data tensor
             connection.to_tensor = x.name  # Placeholder
         # Handle fetches.
+        fed_names = set(callable_opts.feed)
+        fed_names.update(x.name for x in feed_symbols)
         for x in self.outputs + self.fetches:
-            callable_opts.fetch.append(x.name)
+            callable_opts.fetch.append(self._get_fetch(x, fed_names).name)
         # Handle updates.
         callable_opts.target.append(self.updates_op.name)
         # Create callable.
@@ -2818,10 +3011,19 @@ class Function(object):
                 symbol_vals != self._symbol_vals or
                 feed_symbols != self._feed_symbols or
                 session != self._session):
-            self._make_callable(feed_arrays,
-                                feed_symbols,
-                                symbol_vals,
-                                session)
+            try:
+                self._make_callable(feed_arrays,
+                                    feed_symbols,
+                                    symbol_vals,
+                                    session)
+            except (tf.errors.InvalidArgumentError, ValueError):
+                if feed_symbols:
+                    raise
+                # The graph cannot be run through a callable:
+                # fall back to `session.run` from now on.
+                self._callable_fn = None
+                self._use_legacy_call = True
+                return self._legacy_call(inputs)
         fetched = self._callable_fn(*array_vals)
         return fetched[:len(self.outputs)]
 
@@ -2844,25 +3046,26 @@ class Function(object):
         return updated[:len(self.outputs)]
 
     def __call__(self, inputs):
-        return self._legacy_call(inputs)
-        # TODO: Here we must rely on the legacy_call for optimized_cond models. Otherwise, the error
-        # "tensorflow.python.framework.errors_impl.InvalidArgumentError: preprocessed_input:0 is both fed and fetched." is raised
-        #
-        # if hasattr(get_session(), '_make_callable_from_options'):
-        #     if py_any(is_sparse(x) for x in self.inputs):
-        #         if py_any(is_tensor(x) for x in inputs):
-        #             raise ValueError(
-        #                 'Feeding from symbolic tensors is not '
-        #                 'supported with sparse inputs.')
-        #         return self._legacy_call(inputs)
-        #
-        #     return self._call(inputs)
-        # else:
-        #     if py_any(is_tensor(x) for x in inputs):
-        #         raise ValueError(
-        #             'In order to feed symbolic tensors to a Keras model '
-        #             'in TensorFlow, you need tensorflow 1.8 or higher.')
-        #     return self._legacy_call(inputs)
+        if hasattr(get_session(), '_make_callable_from_options'):
+            if py_any(is_sparse(x) for x in self.inputs):
+                if py_any(is_tensor(x) for x in inputs):
+                    raise ValueError(
+                        'Feeding from symbolic tensors is not '
+                        'supported with sparse inputs.')
+                return self._legacy_call(inputs)
+            if self._use_legacy_call:
+                if py_any(is_tensor(x) for x in inputs):
+                    raise ValueError(
+                        'Feeding from symbolic tensors is not supported '
+                        'by the graph of this function.')
+                return self._legacy_call(inputs)
+            return self._call(inputs)
+        else:
+            if py_any(is_tensor(x) for x in inputs):
+                raise ValueError(
+                    'In order to feed symbolic tensors to a Keras model '
+                    'in TensorFlow, you need tensorflow 1.8 or higher.')
+            return self._legacy_call(inputs)
 
 
 def function(inputs, outputs, updates=None, **kwargs):
@@ -2922,7 +3125,8 @@ def stop_gradient(variables):
 
 def rnn(step_function, inputs, initial_states,
         go_backwards=False, mask=None, constants=None,
-        unroll=False, input_length=None, pos_extra_outputs_states=None):
+        unroll=False, input_length=None, pos_extra_outputs_states=None,
+        accumulate_extra_outputs_states=True):
     """Iterates over the time dimension of a tensor.
 
     # Arguments
@@ -2950,6 +3154,12 @@ def rnn(step_function, inputs, initial_states,
             (`while_loop` or `scan` depending on backend).
         input_length: Static number of timesteps in the input.
         pos_extra_outputs_states: Positions that extra_output_states will have.
+        accumulate_extra_outputs_states: Boolean. If `False`, the states at
+            `pos_extra_outputs_states` are neither carried through the loop
+            nor stacked over the timesteps: the step function receives their
+            initial values at every timestep and they are returned as such.
+            Use it when these states are not needed (e.g. the attention
+            weights of a decoder), to save the memory of their sequences.
 
     # Returns
         A tuple, `(last_output, outputs, new_states)`.
@@ -2968,6 +3178,17 @@ def rnn(step_function, inputs, initial_states,
         ValueError: If `mask` is provided (not `None`)
             but states is not provided (`len(states)` == 0).
     """
+    if pos_extra_outputs_states and not accumulate_extra_outputs_states:
+        step_function, initial_states, restore_states = _strip_rnn_states(
+            step_function, initial_states, pos_extra_outputs_states)
+        last_output, outputs, new_states = rnn(step_function, inputs, initial_states,
+                                               go_backwards=go_backwards,
+                                               mask=mask,
+                                               constants=constants,
+                                               unroll=unroll,
+                                               input_length=input_length)
+        return last_output, outputs, restore_states(new_states)
+
     ndim = len(inputs.get_shape())
     if ndim < 3:
         raise ValueError('Input should be at least 3D.')
@@ -3167,6 +3388,33 @@ def rnn(step_function, inputs, initial_states,
                     ]
                     output_ta_t = output_ta_t.write(time, output)
                     return (time + 1, output_ta_t) + tuple(new_states)
+        elif pos_extra_outputs_states is not None:
+            def _step(time, output_ta_t, states_ta_t, *states):
+                """RNN step function.
+
+                # Arguments
+                    time: Current timestep value.
+                    output_ta_t: TensorArray.
+                    states_ta_t: TensorArray.
+                    *states: List of states.
+
+                # Returns
+                    Tuple: `(time + 1,output_ta_t, states_ta_t) + tuple(new_states)`
+                """
+                current_input = input_ta.read(time)
+                output, new_states = step_function(current_input,
+                                                   tuple(states) +
+                                                   tuple(constants))
+                if getattr(output, '_uses_learning_phase', False):
+                    global uses_learning_phase
+                    uses_learning_phase = True
+                for state, new_state in zip(states, new_states):
+                    new_state.set_shape(state.get_shape())
+                for i in pos_extra_outputs_states:
+                    states_ta_t[i - (len(states) - len(pos_extra_outputs_states))] = \
+                        states_ta_t[i - (len(states) - len(pos_extra_outputs_states))].write(time, new_states[i])
+                output_ta_t = output_ta_t.write(time, output)
+                return (time + 1, output_ta_t, states_ta_t) + tuple(new_states)
         else:
             def _step(time, output_ta_t, *states):
                 """RNN step function.
@@ -4426,33 +4674,45 @@ def random_multinomial(shape, p=0.0, dtype=None, seed=None):
 
 
 # COUNT SKETCH
-def count_sketch(h, s, x, d=16000):
-    """Count sketch operator.
+def count_sketch_matrix(h, s, d=16000):
+    """Sparse projection matrix of the count sketch operator.
     See https://arxiv.org/abs/1606.01847.
 
     # Arguments
         h: Count sketch vector h \in \{1, d\} ^n
         s: Count sketch vector s \in \{-1, 1\} ^n
-        x: Count sketch input vector
         d: Compact Bilinear dimension
+
+    # Returns
+        A `SparseTensor` of shape `(n, d)`, whose row `i` holds `s[i]` in
+        the column `h[i]`.
     """
-    print('count_sketch is not implemented in the tensorflow backend')
-    pass
+    n = tf.shape(h, out_type=tf.int64)[0]
+    indices = tf.stack([tf.range(n), tf.cast(h, tf.int64)], axis=1)
+    return tf.SparseTensor(indices, tf.cast(s, floatx()),
+                           dense_shape=tf.stack([n, d]))
 
 
-def __count_sketch(h, s, v,  # Sequences
-                   y,  # Outputs info
-                   ):
-    """Count sketch utility.
+def count_sketch(h, s, x, d=16000, sketch_matrix=None):
+    """Count sketch operator.
     See https://arxiv.org/abs/1606.01847.
 
+    The whole batch is sketched with a single sparse matrix product.
+
     # Arguments
         h: Count sketch vector h \in \{1, d\} ^n
         s: Count sketch vector s \in \{-1, 1\} ^n
-        v: Count sketch input vector
-        y: Projected output vector
-    """
-    pass
+        x: Count sketch input vector
+        d: Compact Bilinear dimension
+        sketch_matrix: Projection returned by `count_sketch_matrix(h, s, d)`,
+            to avoid building it again.
+    """
+    if sketch_matrix is None:
+        sketch_matrix = count_sketch_matrix(h, s, d)
+    # (x . M)^T = M^T . x^T
+    return tf.transpose(tf.sparse_tensor_dense_matmul(sketch_matrix, x,
+                                                      adjoint_a=True,
+                                                      adjoint_b=True))
 
 
 # 1d Convolution
@@ -3,6 +3,7 @@ from __future__ import division
 from __future__ import print_function
 
 from collections import defaultdict
+from collections import OrderedDict
 from contextlib import contextmanager
 import theano
 from theano import tensor as T
@@ -26,6 +27,7 @@ import numpy as np
 from .common import floatx
 from .common import epsilon
 from .common import normalize_data_format
+from .common import _strip_rnn_states
 from ..utils.generic_utils import transpose_shape
 from ..utils.generic_utils import has_arg
 # Legacy functions
@@ -1023,6 +1025,67 @@ def dot_product(x, kernel):
     return dot(x, kernel)
 
 
+def split_heads(x, n_heads):
+    """Splits the last axis of a 3D tensor into heads stacked along the batch axis.
+
+    Equivalent to concatenating along the first axis the `n_heads` slices
+    of the last axis, but with a single reshape and transposition.
+
+    # Arguments
+        x: Tensor of shape `(batch_size, timesteps, n_heads * dim)`.
+        n_heads: Number of heads.
+
+    # Returns
+        A tensor of shape `(n_heads * batch_size, timesteps, dim)`, where the
+        head `i` of the sample `n` is at the index `i * batch_size + n`.
+    """
+    x_shape = x.shape
+    x = x.reshape((x_shape[0], x_shape[1], n_heads, x_shape[2] // n_heads))
+    x = x.dimshuffle(2, 0, 1, 3)
+    return x.reshape((n_heads * x_shape[0], x_shape[1], x_shape[2] // n_heads))
+
+
+def merge_heads(x, n_heads):
+    """Inverse of `split_heads`.
+
+    # Arguments
+        x: Tensor of shape `(n_heads * batch_size, timesteps, dim)`.
+        n_heads: Number of heads.
+
+    # Returns
+        A tensor of shape `(batch_size, timesteps, n_heads * dim)`.
+    """
+    x_shape = x.shape
+    x = x.reshape((n_heads, x_shape[0] // n_heads, x_shape[1], x_shape[2]))
+    x = x.dimshuffle(1, 2, 0, 3)
+    return x.reshape((x_shape[0] // n_heads, x_shape[1], n_heads * x_shape[2]))
+
+
+def sparse_matmul(x, indices, values, dense_shape):
+    """Multiplies a 2D tensor by a sparse matrix given by its nonzero values.
+
+    # Arguments
+        x: Tensor of shape `(batch_size, m)`.
+        indices: Numpy integer array of shape `(nnz, 2)` with the (row,
+            column) positions of the nonzero values, sorted by row and then
+            by column.
+        values: Tensor of shape `(nnz,)` with the nonzero values.
+        dense_shape: Tuple `(m, n)`, shape of the sparse matrix.
+
+    # Returns
+        A tensor of shape `(batch_size, n)`.
+    """
+    indices = np.asarray(indices)
+    indptr = np.searchsorted(indices[:, 0], np.arange(dense_shape[0] + 1))
+    # The CSR layout of the matrix is the CSC layout of its transpose, and
+    # `structured_dot` has a sparse gradient for the values.
+    matrix_t = th_sparse_module.CSC(values,
+                                    indices[:, 1].astype('int32'),
+                                    indptr.astype('int32'),
+                                    np.asarray(dense_shape[::-1], dtype='int32'))
+    return th_sparse_module.structured_dot(matrix_t, x.T).T
+
+
 def transpose(x):
     """Transposes a tensor and returns it.
 
@@ -1078,16 +1141,55 @@ def gather(reference, indices):
 def fft(x, norm=None):
     """Fast fourier transform:
        Compute an n-point fft of frames along given axis.
+
+    # Arguments
+        x: Real tensor of shape `(batch_size, n)`.
+        norm: `None` (unnormalized forward transform), `'ortho'` or
+            `'no_norm'`.
+
+    # Returns
+        The non-negative frequency terms of the transform, of shape
+        `(batch_size, n // 2 + 1, 2)`: the last axis holds the real and
+        imaginary parts.
     """
     return rfft(x, norm=norm)
 
 
 def ifft(x, norm=None, is_odd=False):
     """Inverse fast fourier transform
+
+    # Arguments
+        x: Transform returned by `fft` (or a product of them, see
+            `complex_multiply`).
+        norm: `None` (the inverse is normalized by `1 / n`), `'ortho'` or
+            `'no_norm'`.
+        is_odd: Whether the length `n` of the real signal is odd.
+
+    # Returns
+        The real signal, of shape `(batch_size, n)`.
     """
     return irfft(x, norm=norm, is_odd=is_odd)
 
 
+def complex_multiply(x, y):
+    """Elementwise product of two transforms returned by `fft`.
+
+    The product of the transforms of two signals is the transform of their
+    circular convolution.
+
+    # Arguments
+        x: Transform, with the real and imaginary parts on the last axis.
+        y: Transform, with the real and imaginary parts on the last axis.
+
+    # Returns
+        The product of `x` and `y`, in the same representation.
+    """
+    x_real, x_imag = x[..., 0], x[..., 1]
+    y_real, y_imag = y[..., 0], y[..., 1]
+    return T.stack([x_real * y_real - x_imag * y_imag,
+                    x_real * y_imag + x_imag * y_real], axis=-1)
+
+
 def real(x):
     """Gets the real part of a complex tensor
     """
@@ -1629,12 +1731,13 @@ def normalize_batch_in_training(x, gamma, beta,
 
     if gamma is None:
         if beta is None:
-            gamma = ones_like(x)
+            # Of size 1 over the reduction axes, over which
+            # `batch_normalization_train` broadcasts its parameters.
+            gamma = T.ones([1 if axis in reduction_axes else x.shape[axis]
+                            for axis in range(x.ndim)], dtype=x.dtype)
         else:
             gamma = ones_like(beta)
     if beta is None:
-        if gamma is None:
-            beta = zeros_like(x)
         beta = zeros_like(gamma)
 
     normed, mean, stdinv = T.nnet.bn.batch_normalization_train(
@@ -1764,6 +1867,55 @@ def _old_batch_normalization(x, mean, var, beta, gamma,
                                          mode='high_mem')
 
 
+def local_response_normalization(x, alpha=1e-4, k=1., beta=0.75, n=5,
+                                 data_format=None):
+    """Local response normalization across channels.
+
+    Each value is divided by `(k + alpha / n * sum(x_i ** 2)) ** beta`, where
+    the sum runs over the `n` channels centered on its own one (zero padded
+    at the borders), as in Caffe.
+
+    # Arguments
+        x: 4D tensor.
+        alpha: Scaling parameter.
+        k: Offset of the scale.
+        beta: Exponent.
+        n: Number of channels of the local regions.
+        data_format: string, `"channels_last"` or `"channels_first"`.
+
+    # Returns
+        A tensor with the same shape as `x`.
+
+    # Raises
+        ValueError: if `data_format` is neither `channels_last` or `channels_first`.
+    """
+    data_format = normalize_data_format(data_format)
+    # Sum of the squares over the channel windows with a single convolution
+    # of a ones kernel, with the channels as the rows (channels_first) or the
+    # columns (channels_last) of a one-channel image per sample.
+    if data_format == 'channels_first':
+        x_sqr = T.reshape(T.sqr(x), (x.shape[0], 1, x.shape[1], -1))
+        kernel_shape = (1, 1, n, 1)
+    else:
+        x_sqr = T.reshape(T.sqr(x), (x.shape[0], 1, -1, x.shape[3]))
+        kernel_shape = (1, 1, 1, n)
+    window_sum = T.nnet.conv2d(x_sqr, T.ones(kernel_shape, dtype=x.dtype),
+                               filter_shape=kernel_shape, border_mode='full')
+    # The full convolution has `n - 1` extra channels: keep the windows
+    # spanning `n // 2` channels before each one and the rest after it.
+    start = n - 1 - n // 2
+    if data_format == 'channels_first':
+        window_sum = window_sum[:, :, start:start + x.shape[1]]
+    else:
+        window_sum = window_sum[:, :, :, start:start + x.shape[3]]
+    window_sum = T.reshape(window_sum, x.shape)
+    scale = (k + alpha / n * window_sum) ** beta
+    y = x / scale
+    if hasattr(x, '_keras_shape'):
+        y._keras_shape = x._keras_shape
+    return y
+
+
 # SHAPE OPERATIONS
 
 def concatenate(tensors, axis=-1):
@@ -2537,6 +2689,59 @@ def function(inputs, outputs, updates=[], **kwargs):
     return Function(inputs, outputs, updates=updates, **kwargs)
 
 
+def stacked_function(inputs, outputs, updates=[], **kwargs):
+    """Instantiates a Keras function running several steps per call.
+
+    The function takes the inputs of all the steps at once, stacked along
+    a new first axis (except the scalar inputs, e.g. the learning phase,
+    which are shared by all the steps). It runs the steps in order, each
+    one seeing the updates of the previous ones, in a `scan` over the
+    stacked inputs, and returns the outputs of all the steps, stacked
+    along a new first axis.
+
+    # Arguments
+        inputs: List of placeholder tensors of one step.
+        outputs: List of output tensors of one step.
+        updates: List of update ops of one step.
+        **kwargs: Passed to `theano.function`.
+
+    # Returns
+        A function taking the list of the stacked input values and
+        returning the list of the stacked output values.
+    """
+    stacked_inputs = []
+    sequences = []
+    step_inputs = []
+    for x in inputs:
+        if x.ndim == 0:
+            stacked_inputs.append(x)
+        else:
+            stacked_x = T.TensorType(x.dtype, (False,) + x.broadcastable)(
+                name=None if x.name is None else x.name + '_stacked')
+            stacked_inputs.append(stacked_x)
+            sequences.append(stacked_x)
+            step_inputs.append(x)
+    unique_variables_to_update = OrderedDict()
+    for v, nv in updates:
+        if v not in unique_variables_to_update:
+            unique_variables_to_update[v] = nv
+    variables_to_update = list(unique_variables_to_update.keys())
+    num_outputs = len(outputs)
+
+    def step(*slices):
+        step_outputs = theano.clone(
+            list(outputs) + list(unique_variables_to_update.values()),
+            replace=dict(zip(step_inputs, slices)))
+        return (step_outputs[:num_outputs],
+                OrderedDict(zip(variables_to_update, step_outputs[num_outputs:])))
+
+    results, scan_updates = theano.scan(step, sequences=sequences)
+    if not isinstance(results, (list, tuple)):
+        results = [results]
+    return Function(stacked_inputs, list(results),
+                    updates=list(scan_updates.items()), **kwargs)
+
+
 def gradients(loss, variables):
     """Return symbolic gradients of one cost with respect to one or more variables.
     """
@@ -2564,7 +2769,8 @@ def stop_gradient(variables):
 
 def rnn(step_function, inputs, initial_states,
         go_backwards=False, mask=None, constants=None,
-        unroll=False, input_length=None, pos_extra_outputs_states=None):
+        unroll=False, input_length=None, pos_extra_outputs_states=None,
+        accumulate_extra_outputs_states=True):
     """Iterates over the time dimension of a tensor.
 
     # Arguments
@@ -2593,6 +2799,12 @@ def rnn(step_function, inputs, initial_states,
         input_length: Static number of timesteps in the input.
             Must be specified if using `unroll`.
         pos_extra_outputs_states: Positions that extra_output_states will have.
+        accumulate_extra_outputs_states: Boolean. If `False`, the states at
+            `pos_extra_outputs_states` are neither carried through the loop
+            nor stacked over the timesteps: the step function receives their
+            initial values at every timestep and they are returned as such.
+            Use it when these states are not needed (e.g. the attention
+            weights of a decoder), to save the memory of their sequences.
 
     # Returns
         A tuple (last_output, outputs, new_states).
@@ -2604,6 +2816,17 @@ def rnn(step_function, inputs, initial_states,
         new_states: List of tensors, latest states returned by
             the step function, of shape `(samples, ...)`.
     """
+    if pos_extra_outputs_states and not accumulate_extra_outputs_states:
+        step_function, initial_states, restore_states = _strip_rnn_states(
+            step_function, initial_states, pos_extra_outputs_states)
+        last_output, outputs, new_states = rnn(step_function, inputs, initial_states,
+                                               go_backwards=go_backwards,
+                                               mask=mask,
+                                               constants=constants,
+                                               unroll=unroll,
+                                               input_length=input_length)
+        return last_output, outputs, restore_states(new_states)
+
     ndim = inputs.ndim
     assert ndim >= 3, 'Input should be at least 3D.'
 
@@ -4132,143 +4355,83 @@ def random_multinomial(shape, p=0.0, dtype=None, seed=None):
 
 
 # COUNT SKETCH
-def count_sketch(h, s, x, d=16000):
-    """Count sketch operator.
+def count_sketch_matrix(h, s, d=16000):
+    """Sparse projection matrix of the count sketch operator.
     See https://arxiv.org/abs/1606.01847.
 
     # Arguments
         h: Count sketch vector h \in \{1, d\} ^n
         s: Count sketch vector s \in \{-1, 1\} ^n
-        x: Count sketch input vector
         d: Compact Bilinear dimension
+
+    # Returns
+        A sparse (CSR) matrix of shape `(n, d)`, whose row `i` holds `s[i]`
+        in the column `h[i]`.
     """
-    rval, updates = theano.scan(fn=__count_sketch,
-                                sequences=[h, s, x.dimshuffle(1, 0)],
-                                outputs_info=T.alloc(0., x.shape[0], d),
-                                non_sequences=[], n_steps=x.shape[1])
-    return rval[-1]  # We are interested only in the last value
+    n = h.shape[0]
+    return th_sparse_module.CSR(T.cast(s, floatx()),
+                                T.cast(h, 'int32'),
+                                T.arange(n + 1, dtype='int32'),
+                                T.cast(T.stack([n, d]), 'int32'))
 
 
-def __count_sketch(h, s, v,  # Sequences
-                   y,  # Outputs info
-                   ):
-    """Count sketch utility.
+def count_sketch(h, s, x, d=16000, sketch_matrix=None):
+    """Count sketch operator.
     See https://arxiv.org/abs/1606.01847.
 
+    The whole batch is sketched with a single sparse matrix product.
+
     # Arguments
         h: Count sketch vector h \in \{1, d\} ^n
         s: Count sketch vector s \in \{-1, 1\} ^n
-        v: Count sketch input vector
-        y: Projected output vector
+        x: Count sketch input vector
+        d: Compact Bilinear dimension
+        sketch_matrix: Projection returned by `count_sketch_matrix(h, s, d)`,
+            to avoid building it again.
     """
-    return T.cast(T.inc_subtensor(y[:, h], T.dot(s, v)), 'float32')
+    if sketch_matrix is None:
+        sketch_matrix = count_sketch_matrix(h, s, d)
+    return th_sparse_module.dot(x, sketch_matrix)
 
 
 # 1d Convolution
-def scan_conv1d(u, v):
+def scan_conv1d(u, v, circular=False):
     """1D convolution over a set of vectors. All inputs will be treated by pairs.
         #x must be equal to #kernel
 
     # Arguments
         u: first set of vectors
         v: second set of vectors
+        circular: whether to compute the circular convolution of each pair
+            (of vectors of the same length) instead of the central part of
+            their linear convolution.
     """
 
-    def __vec_conv(u, v,  # Sequences
-                   w,  # Outputs info
-                   ):
+    def __vec_conv(u, v):
+        if circular:
+            v = T.concatenate([v, v])
+            init_cut = u.shape[0]
+        else:
+            init_cut = u.shape[0] // 2
         u = u.dimshuffle(('x', 0))
         v = v.dimshuffle(('x', 0))
         conv_out = vec_conv(u, v,
                             border_mode='full')
 
-        init_cut = u.shape[1] / 2
         end_cut = init_cut + u.shape[1]
         return conv_out[0, init_cut:end_cut]
 
     conv_out, updates = theano.scan(__vec_conv,
                                     sequences=[u, v],
-                                    outputs_info=T.alloc(0., u.shape[1]),  # , d),
-                                    non_sequences=[], n_steps=u.shape[0])
+                                    n_steps=u.shape[0])
     return conv_out
 
 
-# Theano implementation of CTC
-# Used with permission from Shawn Tan
-# https://github.com/shawntan/
-# Note that TensorFlow's native CTC code is significantly
-# faster than this
-
-
-def ctc_interleave_blanks(Y):
-    Y_ = T.alloc(-1, Y.shape[0] * 2 + 1)
-    Y_ = T.set_subtensor(Y_[T.arange(Y.shape[0]) * 2 + 1], Y)
-    return Y_
-
-
-def ctc_create_skip_idxs(Y):
-    skip_idxs = T.arange((Y.shape[0] - 3) // 2) * 2 + 1
-    non_repeats = T.neq(Y[skip_idxs], Y[skip_idxs + 2])
-    return skip_idxs[non_repeats.nonzero()]
-
-
-def ctc_update_log_p(skip_idxs, zeros, active, log_p_curr, log_p_prev):
-    active_skip_idxs = skip_idxs[(skip_idxs < active).nonzero()]
-    active_next = T.cast(T.minimum(
-        T.maximum(
-            active + 1,
-            T.max(T.concatenate([active_skip_idxs, [-1]])) + 2 + 1
-        ), log_p_curr.shape[0]), 'int32')
-
-    common_factor = T.max(log_p_prev[:active])
-    p_prev = T.exp(log_p_prev[:active] - common_factor)
-    _p_prev = zeros[:active_next]
-    # copy over
-    _p_prev = T.set_subtensor(_p_prev[:active], p_prev)
-    # previous transitions
-    _p_prev = T.inc_subtensor(_p_prev[1:], _p_prev[:-1])
-    # skip transitions
-    _p_prev = T.inc_subtensor(_p_prev[active_skip_idxs + 2], p_prev[active_skip_idxs])
-    updated_log_p_prev = T.log(_p_prev) + common_factor
-
-    log_p_next = T.set_subtensor(
-        zeros[:active_next],
-        log_p_curr[:active_next] + updated_log_p_prev
-    )
-    return active_next, log_p_next
+# Theano implementation of CTC: the forward recursion of Graves et al.
+# (2006) in log space, vectorized over the batch. The backward recursion
+# comes from the automatic differentiation of the scan.
 
 
-def ctc_path_probs(predict, Y, alpha=1e-4):
-    smoothed_predict = (1 - alpha) * predict[:, Y] + alpha * np.float32(1.) / Y.shape[0]
-    L = T.log(smoothed_predict)
-    zeros = T.zeros_like(L[0])
-    log_first = zeros
-
-    f_skip_idxs = ctc_create_skip_idxs(Y)
-    b_skip_idxs = ctc_create_skip_idxs(Y[::-1])  # there should be a shortcut to calculating this
-
-    def step(log_f_curr, log_b_curr, f_active, log_f_prev, b_active, log_b_prev):
-        f_active_next, log_f_next = ctc_update_log_p(f_skip_idxs, zeros, f_active, log_f_curr, log_f_prev)
-        b_active_next, log_b_next = ctc_update_log_p(b_skip_idxs, zeros, b_active, log_b_curr, log_b_prev)
-        return f_active_next, log_f_next, b_active_next, log_b_next
-
-    [f_active, log_f_probs, b_active, log_b_probs], _ = theano.scan(
-        step, sequences=[L, L[::-1, ::-1]], outputs_info=[np.int32(1), log_first, np.int32(1), log_first])
-
-    idxs = T.arange(L.shape[1]).dimshuffle('x', 0)
-    mask = (idxs < f_active.dimshuffle(0, 'x')) & (idxs < b_active.dimshuffle(0, 'x'))[::-1, ::-1]
-    log_probs = log_f_probs + log_b_probs[::-1, ::-1] - L
-    return log_probs, mask
-
-
-def ctc_cost(predict, Y):
-    log_probs, mask = ctc_path_probs(predict, ctc_interleave_blanks(Y))
-    common_factor = T.max(log_probs)
-    total_log_prob = T.log(T.sum(T.exp(log_probs - common_factor)[mask.nonzero()])) + common_factor
-    return -total_log_prob
-
-
-# batchifies original CTC code
 def ctc_batch_cost(y_true, y_pred, input_length, label_length):
     """Runs CTC loss algorithm on each batch element.
 
@@ -4286,20 +4449,61 @@ def ctc_batch_cost(y_true, y_pred, input_length, label_length):
         Tensor with shape (samples,1) containing the
             CTC loss of each element.
     """
-
-    def ctc_step(y_true_step, y_pred_step, input_length_step, label_length_step):
-        y_pred_step = y_pred_step[0: input_length_step[0]]
-        y_true_step = y_true_step[0:label_length_step[0]]
-        return ctc_cost(y_pred_step, y_true_step)
-
-    ret, _ = theano.scan(
-        fn=ctc_step,
-        outputs_info=None,
-        sequences=[y_true, y_pred, input_length, label_length]
-    )
-
-    ret = ret.dimshuffle('x', 0)
-    return ret
+    y_true = T.cast(y_true, 'int32')
+    input_length = T.cast(T.flatten(input_length), 'int32')
+    label_length = T.cast(T.flatten(label_length), 'int32')
+    batch_size = y_pred.shape[0]
+    num_states = 2 * y_true.shape[1] + 1
+    blank = y_pred.shape[2] - 1
+    neg_inf = np.asarray(-1e30, dtype=y_pred.dtype)
+
+    # The labels interleaved with blanks, the blank being the last category.
+    states = T.alloc(blank, batch_size, num_states)
+    states = T.set_subtensor(states[:, 1::2], y_true)
+    # A path can skip the blank between two different labels.
+    skip = T.neq(states[:, 2:], states[:, :-2]) & T.neq(states[:, 2:], blank)
+    skip = T.concatenate([T.zeros_like(skip[:, :2]), skip], axis=1)
+
+    # Log-probability of the category of each state:
+    # `(time_steps, samples, num_states)`.
+    one_hot = T.eq(states.dimshuffle(0, 'x', 1),
+                   T.arange(y_pred.shape[2]).dimshuffle('x', 0, 'x'))
+    log_emit = T.batched_dot(T.log(y_pred + epsilon()),
+                             T.cast(one_hot, y_pred.dtype))
+    log_emit = log_emit.dimshuffle(1, 0, 2)
+
+    def step(log_emit_t, t, log_alpha_prev):
+        padded = T.concatenate([T.alloc(neg_inf, batch_size, 2),
+                                log_alpha_prev], axis=1)
+        paths = T.stack([log_alpha_prev,
+                         padded[:, 1:-1],
+                         T.switch(skip, padded[:, :-2], neg_inf)])
+        max_path = T.max(paths, axis=0)
+        log_alpha = (max_path + T.log(T.sum(T.exp(paths - max_path), axis=0)) +
+                     log_emit_t)
+        # The sequences shorter than `t` keep their last probabilities.
+        return T.switch(T.lt(t, input_length).dimshuffle(0, 'x'),
+                        log_alpha, log_alpha_prev)
+
+    # A virtual step before the first one, with all paths in the first state.
+    log_alpha_init = T.alloc(neg_inf, batch_size, num_states)
+    log_alpha_init = T.set_subtensor(log_alpha_init[:, 0], 0)
+    log_alpha, _ = theano.scan(step,
+                               sequences=[log_emit,
+                                          T.arange(y_pred.shape[1])],
+                               outputs_info=[log_alpha_init])
+    log_alpha = log_alpha[-1]
+
+    # The paths end on the last label or on the blank after it.
+    batch_idxs = T.arange(batch_size)
+    last_state = 2 * label_length
+    ends = T.stack([log_alpha[batch_idxs, last_state],
+                    T.switch(T.gt(label_length, 0),
+                             log_alpha[batch_idxs, last_state - 1],
+                             neg_inf)])
+    max_end = T.max(ends, axis=0)
+    log_prob = max_end + T.log(T.sum(T.exp(ends - max_end), axis=0))
+    return -log_prob.dimshuffle(0, 'x')
 
 
 # HIGH ORDER FUNCTIONS
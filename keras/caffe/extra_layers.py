@@ -1,57 +1,13 @@
-from keras.layers.core import Layer
-import keras.backend as K
+from keras.layers.normalization import LRN
 
 
-class LRN2D(Layer):
+class LRN2D(LRN):
+    """Local Response Normalization across channels, with the defaults of
+    pylearn2 (`k=2`) and over the axis 1 (`channels_first`) as the
+    converted Caffe models expect. See `keras.layers.LRN`.
     """
-    This code is adapted from pylearn2.
-    License at: https://github.com/lisa-lab/pylearn2/blob/master/LICENSE.txt
-    """
-
-    def __init__(self, alpha=1e-4, k=2, beta=0.75, n=5, **kwargs):
-        super(LRN2D, self).__init__(**kwargs)
-        self.alpha = alpha
-        self.k = k
-        self.beta = beta
-        self.n = n
-        if n % 2 == 0:
-            raise NotImplementedError("Only works with odd n")
-
-    def call(self, x, mask=None):
-        import theano.tensor as T
-        X = x
-        input_dim = X.shape
-        half_n = self.n // 2
-        input_sqr = K.sqr(X)
-        b, ch, r, c = input_dim
-        extra_channels = T.alloc(0., b, ch + 2 * half_n, r, c)
-        input_sqr = K.set_subtensor(extra_channels[:, half_n:half_n + ch, :, :], input_sqr)
-        scale = self.k
-        norm_alpha = self.alpha / self.n
-        for i in range(self.n):
-            scale += norm_alpha * input_sqr[:, i:i + ch, :, :]
-        scale = scale ** self.beta
-        return X / scale
-
-    def get_output(self, train):
-        import theano.tensor as T
-        X = self.get_input(train)
-        input_dim = X.shape
-        half_n = self.n // 2
-        input_sqr = K.sqr(X)
-        b, ch, r, c = input_dim
-        extra_channels = T.alloc(0., b, ch + 2 * half_n, r, c)
-        input_sqr = K.set_subtensor(extra_channels[:, half_n:half_n + ch, :, :], input_sqr)
-        scale = self.k
-        norm_alpha = self.alpha / self.n
-        for i in range(self.n):
-            scale += norm_alpha * input_sqr[:, i:i + ch, :, :]
-        scale = scale ** self.beta
-        return X / scale
 
-    def get_config(self):
-        return {
-            "alpha": self.alpha,
-            "k": self.k,
-            "beta": self.beta,
-            "n": self.n}
+    def __init__(self, alpha=1e-4, k=2, beta=0.75, n=5,
+                 data_format='channels_first', **kwargs):
+        super(LRN2D, self).__init__(alpha=alpha, k=k, beta=beta, n=n,
+                                    data_format=data_format, **kwargs)
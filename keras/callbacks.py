@@ -29,19 +29,55 @@ except ImportError:
 class CallbackList(object):
     """Container abstracting a list of callbacks.
 
+    The hooks of the callbacks which do not override them (i.e. which
+    inherit the no-op hooks of `Callback`) are not called.
+
     # Arguments
         callbacks: List of `Callback` instances.
         queue_length: Queue length for keeping
             running statistics over callback execution time.
+        profile: Whether to time each callback, and print at the end of
+            training the total time and the time per batch spent in each
+            callback class. The timings are also available in the
+            `timings` attribute, a dictionary mapping the class names to
+            dictionaries mapping the hook names to the total times
+            (in seconds).
     """
 
-    def __init__(self, callbacks=None, queue_length=10):
+    def __init__(self, callbacks=None, queue_length=10, profile=False):
         callbacks = callbacks or []
         self.callbacks = [c for c in callbacks]
         self.queue_length = queue_length
+        self.profile = profile
+        self.timings = OrderedDict()
+        self._num_batches = 0
+        self._hooks = {}
 
     def append(self, callback):
         self.callbacks.append(callback)
+        self._hooks = {}
+
+    def _hook(self, name):
+        """Returns the list of the `(callback, method)` overriding a hook."""
+        if name not in self._hooks:
+            base_function = six.get_unbound_function(getattr(Callback, name))
+            self._hooks[name] = [
+                (callback, getattr(callback, name)) for callback in self.callbacks
+                if getattr(getattr(callback, name), '__func__',
+                           getattr(callback, name)) is not base_function]
+        return self._hooks[name]
+
+    def _call(self, name, *args):
+        """Calls a hook of the callbacks, timing them if profiling."""
+        if not self.profile:
+            for _, method in self._hook(name):
+                method(*args)
+            return
+        for callback, method in self._hook(name):
+            t_before_callback = time.time()
+            method(*args)
+            timings = self.timings.setdefault(callback.__class__.__name__, {})
+            timings[name] = timings.get(name, 0.) + time.time() - t_before_callback
 
     def set_params(self, params):
         for callback in self.callbacks:
@@ -59,8 +95,7 @@ class CallbackList(object):
             logs: dictionary of logs.
         """
         logs = logs or {}
-        for callback in self.callbacks:
-            callback.on_epoch_begin(epoch, logs)
+        self._call('on_epoch_begin', epoch, logs)
         self._delta_t_batch = 0.
         self._delta_ts_batch_begin = deque([], maxlen=self.queue_length)
         self._delta_ts_batch_end = deque([], maxlen=self.queue_length)
@@ -73,8 +108,18 @@ class CallbackList(object):
             logs: dictionary of logs.
         """
         logs = logs or {}
-        for callback in self.callbacks:
-            callback.on_epoch_end(epoch, logs)
+        self._call('on_epoch_end', epoch, logs)
+
+    def _check_slow(self, delta_ts, name):
+        # The median exceeds the threshold only if the maximum does,
+        # which is much cheaper to compute.
+        if self._delta_t_batch > 0. and max(delta_ts) > 0.1:
+            delta_t_median = np.median(delta_ts)
+            if (delta_t_median > 0.95 * self._delta_t_batch and
+                    delta_t_median > 0.1):
+                warnings.warn('Method %s() is slow compared '
+                              'to the batch update (%f). Check your callbacks.'
+                              % (name, delta_t_median))
 
     def on_batch_begin(self, batch, logs=None):
         """Called right before processing a batch.
@@ -85,17 +130,14 @@ class CallbackList(object):
         """
         logs = logs or {}
         t_before_callbacks = time.time()
-        for callback in self.callbacks:
-            callback.on_batch_begin(batch, logs)
-        self._delta_ts_batch_begin.append(time.time() - t_before_callbacks)
-        delta_t_median = np.median(self._delta_ts_batch_begin)
-        if (self._delta_t_batch > 0. and
-           delta_t_median > 0.95 * self._delta_t_batch and
-           delta_t_median > 0.1):
-            warnings.warn('Method on_batch_begin() is slow compared '
-                          'to the batch update (%f). Check your callbacks.'
-                          % delta_t_median)
-        self._t_enter_batch = time.time()
+        if self._hook('on_batch_begin'):
+            self._call('on_batch_begin', batch, logs)
+            t_after_callbacks = time.time()
+            self._delta_ts_batch_begin.append(t_after_callbacks - t_before_callbacks)
+            self._check_slow(self._delta_ts_batch_begin, 'on_batch_begin')
+            self._t_enter_batch = t_after_callbacks
+        else:
+            self._t_enter_batch = t_before_callbacks
 
     def on_batch_end(self, batch, logs=None):
         """Called at the end of a batch.
@@ -105,19 +147,16 @@ class CallbackList(object):
             logs: dictionary of logs.
         """
         logs = logs or {}
-        if not hasattr(self, '_t_enter_batch'):
-            self._t_enter_batch = time.time()
-        self._delta_t_batch = time.time() - self._t_enter_batch
+        self._num_batches += 1
+        if not self._hook('on_batch_end'):
+            return
         t_before_callbacks = time.time()
-        for callback in self.callbacks:
-            callback.on_batch_end(batch, logs)
+        if not hasattr(self, '_t_enter_batch'):
+            self._t_enter_batch = t_before_callbacks
+        self._delta_t_batch = t_before_callbacks - self._t_enter_batch
+        self._call('on_batch_end', batch, logs)
         self._delta_ts_batch_end.append(time.time() - t_before_callbacks)
-        delta_t_median = np.median(self._delta_ts_batch_end)
-        if (self._delta_t_batch > 0. and
-           (delta_t_median > 0.95 * self._delta_t_batch and delta_t_median > 0.1)):
-            warnings.warn('Method on_batch_end() is slow compared '
-                          'to the batch update (%f). Check your callbacks.'
-                          % delta_t_median)
+        self._check_slow(self._delta_ts_batch_end, 'on_batch_end')
 
     def on_train_begin(self, logs=None):
         """Called at the beginning of training.
@@ -126,8 +165,9 @@ class CallbackList(object):
             logs: dictionary of logs.
         """
         logs = logs or {}
-        for callback in self.callbacks:
-            callback.on_train_begin(logs)
+        self._num_batches = 0
+        self.timings = OrderedDict()
+        self._call('on_train_begin', logs)
 
     def on_train_end(self, logs=None):
         """Called at the end of training.
@@ -136,8 +176,19 @@ class CallbackList(object):
             logs: dictionary of logs.
         """
         logs = logs or {}
-        for callback in self.callbacks:
-            callback.on_train_end(logs)
+        self._call('on_train_end', logs)
+        if self.profile:
+            self.print_timings()
+
+    def print_timings(self):
+        """Prints the time spent in each callback class."""
+        print('Time spent in callbacks (%d batches):' % self._num_batches)
+        for class_name, timings in self.timings.items():
+            batch_time = (timings.get('on_batch_begin', 0.) +
+                          timings.get('on_batch_end', 0.))
+            print('    %s: %.3f s in total, %.3f ms per batch' %
+                  (class_name, sum(timings.values()),
+                   1000. * batch_time / max(self._num_batches, 1)))
 
     def __iter__(self):
         return iter(self.callbacks)
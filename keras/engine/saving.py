@@ -143,6 +143,8 @@ def save_model(model, filepath, overwrite=True, include_optimizer=True):
                     'metrics': model.metrics,
                     'sample_weight_mode': model.sample_weight_mode,
                     'loss_weights': model.loss_weights,
+                    'accumulate_steps': model.accumulate_steps,
+                    'steps_per_execution': model.steps_per_execution,
                 }, default=get_json_type).encode('utf8')
 
                 # Save optimizer weights.
@@ -280,13 +282,21 @@ def load_model(filepath, custom_objects=None, compile=True):
             metrics = convert_custom_objects(training_config['metrics'])
             sample_weight_mode = training_config['sample_weight_mode']
             loss_weights = training_config['loss_weights']
+            accumulate_steps = training_config.get('accumulate_steps', 1)
+            steps_per_execution = training_config.get('steps_per_execution', 1)
+            if K.backend() != 'theano':
+                # Only supported with Theano: a model saved with it still
+                # trains, one batch per call.
+                steps_per_execution = 1
 
             # Compile model.
             model.compile(optimizer=optimizer,
                           loss=loss,
                           metrics=metrics,
                           loss_weights=loss_weights,
-                          sample_weight_mode=sample_weight_mode)
+                          sample_weight_mode=sample_weight_mode,
+                          accumulate_steps=accumulate_steps,
+                          steps_per_execution=steps_per_execution)
 
             # Set optimizer weights.
             if 'optimizer_weights' in f:
@@ -678,6 +688,9 @@ def preprocess_weights_for_loading(layer, weights,
     # convert CuDNN layers
     weights = _convert_rnn_weights(layer, weights)
 
+    # convert between split and fused kernels
+    weights = _convert_fused_kernel_weights(layer, weights)
+
     return weights
 
 
@@ -826,6 +839,41 @@ def _convert_rnn_weights(layer, weights):
     return weights
 
 
+def _convert_fused_kernel_weights(layer, weights):
+    """Converts weights of recurrent layers between split and fused kernels.
+
+    Layers with an `implementation=2` mode (e.g. `AttLSTMCond`) store the
+    kernels listed in their `_fused_kernels` attribute as a single kernel,
+    made of the split kernels concatenated along their rows. The split
+    kernels are the first weights of the layer in `implementation=1` and
+    the fused kernel is the first one in `implementation=2`.
+
+    # Arguments
+        layer: Target layer instance.
+        weights: List of source weights values (Numpy arrays).
+
+    # Returns
+        A list of converted weights values (Numpy arrays).
+    """
+    fused_kernels = getattr(layer, '_fused_kernels', None)
+    if not fused_kernels or not weights:
+        return weights
+    num_kernels = len(fused_kernels)
+    layer_weights = layer.weights
+    if len(weights) == len(layer_weights) + num_kernels - 1:
+        # Split kernels -> fused kernel
+        if layer.implementation == 2:
+            fused_kernel = np.concatenate(weights[:num_kernels], axis=0)
+            weights = [fused_kernel] + list(weights[num_kernels:])
+    elif len(weights) == len(layer_weights) - num_kernels + 1:
+        # Fused kernel -> split kernels
+        if layer.implementation == 1:
+            limits = np.cumsum([K.int_shape(w)[0] for w in layer_weights[:num_kernels]])
+            kernels = np.split(weights[0], limits[:-1], axis=0)
+            weights = kernels + list(weights[1:])
+    return weights
+
+
 def _need_convert_kernel(original_backend):
     """Checks if conversion on kernel matrices is required during weight loading.
 
@@ -41,6 +41,8 @@ class Model(Network):
                 sample_weight_mode=None,
                 weighted_metrics=None,
                 target_tensors=None,
+                accumulate_steps=1,
+                steps_per_execution=1,
                 **kwargs):
         """Configures the model for training.
 
@@ -84,6 +86,22 @@ class Model(Network):
                 can specify them via the `target_tensors` argument. It can be
                 a single tensor (for a single-output model), a list of tensors,
                 or a dict mapping output names to target tensors.
+            accumulate_steps: Integer. Number of batches over which the
+                gradients are accumulated before updating the weights.
+                The weights are updated once every `accumulate_steps`
+                batches, with the mean of their gradients, as with a
+                batch `accumulate_steps` times larger, but with the memory
+                use of a single batch. The learning rate multipliers of
+                the layers apply as usual. Not supported with native
+                TensorFlow optimizers.
+            steps_per_execution: Integer. Number of batches run per call
+                to the backend by `fit` (on Numpy data). The batches are
+                stacked and run in a loop in the graph, and the callbacks
+                are called once per block of batches, with the mean of the
+                losses and metrics over the block. Only supported with the
+                Theano backend (values above 1 raise a `ValueError` with the
+                other backends), and only used by `fit`: `fit_generator`
+                runs one batch per call.
             **kwargs: When using the Theano/CNTK backends, these arguments
                 are passed into `K.function`.
                 When using the TensorFlow backend,
@@ -94,6 +112,23 @@ class Model(Network):
                 `optimizer`, `loss`, `metrics` or `sample_weight_mode`.
         """
         self.optimizer = optimizers.get(optimizer)
+        if accumulate_steps < 1:
+            raise ValueError('`accumulate_steps` should be at least 1. '
+                             'Received: ' + str(accumulate_steps))
+        if isinstance(self.optimizer, optimizers.TFOptimizer):
+            if accumulate_steps > 1:
+                raise ValueError('Gradient accumulation is not supported '
+                                 'with native TensorFlow optimizers.')
+        else:
+            self.optimizer.accumulate_steps = accumulate_steps
+        self.accumulate_steps = accumulate_steps
+        if steps_per_execution < 1:
+            raise ValueError('`steps_per_execution` should be at least 1. '
+                             'Received: ' + str(steps_per_execution))
+        if steps_per_execution > 1 and K.backend() != 'theano':
+            raise ValueError('`steps_per_execution` is only supported '
+                             'with the Theano backend.')
+        self.steps_per_execution = steps_per_execution
         self.loss = loss or []
         self.metrics = metrics or []
         self.loss_weights = loss_weights
@@ -462,6 +497,7 @@ class Model(Network):
         self._function_kwargs = kwargs
 
         self.train_function = None
+        self.stacked_train_function = None
         self.test_function = None
         self.predict_function = None
 
@@ -522,6 +558,14 @@ class Model(Network):
                     updates=updates,
                     name='train_function',
                     **self._function_kwargs)
+                if self.steps_per_execution > 1:
+                    # Same, for a block of stacked batches.
+                    self.stacked_train_function = K.stacked_function(
+                        inputs,
+                        [self.total_loss] + self.metrics_tensors,
+                        updates=updates,
+                        name='stacked_train_function',
+                        **self._function_kwargs)
 
     def _make_test_function_only_metrics(self):
         if not hasattr(self, 'test_function'):
@@ -748,7 +792,9 @@ class Model(Network):
                              loss=self.loss,
                              metrics=self.metrics,
                              loss_weights=self.loss_weights,
-                             target_tensors=target_tensors)
+                             target_tensors=target_tensors,
+                             accumulate_steps=self.accumulate_steps,
+                             steps_per_execution=self.steps_per_execution)
 
         # If `x` and `y` were all symbolic,
         # then the model should not be fed any inputs and targets.
@@ -866,6 +912,8 @@ class Model(Network):
             initial_epoch=0,
             steps_per_epoch=None,
             validation_steps=None,
+            prefetch=0,
+            profile_callbacks=False,
             **kwargs):
         """Trains the model for a given number of epochs (iterations on a dataset).
 
@@ -913,9 +961,23 @@ class Model(Network):
                 The model will not be trained on this data.
                 `validation_data` will override `validation_split`.
             shuffle: Boolean (whether to shuffle the training data
-                before each epoch) or str (for 'batch').
+                before each epoch), str (for 'batch' or 'block')
+                or tuple (for a configured 'block' mode).
                 'batch' is a special option for dealing with the
                 limitations of HDF5 data; it shuffles in batch-sized chunks.
+                'block' shuffles blocks of `batch_size` contiguous
+                samples, split at a random offset at each epoch, so that
+                each batch is read as one to three contiguous slices
+                instead of a random gather. The block size and the size
+                of a window of positions within which the samples are
+                also shuffled can be set with
+                `('block', block_size, window_size)`; windows larger
+                than a few samples per run make the reads random again.
+                In terms of throughput, `True` gathers every batch at
+                random (slow for large arrays, and not supported by
+                `HDF5Matrix`), while 'batch' and 'block' read contiguous
+                slices (views of in-memory arrays, sequential reads of
+                HDF5 data), 'block' changing the batches at each epoch.
                 Has no effect when `steps_per_epoch` is not `None`.
             class_weight: Optional dictionary mapping class indices (integers)
                 to a weight (float) value, used for weighting the loss function
@@ -947,6 +1009,16 @@ class Model(Network):
             validation_steps: Only relevant if `steps_per_epoch`
                 is specified. Total number of steps (batches of samples)
                 to validate before stopping.
+            prefetch: Integer. Number of batches to prepare (slice,
+                densify and cast) ahead in a background thread, while
+                the model runs on the current batch. Useful when the
+                preparation is slow, e.g. with sparse or `HDF5Matrix`
+                data. Also used for the validation data.
+                0 (default) prepares each batch when it is needed.
+                Has no effect when `steps_per_epoch` is not `None`.
+            profile_callbacks: Boolean. Whether to time the callbacks and
+                print, at the end of training, the total time and the
+                time per batch spent in each callback class.
 
         # Returns
             A `History` object. Its `History.history` attribute is
@@ -1065,13 +1137,18 @@ class Model(Network):
                                         callback_metrics=callback_metrics,
                                         initial_epoch=initial_epoch,
                                         steps_per_epoch=steps_per_epoch,
-                                        validation_steps=validation_steps)
+                                        validation_steps=validation_steps,
+                                        prefetch=prefetch,
+                                        stacked_f=self.stacked_train_function,
+                                        steps_per_execution=self.steps_per_execution,
+                                        profile_callbacks=profile_callbacks)
 
     def evaluate(self, x=None, y=None,
                  batch_size=None,
                  verbose=1,
                  sample_weight=None,
-                 steps=None):
+                 steps=None,
+                 prefetch=0):
         """Returns the loss value & metrics values for the model in test mode.
 
         Computation is done in batches.
@@ -1110,6 +1187,8 @@ class Model(Network):
                 Total number of steps (batches of samples)
                 before declaring the evaluation round finished.
                 Ignored with the default value of `None`.
+            prefetch: Integer. Number of batches to prepare ahead in a
+                background thread (see `fit`).
 
         # Returns
             Scalar test loss (if the model has a single output and no metrics)
@@ -1139,7 +1218,8 @@ class Model(Network):
         return training_arrays.test_loop(self, f, ins,
                                          batch_size=batch_size,
                                          verbose=verbose,
-                                         steps=steps)
+                                         steps=steps,
+                                         prefetch=prefetch)
 
     def evaluate_on_metrics(self, x, y, batch_size=32, verbose=1, sample_weight=None):
         '''Returns the metrics values for the model
@@ -1183,7 +1263,8 @@ class Model(Network):
     def predict(self, x,
                 batch_size=None,
                 verbose=0,
-                steps=None):
+                steps=None,
+                prefetch=0):
         """Generates output predictions for the input samples.
 
         Computation is done in batches.
@@ -1196,6 +1277,8 @@ class Model(Network):
             steps: Total number of steps (batches of samples)
                 before declaring the prediction round finished.
                 Ignored with the default value of `None`.
+            prefetch: Integer. Number of batches to prepare ahead in a
+                background thread (see `fit`).
 
         # Returns
             Numpy array(s) of predictions.
@@ -1234,7 +1317,8 @@ class Model(Network):
         return training_arrays.predict_loop(self, f, ins,
                                             batch_size=batch_size,
                                             verbose=verbose,
-                                            steps=steps)
+                                            steps=steps,
+                                            prefetch=prefetch)
 
     def train_on_batch(self, x, y,
                        sample_weight=None,
@@ -1355,7 +1439,8 @@ class Model(Network):
                       workers=1,
                       use_multiprocessing=False,
                       shuffle=True,
-                      initial_epoch=0):
+                      initial_epoch=0,
+                      profile_callbacks=False):
         """Trains the model on data generated batch-by-batch by a Python generator (or an instance of `Sequence`).
 
         The generator is run in parallel to the model, for efficiency.
@@ -1443,6 +1528,9 @@ class Model(Network):
             initial_epoch: Integer.
                 Epoch at which to start training
                 (useful for resuming a previous training run).
+            profile_callbacks: Boolean. Whether to time the callbacks and
+                print, at the end of training, the total time and the
+                time per batch spent in each callback class.
 
         # Returns
             A `History` object. Its `History.history` attribute is
@@ -1482,7 +1570,8 @@ class Model(Network):
             workers=workers,
             use_multiprocessing=use_multiprocessing,
             shuffle=shuffle,
-            initial_epoch=initial_epoch)
+            initial_epoch=initial_epoch,
+            profile_callbacks=profile_callbacks)
 
     @interfaces.legacy_generator_methods_support
     def evaluate_generator(self, generator,
@@ -4,10 +4,17 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import sys
+import threading
+
 import numpy as np
+import six
+from scipy import sparse
 from scipy.sparse import issparse
 
 from .training_utils import batch_shuffle
+from .training_utils import block_shuffle
+from .training_utils import contiguous_runs
 from .training_utils import make_batches
 from .training_utils import check_num_samples
 from .. import backend as K
@@ -17,6 +24,171 @@ from ..utils.generic_utils import slice_arrays
 from ..utils.generic_utils import to_list
 from ..utils.generic_utils import unpack_singleton
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+# Minimum average length of the runs of contiguous indices of a batch
+# for the batch to be read by slices.
+_MIN_RUN_LENGTH = 8
+
+
+def _slice_runs(x, runs):
+    """Concatenates the slices `x[start:stop]` for the ranges in `runs`."""
+    if x is None:
+        return None
+    parts = [x[start:stop] for start, stop in runs]
+    if len(parts) == 1:
+        return parts[0]
+    if issparse(x):
+        return sparse.vstack(parts, format=x.format)
+    return np.concatenate(parts)
+
+
+def _prepare_batch(ins, batch_ids, indices_for_conversion_to_dense,
+                   dtypes=None):
+    """Slices a batch of the arrays to be fed to a function.
+
+    # Arguments
+        ins: List of arrays, possibly ending with the learning phase flag.
+        batch_ids: Indices of the samples of the batch.
+        indices_for_conversion_to_dense: Indices of the sparse arrays
+            to densify.
+        dtypes: Optional list of the dtypes of the placeholders fed with
+            `ins` (`None` for the arrays not to cast).
+
+    # Returns
+        The list of the arrays of the batch.
+    """
+    if ins and isinstance(ins[-1], float):
+        # Do not slice the training phase flag.
+        arrays, flags = ins[:-1], [ins[-1]]
+    else:
+        arrays, flags = ins, []
+    runs, _ = contiguous_runs(batch_ids)
+    if len(runs) == 1 or len(runs) * _MIN_RUN_LENGTH <= len(batch_ids):
+        # Mostly contiguous batch (e.g. with `shuffle='block'`): the samples
+        # are read by slices (views for a single run), in increasing order.
+        ins_batch = [_slice_runs(x, runs) for x in arrays] + flags
+    else:
+        ins_batch = slice_arrays(arrays, batch_ids) + flags
+    for i in indices_for_conversion_to_dense:
+        ins_batch[i] = ins_batch[i].toarray()
+    if dtypes is not None:
+        for i, dtype in enumerate(dtypes):
+            if dtype is not None and ins_batch[i].dtype != dtype:
+                ins_batch[i] = ins_batch[i].astype(dtype)
+    return ins_batch
+
+
+def _feed_dtypes(feed, ins):
+    """Dtypes to cast the arrays of `ins` to before feeding them."""
+    return [None if K.is_sparse(placeholder) or not hasattr(x, 'dtype')
+            else np.dtype(K.dtype(placeholder))
+            for placeholder, x in zip(feed, ins)]
+
+
+def _iterate_batches(ins, index_array, batches,
+                     indices_for_conversion_to_dense,
+                     prefetch=0, feed=None):
+    """Yields the batches of the arrays to be fed to a function.
+
+    With `prefetch > 0`, the batches are prepared (sliced, densified and
+    cast to the dtypes of the placeholders in `feed`) by a background
+    thread, at most `prefetch` batches ahead, so that the preparation of
+    the next batches overlaps with the computation on the current one.
+
+    # Arguments
+        ins: List of arrays, possibly ending with the learning phase flag.
+        index_array: Array of the indices of the samples, in order.
+        batches: List of `(batch_start, batch_end)` tuples,
+            positions in `index_array`.
+        indices_for_conversion_to_dense: Indices of the sparse arrays
+            to densify.
+        prefetch: Number of batches to prepare ahead.
+        feed: List of the placeholders fed with `ins`.
+
+    # Yields
+        Tuples `(batch_ids, ins_batch)`.
+    """
+    def prepare(batch_start, batch_end, dtypes=None):
+        batch_ids = index_array[batch_start:batch_end]
+        return batch_ids, _prepare_batch(ins, batch_ids,
+                                         indices_for_conversion_to_dense,
+                                         dtypes)
+
+    if not prefetch:
+        for batch_start, batch_end in batches:
+            yield prepare(batch_start, batch_end)
+        return
+
+    dtypes = _feed_dtypes(feed, ins) if feed is not None else None
+    batch_queue = queue.Queue(maxsize=prefetch)
+    stop_event = threading.Event()
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                batch_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch_start, batch_end in batches:
+                if not put((prepare(batch_start, batch_end, dtypes), None)):
+                    return
+        except Exception:
+            put((None, sys.exc_info()))
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        for _ in batches:
+            batch, exc_info = batch_queue.get()
+            if exc_info is not None:
+                six.reraise(*exc_info)
+            yield batch
+    finally:
+        # Also reached when the consumer stops early (e.g. `stop_training`).
+        stop_event.set()
+        thread.join()
+
+
+def _make_blocks(batches, steps_per_execution):
+    """Groups consecutive batches of the same size by `steps_per_execution`."""
+    blocks = []
+    for batch in batches:
+        if (blocks and len(blocks[-1]) < steps_per_execution and
+                batch[1] - batch[0] == blocks[-1][0][1] - blocks[-1][0][0]):
+            blocks[-1].append(batch)
+        else:
+            blocks.append([batch])
+    return blocks
+
+
+def _stack_batches(ins_batches):
+    """Stacks the arrays of several batches (but not the learning phase flag)."""
+    return [values[0] if isinstance(values[0], float) else np.stack(values)
+            for values in zip(*ins_batches)]
+
+
+def _block_shuffle_sizes(shuffle, batch_size):
+    """Returns the `(block_size, window_size)` of a block `shuffle` mode."""
+    if shuffle == 'block':
+        return batch_size, 0
+    if len(shuffle) not in (2, 3) or shuffle[0] != 'block':
+        raise ValueError('`shuffle` should be a boolean, "batch", "block", '
+                         '("block", block_size) or '
+                         '("block", block_size, window_size). '
+                         'Received: ' + str(shuffle))
+    return shuffle[1], shuffle[2] if len(shuffle) == 3 else 0
+
 
 def fit_loop(model, f, ins,
              out_labels=None,
@@ -30,7 +202,11 @@ def fit_loop(model, f, ins,
              callback_metrics=None,
              initial_epoch=0,
              steps_per_epoch=None,
-             validation_steps=None):
+             validation_steps=None,
+             prefetch=0,
+             stacked_f=None,
+             steps_per_execution=1,
+             profile_callbacks=False):
     """Abstract fit function for `f(ins)`.
 
     Assumes that f returns a list, labeled by out_labels.
@@ -47,7 +223,8 @@ def fit_loop(model, f, ins,
         callbacks: List of callbacks to be called during training
         val_f: Keras function to call for validation
         val_ins: List of tensors to be fed to `val_f`
-        shuffle: Whether to shuffle the data at the beginning of each epoch
+        shuffle: Whether to shuffle the data at the beginning of each epoch,
+            or the shuffling mode ("batch", "block" or a "block" tuple)
         callback_metrics: List of strings, the display names of the metrics
             passed to the callbacks. They should be the
             concatenation of list the display names of the outputs of
@@ -60,6 +237,17 @@ def fit_loop(model, f, ins,
         validation_steps: Number of steps to run validation for
             (only if doing validation from data tensors).
             Ignored with the default value of `None`.
+        prefetch: Number of batches to prepare ahead in a background
+            thread, while `f` runs (0 to prepare each batch just before
+            running `f`). Ignored when `steps_per_epoch` is not `None`.
+        stacked_f: Keras function running `f` on blocks of stacked
+            batches (see `K.stacked_function`, Theano only).
+        steps_per_execution: Number of batches per call to `stacked_f`.
+            The callbacks are called once per block of batches,
+            with the mean of the outputs of `f` over the block.
+            Ignored when `steps_per_epoch` is not `None`.
+        profile_callbacks: Whether to print the time spent in each
+            callback class at the end of training.
 
     # Returns
         `History` object.
@@ -104,7 +292,7 @@ def fit_loop(model, f, ins,
                 count_mode,
                 stateful_metrics=model.stateful_metric_names))
     _callbacks += (callbacks or []) + [model.history]
-    callbacks = cbks.CallbackList(_callbacks)
+    callbacks = cbks.CallbackList(_callbacks, profile=profile_callbacks)
     out_labels = out_labels or []
 
     # it's possible to callback a different model than itself
@@ -138,6 +326,11 @@ def fit_loop(model, f, ins,
     for i in range(len(feed)):
         if issparse(ins[i]) and not K.is_sparse(feed[i]):
             indices_for_conversion_to_dense.append(i)
+    if stacked_f is None:
+        steps_per_execution = 1
+    if steps_per_execution > 1 and any(K.is_sparse(x) for x in feed):
+        raise ValueError('`steps_per_execution` is not supported '
+                         'with sparse inputs.')
 
     for epoch in range(initial_epoch, epochs):
         # Reset stateful metrics
@@ -170,46 +363,55 @@ def fit_loop(model, f, ins,
                 for l, o in zip(out_labels, val_outs):
                     epoch_logs['val_' + l] = o
         else:
-            if shuffle == 'batch':
+            if isinstance(shuffle, tuple) or shuffle == 'block':
+                block_size, window_size = _block_shuffle_sizes(shuffle, batch_size)
+                index_array = block_shuffle(index_array, block_size, window_size)
+            elif shuffle == 'batch':
                 index_array = batch_shuffle(index_array, batch_size)
             elif shuffle:
                 np.random.shuffle(index_array)
 
             batches = make_batches(num_train_samples, batch_size)
-            for batch_index, (batch_start, batch_end) in enumerate(batches):
-                batch_ids = index_array[batch_start:batch_end]
+            batch_iterator = _iterate_batches(ins, index_array, batches,
+                                              indices_for_conversion_to_dense,
+                                              prefetch=prefetch, feed=feed)
+            blocks = _make_blocks(batches, steps_per_execution)
+            for batch_index, block in enumerate(blocks):
                 try:
-                    if isinstance(ins[-1], float):
-                        # Do not slice the training phase flag.
-                        ins_batch = slice_arrays(
-                            ins[:-1], batch_ids) + [ins[-1]]
-                    else:
-                        ins_batch = slice_arrays(ins, batch_ids)
+                    block_batches = [next(batch_iterator) for _ in block]
                 except TypeError:
                     raise TypeError('TypeError while preparing batch. '
                                     'If using HDF5 input data, '
-                                    'pass shuffle="batch".')
+                                    'pass shuffle="batch" or shuffle="block".')
                 batch_logs = {}
                 batch_logs['batch'] = batch_index
-                batch_logs['size'] = len(batch_ids)
+                batch_logs['size'] = sum(len(batch_ids)
+                                         for batch_ids, _ in block_batches)
                 callbacks.on_batch_begin(batch_index, batch_logs)
-                for i in indices_for_conversion_to_dense:
-                    ins_batch[i] = ins_batch[i].toarray()
 
-                outs = f(ins_batch)
-                outs = to_list(outs)
+                if len(block_batches) == 1:
+                    outs = f(block_batches[0][1])
+                    outs = to_list(outs)
+                else:
+                    stacked_outs = stacked_f(_stack_batches(
+                        [ins_batch for _, ins_batch in block_batches]))
+                    outs = [o[-1] if l in model.stateful_metric_names
+                            else np.mean(o)
+                            for l, o in zip(out_labels, stacked_outs)]
                 for l, o in zip(out_labels, outs):
                     batch_logs[l] = o
 
                 callbacks.on_batch_end(batch_index, batch_logs)
                 if callback_model.stop_training:
+                    batch_iterator.close()
                     break
 
-                if batch_index == len(batches) - 1:  # Last batch.
+                if batch_index == len(blocks) - 1:  # Last batch.
                     if do_validation:
                         val_outs = test_loop(model, val_f, val_ins,
                                              batch_size=batch_size,
-                                             verbose=0)
+                                             verbose=0,
+                                             prefetch=prefetch)
                         val_outs = to_list(val_outs)
                         # Same labels assumed.
                         for l, o in zip(out_labels, val_outs):
@@ -221,7 +423,8 @@ def fit_loop(model, f, ins,
     return model.history
 
 
-def predict_loop(model, f, ins, batch_size=32, verbose=0, steps=None):
+def predict_loop(model, f, ins, batch_size=32, verbose=0, steps=None,
+                 prefetch=0):
     """Abstract method to loop over some data in batches.
 
     # Arguments
@@ -233,6 +436,8 @@ def predict_loop(model, f, ins, batch_size=32, verbose=0, steps=None):
         steps: Total number of steps (batches of samples)
             before declaring `predict_loop` finished.
             Ignored with the default value of `None`.
+        prefetch: Number of batches to prepare ahead in a background
+            thread, while `f` runs. Ignored when `steps` is not `None`.
 
     # Returns
         Array of predictions (if the model has a single output)
@@ -281,15 +486,12 @@ def predict_loop(model, f, ins, batch_size=32, verbose=0, steps=None):
         outs = []
         batches = make_batches(num_samples, batch_size)
         index_array = np.arange(num_samples)
+        batch_iterator = _iterate_batches(ins, index_array, batches,
+                                          indices_for_conversion_to_dense,
+                                          prefetch=prefetch,
+                                          feed=model._feed_inputs)
         for batch_index, (batch_start, batch_end) in enumerate(batches):
-            batch_ids = index_array[batch_start:batch_end]
-            if ins and isinstance(ins[-1], float):
-                # Do not slice the training phase flag.
-                ins_batch = slice_arrays(ins[:-1], batch_ids) + [ins[-1]]
-            else:
-                ins_batch = slice_arrays(ins, batch_ids)
-            for i in indices_for_conversion_to_dense:
-                ins_batch[i] = ins_batch[i].toarray()
+            _, ins_batch = next(batch_iterator)
 
             batch_outs = f(ins_batch)
             batch_outs = to_list(batch_outs)
@@ -305,7 +507,8 @@ def predict_loop(model, f, ins, batch_size=32, verbose=0, steps=None):
         return unpack_singleton(outs)
 
 
-def test_loop(model, f, ins, batch_size=None, verbose=0, steps=None):
+def test_loop(model, f, ins, batch_size=None, verbose=0, steps=None,
+              prefetch=0):
     """Abstract method to loop over some data in batches.
 
     # Arguments
@@ -317,6 +520,8 @@ def test_loop(model, f, ins, batch_size=None, verbose=0, steps=None):
         steps: Total number of steps (batches of samples)
             before declaring predictions finished.
             Ignored with the default value of `None`.
+        prefetch: Number of batches to prepare ahead in a background
+            thread, while `f` runs. Ignored when `steps` is not `None`.
 
     # Returns
         Scalar loss (if the model has a single output and no metrics)
@@ -379,15 +584,11 @@ def test_loop(model, f, ins, batch_size=None, verbose=0, steps=None):
     else:
         batches = make_batches(num_samples, batch_size)
         index_array = np.arange(num_samples)
+        batch_iterator = _iterate_batches(ins, index_array, batches,
+                                          indices_for_conversion_to_dense,
+                                          prefetch=prefetch, feed=feed)
         for batch_index, (batch_start, batch_end) in enumerate(batches):
-            batch_ids = index_array[batch_start:batch_end]
-            if isinstance(ins[-1], float):
-                # Do not slice the training phase flag.
-                ins_batch = slice_arrays(ins[:-1], batch_ids) + [ins[-1]]
-            else:
-                ins_batch = slice_arrays(ins, batch_ids)
-            for i in indices_for_conversion_to_dense:
-                ins_batch[i] = ins_batch[i].toarray()
+            batch_ids, ins_batch = next(batch_iterator)
 
             batch_outs = f(ins_batch)
             if isinstance(batch_outs, list):
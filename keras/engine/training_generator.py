@@ -31,7 +31,8 @@ def fit_generator(model,
                   workers=1,
                   use_multiprocessing=False,
                   shuffle=True,
-                  initial_epoch=0):
+                  initial_epoch=0,
+                  profile_callbacks=False):
     """See docstring for `Model.fit_generator`."""
     wait_time = 0.01  # in seconds
     epoch = initial_epoch
@@ -84,7 +85,7 @@ def fit_generator(model,
                 count_mode='steps',
                 stateful_metrics=model.stateful_metric_names))
     _callbacks += (callbacks or []) + [model.history]
-    callbacks = cbks.CallbackList(_callbacks)
+    callbacks = cbks.CallbackList(_callbacks, profile=profile_callbacks)
 
     # it's possible to callback a different model than self:
     if hasattr(model, 'callback_model') and model.callback_model:
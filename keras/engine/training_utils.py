@@ -356,6 +356,63 @@ def batch_shuffle(index_array, batch_size):
     return np.append(index_array, last_batch)
 
 
+def block_shuffle(index_array, block_size, window_size=0):
+    """Shuffles an array by blocks of contiguous indices.
+
+    The array is split into blocks of `block_size` consecutive indices,
+    starting at a random offset (so that the blocks change from one call
+    to the next), and the blocks are shuffled. Then, if `window_size` is
+    greater than 1, the indices are shuffled within windows of
+    `window_size` consecutive positions.
+
+    Each batch of the result is made of a few runs of contiguous indices
+    (one or two per block it overlaps, when `window_size` is at most the
+    batch size), which can be read as slices.
+
+    # Arguments
+        index_array: array of indices to be shuffled.
+        block_size: integer, number of indices per block.
+        window_size: integer, number of positions of the windows
+            within which the indices are shuffled (0 to only shuffle
+            the blocks).
+
+    # Returns
+        The `index_array` array, shuffled in a block-wise fashion.
+    """
+    offset = np.random.randint(block_size)
+    split_points = np.arange(offset or block_size, len(index_array), block_size)
+    blocks = np.split(index_array, split_points)
+    np.random.shuffle(blocks)
+    index_array = np.concatenate(blocks)
+    if window_size > 1:
+        for window_start in range(0, len(index_array), window_size):
+            np.random.shuffle(index_array[window_start:window_start + window_size])
+    return index_array
+
+
+def contiguous_runs(index_array):
+    """Splits an array of indices into runs of contiguous indices.
+
+    # Arguments
+        index_array: array of distinct indices.
+
+    # Returns
+        A tuple `(runs, order)`: the list of the `(start, stop)` ranges
+        covering the indices, in increasing order, and the permutation
+        that sorts `index_array` (or `None` if it is already sorted).
+    """
+    order = None
+    if np.any(index_array[1:] < index_array[:-1]):
+        order = np.argsort(index_array, kind='mergesort')
+        index_array = index_array[order]
+    breaks = np.nonzero(index_array[1:] != index_array[:-1] + 1)[0] + 1
+    starts = np.concatenate([[0], breaks])
+    stops = np.concatenate([breaks, [len(index_array)]])
+    runs = [(int(index_array[start]), int(index_array[stop - 1]) + 1)
+            for start, stop in zip(starts, stops)]
+    return runs, order
+
+
 def make_batches(size, batch_size):
     """Returns a list of batch indices (tuples of indices).
 
@@ -21,6 +21,7 @@ from .wrappers import *
 from .googlenet_custom_layers import *
 from .convolutional_recurrent import *
 from .uncertainty_layers import *
+from .quantized import *
 # TODO: Update attention layers!
 from .attention import *
 from ..legacy.layers import *
@@ -8,6 +8,9 @@ from .. import activations, initializers, regularizers, constraints
 from ..engine import Layer, InputSpec
 from ..layers import Dense, Concatenate, TimeDistributed, Slice
 
+# Score given to the masked positions before the softmax
+PADDING_VALUE = -2. ** 32 + 1
+
 
 class MultiHeadAttention(Layer):
     """Multi-head attention layer. Multi-Head Attention consists of h attention layers running in parallel.
@@ -19,6 +22,11 @@ class MultiHeadAttention(Layer):
     # Arguments
         n_heads: Number of attention layers that represent the linear projections.
         dmodel = model size
+        chunk_size: If set, the queries are processed in chunks of `chunk_size`
+            timesteps, attending to blocks of `chunk_size` keys with a
+            streaming softmax. The result is the same, but the attention scores
+            are never materialized for the whole sequences, so the peak memory
+            is bounded by `chunk_size` instead of growing with `T_q * T_k`.
     # Input shape
         3 tensors with shape: `(batch_size, input_dim)`.
 
@@ -38,6 +46,7 @@ class MultiHeadAttention(Layer):
                  kernel_regularizer=None,
                  activity_regularizer=None,
                  kernel_constraint=None,
+                 chunk_size=None,
                  **kwargs):
         super(MultiHeadAttention, self).__init__(**kwargs)
         self.supports_masking = True
@@ -57,6 +66,7 @@ class MultiHeadAttention(Layer):
         self.linear_q = None
         self.linear_o = None
         self.mask_future = mask_future  # If mask_future,  units that reference the future are masked.
+        self.chunk_size = chunk_size
 
     def build(self, input_shape):
         assert len(input_shape) == 2, 'You should pass two inputs to ScaledDotAttention: ' \
@@ -113,58 +123,263 @@ class MultiHeadAttention(Layer):
         query *= mask_query[:, :, None]
         key *= mask_key[:, :, None]
 
+        # Key and query masks, computed once for all the heads
+        key_masks = K.tile(K.sign(K.abs(K.sum(key, axis=-1))), [self.n_heads, 1])  # (h*N, T_k)
+        query_masks = K.tile(K.sign(K.abs(K.sum(query, axis=-1))), [self.n_heads, 1])  # (h*N, T_q)
+
         # Do linear projections. Shapes: batch_size, timesteps, dmodel*n_heads
-        queries, keys, values = [self.activation(K.dot_product(x, l))
+        queries, keys, values = [self.activation(K.dot(x, l))
                                  for l, x in zip([self.linear_q, self.linear_k, self.linear_v], (query, key, key))]
 
-        queries_ = K.concatenate([queries[:, :, i * self.dk: (i + 1) * self.dk] for i in range(self.n_heads)], axis=0)  # batch_size * n_heads, timesteps, dmodel/h
-        keys_ = K.concatenate([keys[:, :, i * self.dk: (i + 1) * self.dk] for i in range(self.n_heads)], axis=0)  # batch_size * n_heads, timesteps, dmodel/h
-        values_ = K.concatenate([values[:, :, i * self.dv: (i + 1) * self.dv] for i in range(self.n_heads)], axis=0)  # batch_size * n_heads, timesteps, dmodel/h
-
-        # Scaled-Dot-Product Attention
-
-        # Compute MatMul
-        matmul = K.batch_dot(queries_, K.permute_dimensions(keys_, (0, 2, 1)), axes=[2, 1])
+        queries_ = K.split_heads(queries, self.n_heads)  # batch_size * n_heads, timesteps, dmodel/h
+        keys_ = K.split_heads(keys, self.n_heads)  # batch_size * n_heads, timesteps, dmodel/h
+        values_ = K.split_heads(values, self.n_heads)  # batch_size * n_heads, timesteps, dmodel/h
 
-        # Scale it (denominator)
-        scale = K.sqrt(K.cast(self.dk, K.floatx()))
-
-        attended_heads = matmul / scale
+        if self.chunk_size:
+            attended_heads = self._chunked_attention(queries_, keys_, values_, key_masks)
+        else:
+            # Scaled-Dot-Product Attention
 
-        # Key Masking
-        key_masks = K.sign(K.abs(K.sum(key, axis=-1)))  # (N, T_q)
-        key_masks = K.tile(key_masks, [self.n_heads, 1])  # (h*N, T_k)
-        key_masks = K.tile(K.expand_dims(key_masks, 1), [1, K.shape(query)[1], 1])  # (h*N, T_q, T_k)
-        paddings = K.ones_like(attended_heads) * K.variable(-2 ** 32 + 1, dtype=K.floatx())
-        attended_heads = K.switch(K.equal(key_masks, 0), paddings, attended_heads)  # (h*N, T_q, T_k)
+            # Compute MatMul and scale it (denominator)
+            scale = K.sqrt(K.cast(self.dk, K.floatx()))
+            attended_heads = K.batch_dot(queries_, keys_, axes=[2, 2]) / scale  # (h*N, T_q, T_k)
 
-        if self.mask_future:
-            diag_vals = K.ones_like(attended_heads[0, :, :])  # (T_q, T_k)
-            tril = K.tril(diag_vals)  # (T_q, T_k)
-            future_masks = K.tile(K.expand_dims(tril, 0), [K.shape(attended_heads)[0], 1, 1])  # (h*N, T_q, T_k)
-            paddings = K.ones_like(future_masks) * K.variable(-2 ** 32 + 1, dtype=K.floatx())
-            attended_heads = K.switch(K.equal(future_masks, 0), paddings, attended_heads)  # (h*N, T_q, T_k)
+            # Key Masking (and future masking, if necessary), broadcast over the queries
+            score_masks = K.expand_dims(key_masks, 1)  # (h*N, 1, T_k)
+            if self.mask_future:
+                future_masks = K.less_equal(K.expand_dims(K.arange(K.shape(keys_)[1]), 0),
+                                            K.expand_dims(K.arange(K.shape(queries_)[1]), 1))  # (T_q, T_k)
+                score_masks *= K.expand_dims(K.cast(future_masks, K.floatx()), 0)  # (h*N, T_q, T_k)
+            attended_heads = attended_heads * score_masks + PADDING_VALUE * (1. - score_masks)
 
-        # Activation (softmax)
-        alphas = K.softmax_3d(attended_heads)
+            # Activation (softmax) and matmul with V
+            alphas = K.softmax_3d(attended_heads)
+            attended_heads = K.batch_dot(alphas, values_, axes=[2, 1])  # (h*N, T_q, dv)
 
         # Query Masking
-        query_masks = K.sign(K.abs(K.sum(query, axis=-1)))  # (N, T_q)
-        query_masks = K.tile(query_masks, [self.n_heads, 1])  # (h*N, T_q)
-        query_masks = K.tile(K.expand_dims(query_masks, -1), [1, 1, K.shape(key)[1]])  # (h*N, T_q, T_k)
-        attended_heads = alphas * query_masks  # broadcasting. (N, T_q, C)
-
-        # Matmul with V
-        attended_heads = K.batch_dot(attended_heads, values_, axes=[2, 1])
+        attended_heads *= K.expand_dims(query_masks)
 
         # Restore shape
-        nb_samples = K.shape(attended_heads)[0] // self.n_heads
-        attended_heads = K.concatenate([attended_heads[i * nb_samples: (i + 1) * nb_samples, :, :] for i in range(self.n_heads)], axis=2)  # batch_size, timesteps, dmodel
+        attended_heads = K.merge_heads(attended_heads, self.n_heads)  # batch_size, timesteps, dmodel
 
         # Apply the final linear
-        output = self.activation(K.dot_product(attended_heads, self.linear_o))
+        output = self.activation(K.dot(attended_heads, self.linear_o))
         return output
 
+    def _chunked_attention(self, queries, keys, values, key_masks):
+        """Scaled-dot-product attention computed by chunks of queries and keys.
+
+        Each chunk of queries runs over the blocks of keys keeping, for each
+        query, the running maximum of its scores, the running sum of their
+        exponentials and the running weighted sum of the values, rescaled
+        whenever the maximum changes (streaming softmax).
+
+        # Arguments
+            queries: Tensor of shape `(h*N, T_q, dk)`.
+            keys: Tensor of shape `(h*N, T_k, dk)`.
+            values: Tensor of shape `(h*N, T_k, dv)`.
+            key_masks: Tensor of shape `(h*N, T_k)`, zero for masked keys.
+
+        # Returns
+            The attended values, of shape `(h*N, T_q, dv)`.
+        """
+        chunk_size = self.chunk_size
+        scale = K.sqrt(K.cast(self.dk, K.floatx()))
+        query_steps = K.shape(queries)[1]
+        key_steps = K.shape(keys)[1]
+
+        def pad_to_chunks(x, steps):
+            # Pads the timesteps of `x` to a multiple of `chunk_size`.
+            num_padded = (chunk_size - steps % chunk_size) % chunk_size
+            return K.concatenate([x, K.tile(K.zeros_like(x[:, :1]), [1, num_padded, 1])], axis=1)
+
+        queries = pad_to_chunks(queries, query_steps)
+        keys = pad_to_chunks(keys, key_steps)
+        values = pad_to_chunks(values, key_steps)
+        key_masks = pad_to_chunks(K.expand_dims(key_masks), key_steps)[:, :, 0]
+        num_query_chunks = (query_steps + chunk_size - 1) // chunk_size
+        num_key_chunks = (key_steps + chunk_size - 1) // chunk_size
+        chunk_range = K.arange(chunk_size)
+
+        def attend_query_chunk(i):
+            query_chunk = queries[:, i * chunk_size:(i + 1) * chunk_size]  # (h*N, C, dk)
+            query_indices = i * chunk_size + chunk_range
+
+            def attend_key_chunk(state, j):
+                # state: (h*N, C, dv + 2), holding [weighted values, max score, sum of exps]
+                attended, max_scores, sum_exps = state[:, :, :-2], state[:, :, -2], state[:, :, -1]
+                start = j * chunk_size
+                key_indices = start + chunk_range
+                scores = K.batch_dot(query_chunk, keys[:, start:start + chunk_size],
+                                     axes=[2, 2]) / scale  # (h*N, C, C)
+
+                # Masked keys (and the future, if necessary) get the padding score.
+                score_masks = K.expand_dims(key_masks[:, start:start + chunk_size], 1)
+                if self.mask_future:
+                    future_masks = K.less_equal(K.expand_dims(key_indices, 0),
+                                                K.expand_dims(query_indices, 1))
+                    score_masks *= K.expand_dims(K.cast(future_masks, K.floatx()), 0)
+                scores = scores * score_masks + PADDING_VALUE * (1. - score_masks)
+
+                # Keys added to fill the last block do not take part in the softmax.
+                valid_keys = K.cast(K.less(key_indices, key_steps), K.floatx())
+                new_max_scores = K.maximum(max_scores, K.max(scores, axis=-1))
+                exps = K.exp(scores - K.expand_dims(new_max_scores)) * valid_keys
+                correction = K.exp(max_scores - new_max_scores)
+                sum_exps = sum_exps * correction + K.sum(exps, axis=-1)
+                attended = attended * K.expand_dims(correction) + \
+                    K.batch_dot(exps, values[:, start:start + chunk_size], axes=[2, 1])
+                return K.concatenate([attended,
+                                      K.expand_dims(new_max_scores),
+                                      K.expand_dims(sum_exps)])
+
+            zeros = K.zeros_like(query_chunk[:, :, :1])
+            initial_state = K.concatenate([K.tile(zeros, [1, 1, self.dv]),
+                                           zeros + PADDING_VALUE,
+                                           zeros])
+            state = K.foldl(attend_key_chunk, K.arange(num_key_chunks), initializer=initial_state)
+            return state[:, :, :-2] / K.expand_dims(state[:, :, -1])
+
+        attended_chunks = K.map_fn(attend_query_chunk, K.arange(num_query_chunks),
+                                   dtype=K.floatx())  # (T_q / C, h*N, C, dv)
+        attended_chunks = K.permute_dimensions(attended_chunks, (1, 0, 2, 3))
+        attended = K.reshape(attended_chunks, (K.shape(queries)[0], -1, self.dv))
+        return attended[:, :query_steps]
+
+    def get_initial_cache(self, batch_size):
+        """Returns an empty key/value cache for `get_step_function`.
+
+        # Arguments
+            batch_size: Number of sequences decoded in parallel.
+
+        # Returns
+            A list `[keys, values, key_masks]` of Numpy arrays of shapes
+            `(batch_size, 0, h*dk)`, `(batch_size, 0, h*dv)` and
+            `(batch_size, 0)`.
+        """
+        return [np.zeros((batch_size, 0, self.n_heads * self.dk), dtype=K.floatx()),
+                np.zeros((batch_size, 0, self.n_heads * self.dv), dtype=K.floatx()),
+                np.zeros((batch_size, 0), dtype=K.floatx())]
+
+    def get_cache_function(self):
+        """Returns the function that projects a whole key sequence into a cache.
+
+        Useful when the keys do not change during decoding (e.g. the encoder
+        outputs attended by a Transformer decoder), so they are projected once.
+
+        # Returns
+            A Keras function taking the key sequence, of shape
+            `(batch_size, timesteps, key_dim)`, and returning the key/value
+            cache expected by the function returned by `get_step_function`.
+        """
+        if getattr(self, '_cache_function', None) is None:
+            key = K.placeholder(ndim=3)
+            key *= K.expand_dims(K.cast(K.not_equal(K.sum(K.abs(key), axis=-1), 0), K.dtype(key)))
+            keys = self.activation(K.dot(key, self.linear_k))
+            values = self.activation(K.dot(key, self.linear_v))
+            key_masks = K.sign(K.abs(K.sum(key, axis=-1)))
+            self._cache_function = K.function([key], [keys, values, key_masks])
+        return self._cache_function
+
+    def get_step_function(self, update_cache=None):
+        """Returns the function that attends from a single new query.
+
+        For autoregressive decoding with `mask_future=True`, the keys and
+        values of the previous positions are kept in a cache, to which the
+        function appends the ones of the new position. Each new token then
+        costs the projections of a single position and an attention over the
+        cached positions, instead of running the layer on the whole prefix.
+
+        When decoding with `keras.utils.decoding.beam_search`, pass the cache
+        among the `states` of the search, so it is reordered along the beam
+        backpointers (see also `reorder_cache`).
+
+        # Example
+
+        ```python
+            step_function = layer.get_step_function()
+            cache = layer.get_initial_cache(batch_size)
+            for t in range(max_length):
+                outputs = step_function([x_t, x_t] + cache)
+                output_t, cache = outputs[0], outputs[1:]
+        ```
+
+        # Arguments
+            update_cache: Whether the keys and values of the new position are
+                appended to the cache (self-attention) or the cache holds a
+                fixed key sequence (see `get_cache_function`).
+                Defaults to `mask_future`.
+
+        # Returns
+            A Keras function. If `update_cache`, it takes the query and the
+            key of the new position (of shape `(batch_size, input_dim)`)
+            followed by the cache and returns the output of the new position
+            (of shape `(batch_size, dmodel)`) followed by the updated cache.
+            Otherwise, it takes the query followed by the cache and returns
+            the output.
+        """
+        if update_cache is None:
+            update_cache = self.mask_future
+        if getattr(self, '_step_functions', None) is None:
+            self._step_functions = {}
+        if update_cache in self._step_functions:
+            return self._step_functions[update_cache]
+
+        query = K.placeholder(ndim=2)
+        cache = [K.placeholder(ndim=3), K.placeholder(ndim=3), K.placeholder(ndim=2)]
+        cached_keys, cached_values, cached_key_masks = cache
+        inputs = [query]
+        mask_query = K.cast(K.not_equal(K.sum(K.abs(query), axis=-1), 0), K.dtype(query))
+        query *= K.expand_dims(mask_query)
+        if update_cache:
+            key = K.placeholder(ndim=2)
+            inputs.append(key)
+            mask_key = K.cast(K.not_equal(K.sum(K.abs(key), axis=-1), 0), K.dtype(key))
+            key *= K.expand_dims(mask_key)
+            new_keys, new_values = [K.expand_dims(self.activation(K.dot(key, l)), 1)
+                                    for l in (self.linear_k, self.linear_v)]
+            cached_keys = K.concatenate([cached_keys, new_keys], axis=1)
+            cached_values = K.concatenate([cached_values, new_values], axis=1)
+            cached_key_masks = K.concatenate([cached_key_masks,
+                                              K.expand_dims(K.sign(K.abs(K.sum(key, axis=-1))))], axis=1)
+        inputs += cache
+
+        # Scaled-Dot-Product Attention over the cached positions
+        queries = K.reshape(self.activation(K.dot(query, self.linear_q)), (-1, self.n_heads, self.dk))  # (N, h, dk)
+        keys = K.reshape(cached_keys, (K.shape(cached_keys)[0], -1, self.n_heads, self.dk))  # (N, t, h, dk)
+        values = K.reshape(cached_values, (K.shape(cached_values)[0], -1, self.n_heads, self.dv))  # (N, t, h, dv)
+        scores = K.sum(K.expand_dims(queries, 1) * keys, axis=-1)  # (N, t, h)
+        scores /= K.sqrt(K.cast(self.dk, K.floatx()))
+        key_masks = K.expand_dims(cached_key_masks)  # (N, t, 1)
+        scores = scores * key_masks + PADDING_VALUE * (1. - key_masks)
+        alphas = K.exp(scores - K.max(scores, axis=1, keepdims=True))
+        alphas /= K.sum(alphas, axis=1, keepdims=True)  # (N, t, h)
+        attended_heads = K.sum(K.expand_dims(alphas) * values, axis=1)  # (N, h, dv)
+        attended_heads = K.reshape(attended_heads, (-1, self.n_heads * self.dv))
+        attended_heads *= K.expand_dims(K.sign(K.abs(K.sum(query, axis=-1))))  # Query Masking
+        output = self.activation(K.dot(attended_heads, self.linear_o))
+
+        if update_cache:
+            outputs = [output, cached_keys, cached_values, cached_key_masks]
+        else:
+            outputs = [output]
+        self._step_functions[update_cache] = K.function(inputs, outputs)
+        return self._step_functions[update_cache]
+
+    @staticmethod
+    def reorder_cache(cache, indices):
+        """Gathers the entries `indices` of a key/value cache (e.g. beam backpointers).
+
+        # Arguments
+            cache: List of Numpy arrays, as returned by the step function.
+            indices: Integer array with the entry of the cache to take for
+                each new entry.
+
+        # Returns
+            The reordered cache.
+        """
+        return [c[indices] for c in cache]
+
     def compute_mask(self, inputs, mask=None):
         query = inputs[0]
         if mask[0] is not None:
@@ -191,7 +406,8 @@ class MultiHeadAttention(Layer):
             'kernel_constraint': constraints.serialize(self.kernel_constraint),
             'activity_regularizer': regularizers.serialize(self.activity_regularizer),
             'dropout': self.dropout,
-            'mask_future': self.mask_future
+            'mask_future': self.mask_future,
+            'chunk_size': self.chunk_size
         }
         base_config = super(MultiHeadAttention, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
@@ -5,6 +5,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
+
 from .. import backend as K
 from .. import activations
 from .. import initializers
@@ -2383,12 +2385,19 @@ class CompactBilinearPooling(Layer):
     '''Compact Bilinear Pooling
     # Arguments:
         d: dimension of the compact bilinear feature
+        conv_type: how the count sketches of the inputs are convolved (circular convolution).
+            'conv': direct convolution, O(d^2) (Theano backend only).
+            'fft': product in the frequency domain, O(d log d).
 
     # References:
         - [Multimodal Compact Bilinear Pooling for Visual Question Answering and Visual Grounding](http://arxiv.org/pdf/1606.01847v2.pdf)
     '''
 
     def __init__(self, d, return_extra=False, conv_type='conv', **kwargs):
+        if conv_type == 'conv' and K.backend() != 'theano':
+            raise ValueError('CompactBilinearPooling with `conv_type="conv"` '
+                             'requires the Theano backend (current backend: ' +
+                             K.backend() + '). Use `conv_type="fft"` instead.')
         self.h = [None, None]
         self.s = [None, None]
         self.return_extra = return_extra
@@ -2422,6 +2431,8 @@ class CompactBilinearPooling(Layer):
                 self.s[i] = (np.floor(np.random.uniform(0, 2, size=(input_shapes[i][1],))) * 2 - 1).astype('int64')
                 self.s[i] = K.variable(self.s[i], dtype='int64', name='s' + str(i))
         self.non_trainable_weights = [self.h[i] for i in range(self.nmodes)] + [self.s[i] for i in range(self.nmodes)]
+        # Sparse projections of the count sketches, built once
+        self.sketch_matrices = [K.count_sketch_matrix(self.h[i], self.s[i], self.d) for i in range(self.nmodes)]
 
         self.built = True
 
@@ -2441,30 +2452,21 @@ class CompactBilinearPooling(Layer):
 
         if self.conv_type == 'conv':
             for i in range(self.nmodes):
-                v[i] = K.count_sketch(self.h[i], self.s[i], x[i], self.d)
-            out = K.conv1d(v[0], v[1])
+                v[i] = K.count_sketch(self.h[i], self.s[i], x[i], self.d,
+                                      sketch_matrix=self.sketch_matrices[i])
+            out = K.scan_conv1d(v[0], v[1], circular=True)
 
         elif self.conv_type == 'fft':
-            raise NotImplementedError()
+            # Circular convolution as an elementwise product in the frequency domain
             fft_v = [[]] * self.nmodes
-            acum_fft = 1.0
             for i in range(self.nmodes):
-                '''
-                v[i] = K.count_sketch(self.h[i], self.s[i], x[i], self.d)
+                v[i] = K.count_sketch(self.h[i], self.s[i], x[i], self.d,
+                                      sketch_matrix=self.sketch_matrices[i])
                 fft_v[i] = K.fft(v[i])
-                acum_fft *= fft_v[i]
-                '''
-                v[i] = K.count_sketch(self.h[i], self.s[i], x[i], self.d)
-                zeros_pad = K.zeros_like(v[i])[:, :-1]
-                v_in = K.concatenate([zeros_pad,
-                                      v[i],
-                                      zeros_pad], axis=1)
-                fft_v[i] = K.fft(v_in)
-                prev = K.cast(K.floor(self.d / 2.), 'int16')
-                post = K.cast(K.ceil(self.d / 2.), 'int16')
-                acum_fft *= K.concatenate((fft_v[i][:, -post:], fft_v[i][:, :prev]), axis=1)
-
-            out = K.cast(K.ifft(acum_fft), dtype='float32')
+            acum_fft = fft_v[0]
+            for i in range(1, self.nmodes):
+                acum_fft = K.complex_multiply(acum_fft, fft_v[i])
+            out = K.cast(K.ifft(acum_fft, is_odd=self.d % 2 == 1), dtype=K.floatx())
 
         else:
             raise NotImplementedError()
@@ -2500,7 +2502,7 @@ class CompactBilinearPooling(Layer):
         base_config = super(CompactBilinearPooling, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
-    def get_output_shape_for(self, input_shape):
+    def compute_output_shape(self, input_shape):
         assert type(input_shape) is list  # must have mutiple input shape tuples
         shapes = []
         shapes.append(tuple([input_shape[0][0], self.d] + list(input_shape[0][2:])))
@@ -2558,9 +2560,9 @@ class BilinearPooling(Layer):
 
     def multimodal_bilinear(self, x):
         v = [[]] * self.nmodes
-        acum_fft = 1.0
-        for i in range(self.nmodes):
-            acum_fft = acum_fft * K.fft(x[i])
+        acum_fft = K.fft(x[0])
+        for i in range(1, self.nmodes):
+            acum_fft = K.complex_multiply(acum_fft, K.fft(x[i]))
         return K.cast(K.ifft(acum_fft), dtype='float32')
 
     def call(self, x, mask=None):
@@ -2615,6 +2617,8 @@ class CountSketch(Layer):
                 if self.s[i] is None:
                     self.s[i] = (np.floor(np.random.uniform(0, 2, size=(input_shapes[i][1],))) * 2 - 1).astype('int64')
                     self.s[i] = K.variable(self.s[i], dtype='int64', name='s' + str(i))
+            # Sparse projections of the count sketches, built once
+            self.sketch_matrices = [K.count_sketch_matrix(self.h[i], self.s[i], self.d) for i in range(self.nmodes)]
         self.built = True
 
     def compute_mask(self, input, input_mask=None):
@@ -2632,7 +2636,8 @@ class CountSketch(Layer):
     def compact(self, x):
         v = [[]] * self.nmodes
         for i in range(self.nmodes):
-            v[i] = K.count_sketch(self.h[i], self.s[i], x[i], self.d)
+            v[i] = K.count_sketch(self.h[i], self.s[i], x[i], self.d,
+                                  sketch_matrix=self.sketch_matrices[i])
         return v
 
     def call(self, x, mask=None):
@@ -2649,7 +2654,7 @@ class CountSketch(Layer):
         base_config = super(CountSketch, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
-    def get_output_shape_for(self, input_shape):
+    def compute_output_shape(self, input_shape):
         assert type(input_shape) is list  # must have mutiple input shape tuples
         shapes = []
         for s in input_shape:
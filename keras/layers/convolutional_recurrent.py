@@ -531,6 +531,13 @@ class ConvLSTM2DCell(Layer):
         recurrent_dropout: Float between 0 and 1.
             Fraction of the units to drop for
             the linear transformation of the recurrent state.
+        implementation: Implementation mode, either 1 or 2.
+            Mode 1 runs one input and one recurrent convolution per gate
+            (8 convolutions per timestep), whereas mode 2 runs a single
+            input and a single recurrent convolution with `4 * filters`
+            outputs and splits them between the gates. Both modes use
+            the same weights. With dropout, mode 2 uses the same
+            dropout mask for all the gates.
     """
 
     def __init__(self, filters,
@@ -554,6 +561,7 @@ class ConvLSTM2DCell(Layer):
                  bias_constraint=None,
                  dropout=0.,
                  recurrent_dropout=0.,
+                 implementation=1,
                  **kwargs):
         super(ConvLSTM2DCell, self).__init__(**kwargs)
         self.filters = filters
@@ -589,6 +597,7 @@ class ConvLSTM2DCell(Layer):
             recurrent_dropout = 0.
         self.dropout = min(1., max(0., dropout))
         self.recurrent_dropout = min(1., max(0., recurrent_dropout))
+        self.implementation = implementation
         self.state_size = (self.filters, self.filters)
         self._dropout_mask = None
         self._recurrent_dropout_mask = None
@@ -680,49 +689,74 @@ class ConvLSTM2DCell(Layer):
         h_tm1 = states[0]  # previous memory state
         c_tm1 = states[1]  # previous carry state
 
-        if 0 < self.dropout < 1.:
-            inputs_i = inputs * dp_mask[0]
-            inputs_f = inputs * dp_mask[1]
-            inputs_c = inputs * dp_mask[2]
-            inputs_o = inputs * dp_mask[3]
-        else:
-            inputs_i = inputs
-            inputs_f = inputs
-            inputs_c = inputs
-            inputs_o = inputs
-
-        if 0 < self.recurrent_dropout < 1.:
-            h_tm1_i = h_tm1 * rec_dp_mask[0]
-            h_tm1_f = h_tm1 * rec_dp_mask[1]
-            h_tm1_c = h_tm1 * rec_dp_mask[2]
-            h_tm1_o = h_tm1 * rec_dp_mask[3]
+        if self.implementation == 1:
+            if 0 < self.dropout < 1.:
+                inputs_i = inputs * dp_mask[0]
+                inputs_f = inputs * dp_mask[1]
+                inputs_c = inputs * dp_mask[2]
+                inputs_o = inputs * dp_mask[3]
+            else:
+                inputs_i = inputs
+                inputs_f = inputs
+                inputs_c = inputs
+                inputs_o = inputs
+
+            if 0 < self.recurrent_dropout < 1.:
+                h_tm1_i = h_tm1 * rec_dp_mask[0]
+                h_tm1_f = h_tm1 * rec_dp_mask[1]
+                h_tm1_c = h_tm1 * rec_dp_mask[2]
+                h_tm1_o = h_tm1 * rec_dp_mask[3]
+            else:
+                h_tm1_i = h_tm1
+                h_tm1_f = h_tm1
+                h_tm1_c = h_tm1
+                h_tm1_o = h_tm1
+
+            x_i = self.input_conv(inputs_i, self.kernel_i, self.bias_i,
+                                  padding=self.padding)
+            x_f = self.input_conv(inputs_f, self.kernel_f, self.bias_f,
+                                  padding=self.padding)
+            x_c = self.input_conv(inputs_c, self.kernel_c, self.bias_c,
+                                  padding=self.padding)
+            x_o = self.input_conv(inputs_o, self.kernel_o, self.bias_o,
+                                  padding=self.padding)
+            h_i = self.recurrent_conv(h_tm1_i,
+                                      self.recurrent_kernel_i)
+            h_f = self.recurrent_conv(h_tm1_f,
+                                      self.recurrent_kernel_f)
+            h_c = self.recurrent_conv(h_tm1_c,
+                                      self.recurrent_kernel_c)
+            h_o = self.recurrent_conv(h_tm1_o,
+                                      self.recurrent_kernel_o)
+
+            z0 = x_i + h_i
+            z1 = x_f + h_f
+            z2 = x_c + h_c
+            z3 = x_o + h_o
         else:
-            h_tm1_i = h_tm1
-            h_tm1_f = h_tm1
-            h_tm1_c = h_tm1
-            h_tm1_o = h_tm1
-
-        x_i = self.input_conv(inputs_i, self.kernel_i, self.bias_i,
-                              padding=self.padding)
-        x_f = self.input_conv(inputs_f, self.kernel_f, self.bias_f,
-                              padding=self.padding)
-        x_c = self.input_conv(inputs_c, self.kernel_c, self.bias_c,
-                              padding=self.padding)
-        x_o = self.input_conv(inputs_o, self.kernel_o, self.bias_o,
-                              padding=self.padding)
-        h_i = self.recurrent_conv(h_tm1_i,
-                                  self.recurrent_kernel_i)
-        h_f = self.recurrent_conv(h_tm1_f,
-                                  self.recurrent_kernel_f)
-        h_c = self.recurrent_conv(h_tm1_c,
-                                  self.recurrent_kernel_c)
-        h_o = self.recurrent_conv(h_tm1_o,
-                                  self.recurrent_kernel_o)
-
-        i = self.recurrent_activation(x_i + h_i)
-        f = self.recurrent_activation(x_f + h_f)
-        c = f * c_tm1 + i * self.activation(x_c + h_c)
-        o = self.recurrent_activation(x_o + h_o)
+            if 0 < self.dropout < 1.:
+                inputs *= dp_mask[0]
+            if 0 < self.recurrent_dropout < 1.:
+                h_tm1 *= rec_dp_mask[0]
+            z = (self.input_conv(inputs, self.kernel, self.bias,
+                                 padding=self.padding) +
+                 self.recurrent_conv(h_tm1, self.recurrent_kernel))
+
+            if self.data_format == 'channels_first':
+                z0 = z[:, :self.filters]
+                z1 = z[:, self.filters: 2 * self.filters]
+                z2 = z[:, 2 * self.filters: 3 * self.filters]
+                z3 = z[:, 3 * self.filters:]
+            else:
+                z0 = z[:, :, :, :self.filters]
+                z1 = z[:, :, :, self.filters: 2 * self.filters]
+                z2 = z[:, :, :, 2 * self.filters: 3 * self.filters]
+                z3 = z[:, :, :, 3 * self.filters:]
+
+        i = self.recurrent_activation(z0)
+        f = self.recurrent_activation(z1)
+        c = f * c_tm1 + i * self.activation(z2)
+        o = self.recurrent_activation(z3)
         h = o * self.activation(c)
 
         if 0 < self.dropout + self.recurrent_dropout:
@@ -768,7 +802,8 @@ class ConvLSTM2DCell(Layer):
                   'recurrent_constraint': constraints.serialize(self.recurrent_constraint),
                   'bias_constraint': constraints.serialize(self.bias_constraint),
                   'dropout': self.dropout,
-                  'recurrent_dropout': self.recurrent_dropout}
+                  'recurrent_dropout': self.recurrent_dropout,
+                  'implementation': self.implementation}
         base_config = super(ConvLSTM2DCell, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
@@ -856,6 +891,12 @@ class ConvLSTM2D(ConvRNN2D):
         recurrent_dropout: Float between 0 and 1.
             Fraction of the units to drop for
             the linear transformation of the recurrent state.
+        implementation: Implementation mode, either 1 or 2.
+            Mode 1 runs one input and one recurrent convolution per gate,
+            whereas mode 2 runs a single input and a single recurrent
+            convolution with `4 * filters` outputs. These modes will
+            have different performance profiles on different hardware
+            and for different applications.
 
     # Input shape
         - if data_format='channels_first'
@@ -919,6 +960,7 @@ class ConvLSTM2D(ConvRNN2D):
                  stateful=False,
                  dropout=0.,
                  recurrent_dropout=0.,
+                 implementation=1,
                  **kwargs):
         cell = ConvLSTM2DCell(filters=filters,
                               kernel_size=kernel_size,
@@ -940,7 +982,8 @@ class ConvLSTM2D(ConvRNN2D):
                               recurrent_constraint=recurrent_constraint,
                               bias_constraint=bias_constraint,
                               dropout=dropout,
-                              recurrent_dropout=recurrent_dropout)
+                              recurrent_dropout=recurrent_dropout,
+                              implementation=implementation)
         super(ConvLSTM2D, self).__init__(cell,
                                          return_sequences=return_sequences,
                                          go_backwards=go_backwards,
@@ -1038,6 +1081,10 @@ class ConvLSTM2D(ConvRNN2D):
     def recurrent_dropout(self):
         return self.cell.recurrent_dropout
 
+    @property
+    def implementation(self):
+        return self.cell.implementation
+
     def get_config(self):
         config = {'filters': self.filters,
                   'kernel_size': self.kernel_size,
@@ -1060,7 +1107,8 @@ class ConvLSTM2D(ConvRNN2D):
                   'recurrent_constraint': constraints.serialize(self.recurrent_constraint),
                   'bias_constraint': constraints.serialize(self.bias_constraint),
                   'dropout': self.dropout,
-                  'recurrent_dropout': self.recurrent_dropout}
+                  'recurrent_dropout': self.recurrent_dropout,
+                  'implementation': self.implementation}
         base_config = super(ConvLSTM2D, self).get_config()
         del base_config['cell']
         return dict(list(base_config.items()) + list(config.items()))
@@ -5,6 +5,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
+
 from .. import backend as K
 from .. import activations
 from .. import initializers
@@ -16,6 +18,68 @@ from ..utils import conv_utils
 from ..legacy import interfaces
 
 
+def _local_patch_indices(input_shape, kernel_size, strides, output_shape,
+                         data_format):
+    """Positions in the flattened input of the patch of each output position.
+
+    # Returns
+        Numpy array of shape `(num_outputs, patch_size)`, with the outputs
+        and the patches in the order of `K.local_conv1d` / `K.local_conv2d`.
+    """
+    inputs = np.arange(np.prod(input_shape)).reshape(input_shape)
+    patches = []
+    for position in np.ndindex(*output_shape):
+        window = [slice(i * stride, i * stride + size)
+                  for i, stride, size in zip(position, strides, kernel_size)]
+        if data_format == 'channels_first':
+            window = [slice(None)] + window
+        patches.append(inputs[tuple(window)].reshape(-1))
+    return np.stack(patches)
+
+
+def _local_matmul_indices(patch_indices, input_size, filters, implementation):
+    """Layout of the kernel of a locally-connected layer in a 2D matrix.
+
+    The matrix has one row per input value and one column per output value
+    (output positions first, then filters).
+
+    # Returns
+        If `implementation` is 2, an integer array of the shape of the
+        matrix, with `1 + ` the position of each entry in the flattened
+        kernel (`0` for the entries outside the patches).
+        If it is 3, a tuple `(order, indices)`: the positions in the
+        flattened kernel of the nonzero entries, and their (row, column)
+        in the matrix, sorted by row and then by column.
+    """
+    num_outputs, patch_size = patch_indices.shape
+    rows = np.repeat(patch_indices.reshape(-1), filters)
+    cols = (np.arange(num_outputs * patch_size * filters) % filters +
+            np.repeat(np.arange(num_outputs) * filters, patch_size * filters))
+    if implementation == 2:
+        kernel_idxs = np.zeros((input_size, num_outputs * filters),
+                               dtype='int32')
+        kernel_idxs[rows, cols] = np.arange(1, len(rows) + 1)
+        return kernel_idxs
+    order = np.lexsort((cols, rows))
+    return order, np.stack([rows[order], cols[order]], axis=1)
+
+
+def _local_matmul(inputs, kernel, matmul_indices, implementation,
+                  input_size, output_shape):
+    """Locally-connected layer as a single (dense or sparse) matmul."""
+    x = K.batch_flatten(inputs)
+    kernel = K.flatten(kernel)
+    if implementation == 2:
+        kernel = K.gather(K.concatenate([K.zeros_like(kernel[:1]), kernel]),
+                          matmul_indices)
+        output = K.dot(x, kernel)
+    else:
+        order, indices = matmul_indices
+        output = K.sparse_matmul(x, indices, K.gather(kernel, order),
+                                 (input_size, int(np.prod(output_shape))))
+    return K.reshape(output, (-1,) + tuple(output_shape))
+
+
 class LocallyConnected1D(Layer):
     """Locally-connected layer for 1D inputs.
 
@@ -68,6 +132,17 @@ class LocallyConnected1D(Layer):
             (see [constraints](../constraints.md)).
         bias_constraint: Constraint function applied to the bias vector
             (see [constraints](../constraints.md)).
+        implementation: implementation mode, either `1`, `2` or `3`.
+            `1` loops over the output positions, with one slice of the
+            inputs per position: it uses the least memory but builds a
+            graph that grows with the output size.
+            `2` applies the layer as a single matmul with a dense kernel
+            matrix, zero outside the patches: it is fast for small inputs
+            but uses `input_size * output_size` memory.
+            `3` applies the layer as a single sparse matmul (TensorFlow and
+            Theano backends only): its memory grows with the number of
+            weights and it is usually the fastest for large inputs.
+            All the modes use the same weights.
 
     # Input shape
         3D tensor with shape: `(batch_size, steps, input_dim)`
@@ -92,6 +167,7 @@ class LocallyConnected1D(Layer):
                  activity_regularizer=None,
                  kernel_constraint=None,
                  bias_constraint=None,
+                 implementation=1,
                  **kwargs):
         super(LocallyConnected1D, self).__init__(**kwargs)
         self.filters = filters
@@ -111,6 +187,14 @@ class LocallyConnected1D(Layer):
         self.activity_regularizer = regularizers.get(activity_regularizer)
         self.kernel_constraint = constraints.get(kernel_constraint)
         self.bias_constraint = constraints.get(bias_constraint)
+        if implementation not in (1, 2, 3):
+            raise ValueError('Invalid implementation for LocallyConnected1D '
+                             '(1, 2 or 3): ' + str(implementation))
+        if implementation == 3 and K.backend() == 'cntk':
+            raise ValueError('LocallyConnected1D implementation 3 needs a '
+                             'sparse matmul, which the CNTK backend does not '
+                             'have: use implementation 1 or 2.')
+        self.implementation = implementation
         self.input_spec = InputSpec(ndim=3)
 
     def build(self, input_shape):
@@ -140,6 +224,18 @@ class LocallyConnected1D(Layer):
                 constraint=self.bias_constraint)
         else:
             self.bias = None
+        self.input_size = input_shape[1] * input_dim
+        if self.implementation != 1:
+            patch_indices = _local_patch_indices(input_shape[1:],
+                                                 self.kernel_size,
+                                                 self.strides,
+                                                 (output_length,),
+                                                 'channels_last')
+            self.matmul_indices = _local_matmul_indices(patch_indices,
+                                                        self.input_size,
+                                                        self.filters,
+                                                        self.implementation)
+        self.output_length = output_length
         self.input_spec = InputSpec(ndim=3, axes={2: input_dim})
         self.built = True
 
@@ -151,7 +247,12 @@ class LocallyConnected1D(Layer):
         return (input_shape[0], length, self.filters)
 
     def call(self, inputs):
-        output = K.local_conv1d(inputs, self.kernel, self.kernel_size, self.strides)
+        if self.implementation == 1:
+            output = K.local_conv1d(inputs, self.kernel, self.kernel_size, self.strides)
+        else:
+            output = _local_matmul(inputs, self.kernel, self.matmul_indices,
+                                   self.implementation, self.input_size,
+                                   (self.output_length, self.filters))
         if self.use_bias:
             output = K.bias_add(output, self.bias)
         if self.activation is not None:
@@ -172,7 +273,8 @@ class LocallyConnected1D(Layer):
             'bias_regularizer': regularizers.serialize(self.bias_regularizer),
             'activity_regularizer': regularizers.serialize(self.activity_regularizer),
             'kernel_constraint': constraints.serialize(self.kernel_constraint),
-            'bias_constraint': constraints.serialize(self.bias_constraint)
+            'bias_constraint': constraints.serialize(self.bias_constraint),
+            'implementation': self.implementation
         }
         base_config = super(LocallyConnected1D, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
@@ -244,6 +346,17 @@ class LocallyConnected2D(Layer):
             (see [constraints](../constraints.md)).
         bias_constraint: Constraint function applied to the bias vector
             (see [constraints](../constraints.md)).
+        implementation: implementation mode, either `1`, `2` or `3`.
+            `1` loops over the output positions, with one slice of the
+            inputs per position: it uses the least memory but builds a
+            graph that grows with the output size.
+            `2` applies the layer as a single matmul with a dense kernel
+            matrix, zero outside the patches: it is fast for small inputs
+            but uses `input_size * output_size` memory.
+            `3` applies the layer as a single sparse matmul (TensorFlow and
+            Theano backends only): its memory grows with the number of
+            weights and it is usually the fastest for large inputs.
+            All the modes use the same weights.
 
     # Input shape
         4D tensor with shape:
@@ -274,6 +387,7 @@ class LocallyConnected2D(Layer):
                  activity_regularizer=None,
                  kernel_constraint=None,
                  bias_constraint=None,
+                 implementation=1,
                  **kwargs):
         super(LocallyConnected2D, self).__init__(**kwargs)
         self.filters = filters
@@ -293,6 +407,14 @@ class LocallyConnected2D(Layer):
         self.activity_regularizer = regularizers.get(activity_regularizer)
         self.kernel_constraint = constraints.get(kernel_constraint)
         self.bias_constraint = constraints.get(bias_constraint)
+        if implementation not in (1, 2, 3):
+            raise ValueError('Invalid implementation for LocallyConnected2D '
+                             '(1, 2 or 3): ' + str(implementation))
+        if implementation == 3 and K.backend() == 'cntk':
+            raise ValueError('LocallyConnected2D implementation 3 needs a '
+                             'sparse matmul, which the CNTK backend does not '
+                             'have: use implementation 1 or 2.')
+        self.implementation = implementation
         self.input_spec = InputSpec(ndim=4)
 
     def build(self, input_shape):
@@ -329,6 +451,17 @@ class LocallyConnected2D(Layer):
                                         constraint=self.bias_constraint)
         else:
             self.bias = None
+        self.input_size = input_row * input_col * input_filter
+        if self.implementation != 1:
+            patch_indices = _local_patch_indices(input_shape[1:],
+                                                 self.kernel_size,
+                                                 self.strides,
+                                                 (output_row, output_col),
+                                                 self.data_format)
+            self.matmul_indices = _local_matmul_indices(patch_indices,
+                                                        self.input_size,
+                                                        self.filters,
+                                                        self.implementation)
         if self.data_format == 'channels_first':
             self.input_spec = InputSpec(ndim=4, axes={1: input_filter})
         else:
@@ -354,12 +487,19 @@ class LocallyConnected2D(Layer):
             return (input_shape[0], rows, cols, self.filters)
 
     def call(self, inputs):
-        output = K.local_conv2d(inputs,
-                                self.kernel,
-                                self.kernel_size,
-                                self.strides,
-                                (self.output_row, self.output_col),
-                                self.data_format)
+        if self.implementation == 1:
+            output = K.local_conv2d(inputs,
+                                    self.kernel,
+                                    self.kernel_size,
+                                    self.strides,
+                                    (self.output_row, self.output_col),
+                                    self.data_format)
+        else:
+            output = _local_matmul(inputs, self.kernel, self.matmul_indices,
+                                   self.implementation, self.input_size,
+                                   (self.output_row, self.output_col, self.filters))
+            if self.data_format == 'channels_first':
+                output = K.permute_dimensions(output, (0, 3, 1, 2))
 
         if self.use_bias:
             output = K.bias_add(output, self.bias, data_format=self.data_format)
@@ -382,7 +522,8 @@ class LocallyConnected2D(Layer):
             'bias_regularizer': regularizers.serialize(self.bias_regularizer),
             'activity_regularizer': regularizers.serialize(self.activity_regularizer),
             'kernel_constraint': constraints.serialize(self.kernel_constraint),
-            'bias_constraint': constraints.serialize(self.bias_constraint)
+            'bias_constraint': constraints.serialize(self.bias_constraint),
+            'implementation': self.implementation
         }
         base_config = super(LocallyConnected2D, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
@@ -82,8 +82,8 @@ class Scale(Layer):
     def __init__(self, weights=None, axis=-1, momentum=0.9, beta_init='zero', gamma_init='one', **kwargs):
         self.momentum = momentum
         self.axis = axis
-        self.beta_init = initializations.get(beta_init)
-        self.gamma_init = initializations.get(gamma_init)
+        self.beta_init = initializers.get(beta_init)
+        self.gamma_init = initializers.get(gamma_init)
         self.initial_weights = weights
         super(Scale, self).__init__(**kwargs)
 
@@ -91,13 +91,17 @@ class Scale(Layer):
         self.input_spec = [InputSpec(shape=input_shape)]
         shape = (input_shape[self.axis],)
 
-        self.gamma = self.gamma_init(shape, name='{}_gamma'.format(self.name))
-        self.beta = self.beta_init(shape, name='{}_beta'.format(self.name))
-        self.trainable_weights = [self.gamma, self.beta]
+        self.gamma = self.add_weight(shape=shape,
+                                     initializer=self.gamma_init,
+                                     name='gamma')
+        self.beta = self.add_weight(shape=shape,
+                                    initializer=self.beta_init,
+                                    name='beta')
 
         if self.initial_weights is not None:
             self.set_weights(self.initial_weights)
             del self.initial_weights
+        self.built = True
 
     def call(self, x, mask=None):
         input_shape = self.input_spec[0].shape
@@ -108,7 +112,10 @@ class Scale(Layer):
         return out
 
     def get_config(self):
-        config = {"momentum": self.momentum}
+        config = {"momentum": self.momentum,
+                  "axis": self.axis,
+                  "beta_init": initializers.serialize(self.beta_init),
+                  "gamma_init": initializers.serialize(self.gamma_init)}
         base_config = super(Scale, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
@@ -371,3 +378,74 @@ class BatchNormalization(Layer):
 
     def compute_output_shape(self, input_shape):
         return input_shape
+
+
+class LRN(Layer):
+    """Local Response Normalization (LRN) across channels.
+
+    Performs a kind of "lateral inhibition" by normalizing over local input
+    regions that extend across nearby channels, but have no spatial extent
+    (i.e., they have shape `n x 1 x 1`). Each input value is divided by
+    `(k + (alpha / n) * sum_i(x_i ** 2)) ** beta`, where the sum is taken
+    over the region centered at that value (zero padding is added where
+    necessary), as in the Caffe `LRN` layer.
+    Only supported with the TensorFlow and Theano backends.
+
+    # Arguments
+        alpha: scaling parameter.
+        k: offset for the scale.
+        beta: the exponent.
+        n: local_size, number of channels of each local region.
+        data_format: A string,
+            one of `"channels_last"` or `"channels_first"`.
+            It defaults to the `image_data_format` value found in your
+            Keras config file at `~/.keras/keras.json`.
+            If you never set it, then it will be "channels_last".
+            The configs saved without it, from the `LRN` layers that
+            preceded this argument, are loaded as `"channels_first"`.
+
+    # Input shape
+        4D tensor with arbitrary shape.
+
+    # Output shape
+        Same shape as input.
+
+    # References
+        - [ImageNet Classification with Deep Convolutional Neural Networks](https://papers.nips.cc/paper/4824-imagenet-classification-with-deep-convolutional-neural-networks.pdf)
+    """
+
+    def __init__(self, alpha=0.0001, k=1, beta=0.75, n=5, data_format=None, **kwargs):
+        super(LRN, self).__init__(**kwargs)
+        self.alpha = alpha
+        self.k = k
+        self.beta = beta
+        self.n = n
+        self.data_format = K.normalize_data_format(data_format)
+        self.input_spec = InputSpec(ndim=4)
+
+    def call(self, inputs):
+        return K.local_response_normalization(inputs,
+                                              alpha=self.alpha,
+                                              k=self.k,
+                                              beta=self.beta,
+                                              n=self.n,
+                                              data_format=self.data_format)
+
+    def compute_output_shape(self, input_shape):
+        return input_shape
+
+    def get_config(self):
+        config = {'alpha': self.alpha,
+                  'k': self.k,
+                  'beta': self.beta,
+                  'n': self.n,
+                  'data_format': self.data_format}
+        base_config = super(LRN, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+    @classmethod
+    def from_config(cls, config):
+        # The layers saved before `data_format` always normalized over axis 1.
+        if 'data_format' not in config:
+            config['data_format'] = 'channels_first'
+        return cls(**config)
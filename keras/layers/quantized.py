@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Layers storing their weight matrices as int8, for inference.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+from .. import backend as K
+from .core import Dense
+from .embeddings import Embedding
+from .recurrent import AttLSTMCond
+
+
+def quantize_weights(value, axis=-1):
+    """Quantizes an array to int8, with one scale per index along an axis.
+
+    The quantization is symmetric: `value ~= quantized * scale`, with
+    `quantized` in `[-127, 127]`.
+
+    # Arguments
+        value: Numpy array.
+        axis: Integer, the axis of the scales (e.g. the output units
+            of a kernel).
+
+    # Returns
+        A tuple `(quantized, scale)`: the int8 array, of the shape of
+        `value`, and the float scales, of shape `(value.shape[axis],)`.
+    """
+    value = np.asarray(value)
+    axis = axis % value.ndim
+    reduction_axes = tuple(i for i in range(value.ndim) if i != axis)
+    scale = np.max(np.abs(value), axis=reduction_axes) / 127.
+    scale[scale == 0] = 1.
+    broadcast_shape = [1] * value.ndim
+    broadcast_shape[axis] = -1
+    quantized = np.round(value / np.reshape(scale, broadcast_shape))
+    return (np.clip(quantized, -127, 127).astype('int8'),
+            scale.astype(K.floatx()))
+
+
+class _Int8WeightsMixin(object):
+    """Stores the weight matrices of a layer as int8 with per-channel scales.
+
+    Each weight of 2 or more dimensions created with `add_weight` is
+    replaced by a (non-trainable) int8 variable and a vector of scales
+    along `_quantization_axis`. The layer computes with the dequantized
+    tensor instead of the variable. The regularizers and constraints of
+    these weights are ignored: the layer is meant for inference.
+    """
+
+    _quantization_axis = -1
+
+    def add_weight(self,
+                   name,
+                   shape,
+                   dtype=None,
+                   initializer=None,
+                   regularizer=None,
+                   trainable=True,
+                   constraint=None):
+        if not hasattr(self, '_weight_layout'):
+            self._weight_layout = []
+            self._quantized_weights = {}
+        # e.g. the scalar `bias_ca` of an attention over a variable-length
+        # context, created with `shape=None`
+        if shape is None or len(shape) < 2:
+            weight = super(_Int8WeightsMixin, self).add_weight(
+                name, shape,
+                dtype=dtype,
+                initializer=initializer,
+                regularizer=regularizer,
+                trainable=trainable,
+                constraint=constraint)
+            self._weight_layout.append(([weight], None))
+            return weight
+
+        axis = self._quantization_axis % len(shape)
+        quantized = super(_Int8WeightsMixin, self).add_weight(
+            name + '_quantized', shape,
+            dtype='int8',
+            initializer=lambda shape, dtype=None: np.zeros(shape, dtype='int8'),
+            trainable=False)
+        scale = super(_Int8WeightsMixin, self).add_weight(
+            name + '_scale', (shape[axis],),
+            initializer='ones',
+            trainable=False)
+        self._weight_layout.append(([quantized, scale], axis))
+        self._quantized_weights[name] = (quantized, scale)
+        broadcast_shape = [1] * len(shape)
+        broadcast_shape[axis] = shape[axis]
+        return K.cast(quantized, K.floatx()) * K.reshape(scale, broadcast_shape)
+
+    def set_float_weights(self, weights):
+        """Sets the weights of the layer from those of its float version.
+
+        # Arguments
+            weights: List of Numpy arrays, as returned by `get_weights`
+                on the non-quantized layer.
+        """
+        if len(weights) != len(self._weight_layout):
+            raise ValueError('Layer ' + self.name + ' expects ' +
+                             str(len(self._weight_layout)) +
+                             ' float weights, but it received ' +
+                             str(len(weights)) + '.')
+        weight_value_tuples = []
+        for (variables, axis), value in zip(self._weight_layout, weights):
+            if axis is None:
+                weight_value_tuples.append((variables[0], value))
+            else:
+                weight_value_tuples += zip(variables, quantize_weights(value, axis))
+        K.batch_set_value(weight_value_tuples)
+
+
+class QuantizedDense(_Int8WeightsMixin, Dense):
+    """`Dense` layer with an int8 kernel with one scale per unit.
+
+    It takes the same arguments as `Dense`. See
+    `keras.utils.quantize_model` to convert a model.
+    """
+
+
+class QuantizedEmbedding(_Int8WeightsMixin, Embedding):
+    """`Embedding` layer with int8 embeddings with one scale per index.
+
+    Only the embeddings of the input indices are dequantized. It takes
+    the same arguments as `Embedding`. See `keras.utils.quantize_model`
+    to convert a model.
+    """
+
+    _quantization_axis = 0
+
+    def call(self, inputs):
+        if K.dtype(inputs) != 'int32':
+            inputs = K.cast(inputs, 'int32')
+        quantized, scale = self._quantized_weights['embeddings']
+        return (K.cast(K.gather(quantized, inputs), K.floatx()) *
+                K.expand_dims(K.gather(scale, inputs)))
+
+
+class QuantizedAttLSTMCond(_Int8WeightsMixin, AttLSTMCond):
+    """`AttLSTMCond` layer with int8 kernels with one scale per output unit.
+
+    The kernels are dequantized once per call, outside of the loop over
+    the timesteps. It takes the same arguments as `AttLSTMCond`. See
+    `keras.utils.quantize_model` to convert a model.
+    """
+
+    # The split and fused kernels are not converted into each other when
+    # loading quantized weights.
+    _fused_kernels = ()
@@ -46,8 +46,8 @@ def compute_attention(h_tm1, pctx_, context, att_dp_mask, attention_recurrent_ke
 
     # Arguments
         h_tm1: Last decoder state.
-        pctx_: Projected context (i.e. context * Ua + ba).
-        context: Original context.
+        pctx_: Projected context (i.e. context * Ua + ba), already masked.
+        context: Original context, already masked.
         att_dp_mask: Dropout for the attention MLP.
         attention_recurrent_kernel:  attention MLP weights.
         attention_context_wa:  attention MLP weights.
@@ -95,6 +95,206 @@ def compute_attention(h_tm1, pctx_, context, att_dp_mask, attention_recurrent_ke
     return ctx_, alphas
 
 
+def add_fused_kernel(layer, blocks, output_dim, name='fused_kernel'):
+    """Adds a kernel made of several kernels concatenated along their rows.
+
+    Multiplying the concatenation of the inputs of the kernels by the fused
+    kernel is equivalent to adding the products of each input by its own
+    kernel, but it runs a single (larger) matrix product.
+
+    # Arguments
+        layer: Layer to which the kernel is added.
+        blocks: List of tuples `(input_dim, initializer, regularizer, constraint)`,
+            one per kernel, in the order of the rows of the fused kernel.
+            Each block is initialized, regularized and constrained as if it
+            were a separate kernel.
+        output_dim: Number of columns of the kernels.
+        name: Name of the fused kernel.
+
+    # Returns
+        The fused kernel, of shape `(sum(input_dims), output_dim)`.
+    """
+    limits = np.cumsum([0] + [block[0] for block in blocks])
+    block_initializers = [initializers.get(block[1]) for block in blocks]
+    block_regularizers = [regularizers.get(block[2]) for block in blocks]
+    block_constraints = [constraints.get(block[3]) for block in blocks]
+
+    def initializer(shape, dtype=None):
+        values = []
+        for block, block_initializer in zip(blocks, block_initializers):
+            value = block_initializer((block[0], output_dim), dtype=dtype)
+            if isinstance(value, np.ndarray):  # E.g. `Orthogonal`
+                value = K.constant(value, dtype=dtype)
+            values.append(value)
+        return K.concatenate(values, axis=0)
+
+    constraint = None
+    if any(block_constraint is not None for block_constraint in block_constraints):
+        def constraint(kernel):
+            return K.concatenate([kernel[start:end] if block_constraint is None
+                                  else block_constraint(kernel[start:end])
+                                  for start, end, block_constraint in zip(limits[:-1], limits[1:],
+                                                                          block_constraints)],
+                                 axis=0)
+
+    kernel = layer.add_weight(shape=(int(limits[-1]), output_dim),
+                              name=name,
+                              initializer=initializer,
+                              constraint=constraint)
+    for start, end, block_regularizer in zip(limits[:-1], limits[1:], block_regularizers):
+        if block_regularizer is not None:
+            with K.name_scope('weight_regularizer'):
+                layer.add_loss(block_regularizer(kernel[start:end]))
+    return kernel
+
+
+class _IncrementalDecodingMixin(object):
+    """Single-step decoding API of the attention-conditional recurrent layers.
+
+    The constants that only depend on the source contexts (projected contexts,
+    contexts and context masks) are computed once per source sentence by the
+    function returned by `get_context_function`. Then, the function returned by
+    `get_step_function` runs a single timestep of the layer from the cached
+    constants, so the cost of decoding a token does not depend on the length of
+    the target prefix.
+
+    # Example
+
+    ```python
+        context_function = layer.get_context_function()
+        step_function = layer.get_step_function()
+        # Once per source sentence
+        cached_context = context_function([context, mask_context])
+        # Once per timestep
+        h, c, ctx, alphas = step_function([prev_word_emb, h, c] + cached_context)
+    ```
+    """
+
+    # Attributes in which `call` stores the contexts of the layer.
+    _context_attributes = ('context',)
+    # Number of recurrent states (`h` or `h` and `c`) of the layer.
+    _num_recurrent_states = 2
+
+    def _get_inference_constants(self, mask_contexts):
+        """Calls `get_constants` in inference mode on placeholder contexts.
+
+        # Arguments
+            mask_contexts: List of context masks passed to `get_constants`.
+
+        # Returns
+            A tuple `(contexts, constants)`, with the placeholder contexts
+            and the constants of the layer.
+        """
+        contexts = [K.placeholder(ndim=ndim) for ndim in self._context_ndims()]
+        previous_contexts = [getattr(self, name, None) for name in self._context_attributes]
+        for name, context in zip(self._context_attributes, contexts):
+            setattr(self, name, context)
+        try:
+            # Only used by `get_constants` for building the dropout masks.
+            state_below = K.expand_dims(contexts[0][:, :, 0])
+            constants = self.get_constants(state_below, *mask_contexts, training=False)
+        finally:
+            for name, context in zip(self._context_attributes, previous_contexts):
+                setattr(self, name, context)
+        return contexts, constants
+
+    def _context_ndims(self):
+        """Returns the number of dimensions of each context of the layer.
+
+        The contexts which are attended to are 3D, while a context which is
+        not attended to (e.g. `context2` when `attend_on_both=False`) is 2D.
+        """
+        return [spec.ndim for spec in self.input_spec[1:1 + len(self._context_attributes)]]
+
+    def _mask_placeholders(self):
+        """Returns the placeholders of the context masks.
+
+        The mask of a 2D context is not used by the layer.
+        """
+        return [K.placeholder(ndim=ndim - 1) for ndim in self._context_ndims()]
+
+    def get_context_function(self):
+        """Returns the function that caches the context-dependent constants.
+
+        # Returns
+            A Keras function that takes as inputs the contexts of the layer
+            followed by their masks (of shape `(batch_size, input_timesteps)`,
+            or `(batch_size,)` for a 2D context) and returns the list of cached constants expected by the
+            function returned by `get_step_function`.
+        """
+        if getattr(self, '_context_function', None) is None:
+            mask_contexts = self._mask_placeholders()
+            contexts, constants = self._get_inference_constants(mask_contexts)
+            cached_constants = [constant for constant in constants
+                                if not isinstance(constant, list)]
+            self._context_function = K.function(contexts + mask_contexts,
+                                                cached_constants)
+        return self._context_function
+
+    def get_step_function(self):
+        """Returns the function that runs a single decoding step.
+
+        # Returns
+            A Keras function that takes as inputs the embedding of the
+            previous word (of shape `(batch_size, input_dim)`), the recurrent
+            states of the layer (`h` or `h` and `c`) and the constants cached
+            by the function returned by `get_context_function`. It returns
+            the new recurrent states, followed by the attended context
+            vectors and the attention weights of each context (a context
+            which is not attended to is returned as is, with its mask).
+        """
+        if getattr(self, '_step_function', None) is None:
+            mask_contexts = self._mask_placeholders()
+            _, constants = self._get_inference_constants(mask_contexts)
+            cached_constants = []
+            step_constants = []
+            for constant in constants:
+                if isinstance(constant, list):
+                    # Dropout masks are all ones in inference mode.
+                    step_constants.append([K.cast_to_floatx(1.) for _ in constant])
+                else:
+                    cached_constant = K.placeholder(ndim=K.ndim(constant),
+                                                    dtype=K.dtype(constant))
+                    cached_constants.append(cached_constant)
+                    step_constants.append(cached_constant)
+
+            prev_word_emb = K.placeholder(ndim=2)
+            states = [K.placeholder(ndim=2) for _ in range(self._num_recurrent_states)]
+            # The placeholders for the extra variables are not read by `step`.
+            extra_states = [K.zeros_like(states[0])
+                            for _ in range(2 * len(self._context_attributes))]
+            x = self.preprocess_input(K.expand_dims(prev_word_emb, 1), training=False)
+            _, new_states = self.step(x[:, 0, :], states + extra_states + step_constants)
+            self._step_function = K.function([prev_word_emb] + states + cached_constants,
+                                             list(new_states))
+        return self._step_function
+
+    def preprocess_context(self, contexts, mask_contexts=None):
+        """Computes the cached constants of a batch of source contexts.
+
+        # Arguments
+            contexts: Numpy array or list of Numpy arrays with the contexts
+                of the layer.
+            mask_contexts: Numpy array or list of Numpy arrays with the masks
+                of the contexts. If `None`, the masks are computed from
+                `mask_value`, as it is done by `call`.
+
+        # Returns
+            List of Numpy arrays with the cached constants.
+        """
+        if not isinstance(contexts, list):
+            contexts = [contexts]
+        if mask_contexts is None:
+            mask_contexts = [np.not_equal(np.sum(context, axis=2), self.mask_value)
+                             if np.ndim(context) == 3 else np.ones(len(context))
+                             for context in contexts]
+        elif not isinstance(mask_contexts, list):
+            mask_contexts = [mask_contexts]
+        mask_contexts = [np.asarray(mask_context, dtype=K.floatx())
+                         for mask_context in mask_contexts]
+        return self.get_context_function()(contexts + mask_contexts)
+
+
 class StackedRNNCells(Layer):
     """Wrapper allowing a stack of RNN cells to behave as a single cell.
 
@@ -2094,10 +2294,7 @@ class GRUCond(Recurrent):
 
         if self.static_ctx:
             dp_mask = states[3]  # Dropout W
-            context = states[4]
-            mask_context = states[5]  # Context mask
-            if K.ndim(mask_context) > 1:  # Mask the context (only if necessary)
-                context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+            context = states[4]  # Context (already masked)
             matrix_x += K.dot(context * dp_mask[0], self.kernel)
 
         matrix_inner = K.dot(h_tm1 * rec_dp_mask[0], self.recurrent_kernel[:, :2 * self.units])
@@ -2149,13 +2346,17 @@ class GRUCond(Recurrent):
         if self.static_ctx:
             constants.append(dp_mask)
 
-        # States[4] - context
-        constants.append(self.context)
-
-        # States[5] - mask_context
         if mask_context is None:
             mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
             mask_context = K.cast(mask_context, K.floatx())
+        context = self.context
+        if K.ndim(mask_context) > 1:  # Mask the context once (only if necessary)
+            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+
+        # States[4] - context
+        constants.append(context)
+
+        # States[5] - mask_context
         constants.append(mask_context)
 
         return constants
@@ -2533,7 +2734,8 @@ class AttGRU(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[1, 2])
+                                             pos_extra_outputs_states=[1, 2],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             self.updates = []
             for i in range(len(states)):
@@ -2666,7 +2868,7 @@ class AttGRU(Recurrent):
             input_dim = K.shape(inputs)[2]
             ones = K.ones_like(K.reshape(inputs[:, :, 0], (-1, K.shape(inputs)[1], 1)))
             ones = K.concatenate([ones] * input_dim, axis=2)
-            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones)]
+            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones, training=training)]
             pctx = K.dot(inputs * B_Ua[0], self.attention_context_kernel)
         else:
             pctx = K.dot(inputs, self.attention_context_kernel)
@@ -2731,7 +2933,7 @@ class AttGRU(Recurrent):
         return dict(list(base_config.items()) + list(config.items()))
 
 
-class AttGRUCond(Recurrent):
+class AttGRUCond(_IncrementalDecodingMixin, Recurrent):
     """Gated Recurrent Unit with Attention
     You should give two inputs to this layer:
         1. The shifted sequence of words (shape: (batch_size, output_timesteps, embedding_size))
@@ -2849,6 +3051,14 @@ class AttGRUCond(Recurrent):
             Fraction of the units to drop for
             the linear transformation of the attention mechanism.
         num_inputs: Number of inputs of the layer.
+        implementation: Implementation mode, either 1 or 2.
+            Mode 1 multiplies each input of the step (the attended context and
+            the recurrent state) by its own kernel.
+            Mode 2 concatenates them and multiplies them by a single fused
+            kernel: one matrix product for the update and reset gates and one
+            for the candidate state, which depends on the reset gate.
+            The weights of both modes are interchangeable
+            when loading them (see `preprocess_weights_for_loading`).
 
 
     # Formulation
@@ -2884,6 +3094,9 @@ class AttGRUCond(Recurrent):
             InProceedings of the IEEE International Conference on Computer Vision 2015 (pp. 4507-4515).
     """
 
+    _num_recurrent_states = 1
+    _fused_kernels = ('kernel', 'recurrent_kernel')
+
     @interfaces.legacy_recurrent_support
     def __init__(self, units,
                  att_units=0,
@@ -2927,6 +3140,7 @@ class AttGRUCond(Recurrent):
                  conditional_dropout=0.,
                  attention_dropout=0.,
                  num_inputs=3,
+                 implementation=1,
                  **kwargs):
         super(AttGRUCond, self).__init__(**kwargs)
         self.return_extra_variables = return_extra_variables
@@ -2981,6 +3195,7 @@ class AttGRUCond(Recurrent):
         self.conditional_dropout = min(1., max(0., conditional_dropout)) if conditional_dropout is not None else 0.
         self.attention_dropout = min(1., max(0., attention_dropout)) if attention_dropout is not None else 0.
         self.num_inputs = num_inputs
+        self.implementation = implementation
         self.input_spec = [InputSpec(ndim=3), InputSpec(ndim=3)]
         for _ in range(len(self.input_spec), self.num_inputs):
             self.input_spec.append(InputSpec(ndim=2))
@@ -2999,18 +3214,28 @@ class AttGRUCond(Recurrent):
             # initial states: all-zero tensors of shape (units)
             self.states = [None, None]  # [h, x_att]
 
-        self.kernel = self.add_weight(shape=(self.context_dim, self.units * 3),
-                                      name='kernel',
-                                      initializer=self.kernel_initializer,
-                                      regularizer=self.kernel_regularizer,
-                                      constraint=self.kernel_constraint)
-
-        self.recurrent_kernel = self.add_weight(
-            shape=(self.units, self.units * 3),
-            name='recurrent_kernel',
-            initializer=self.recurrent_initializer,
-            regularizer=self.recurrent_regularizer,
-            constraint=self.recurrent_constraint)
+        if self.implementation == 1:
+            self.kernel = self.add_weight(shape=(self.context_dim, self.units * 3),
+                                          name='kernel',
+                                          initializer=self.kernel_initializer,
+                                          regularizer=self.kernel_regularizer,
+                                          constraint=self.kernel_constraint)
+
+            self.recurrent_kernel = self.add_weight(
+                shape=(self.units, self.units * 3),
+                name='recurrent_kernel',
+                initializer=self.recurrent_initializer,
+                regularizer=self.recurrent_regularizer,
+                constraint=self.recurrent_constraint)
+        else:
+            # [kernel; recurrent_kernel]
+            self.fused_kernel = add_fused_kernel(
+                self,
+                [(self.context_dim, self.kernel_initializer,
+                  self.kernel_regularizer, self.kernel_constraint),
+                 (self.units, self.recurrent_initializer,
+                  self.recurrent_regularizer, self.recurrent_constraint)],
+                self.units * 3)
 
         self.conditional_kernel = self.add_weight(shape=(self.input_dim, self.units * 3),
                                                   name='conditional_kernel',
@@ -3145,7 +3370,8 @@ class AttGRUCond(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[1, 2])
+                                             pos_extra_outputs_states=[1, 2],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             self.updates = []
             for i in range(len(states)):
@@ -3195,31 +3421,46 @@ class AttGRUCond(Recurrent):
         att_dp_mask = states[5]  # Dropout Wa
         pctx_ = states[6]  # Projected context (i.e. context * Ua + ba)
         context = states[7]  # Original context
-        mask_context = states[8]  # Context mask
-        if K.ndim(mask_context) > 1:  # Mask the context (only if necessary)
-            pctx_ = K.cast(mask_context[:, :, None], K.dtype(pctx_)) * pctx_
-            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+        mask_context = states[8]  # Context mask (already applied to pctx_ and context)
 
         ctx_, alphas = compute_attention(h_tm1, pctx_, context, att_dp_mask, self.attention_recurrent_kernel,
                                          self.attention_context_wa, self.bias_ca, mask_context,
                                          attention_mode=self.attention_mode)
 
-        matrix_x = x + K.dot(ctx_ * dp_mask[0], self.kernel)
-        if self.use_bias:
-            matrix_x = K.bias_add(matrix_x, self.bias)
-        matrix_inner = K.dot(h_tm1 * rec_dp_mask[0], self.recurrent_kernel[:, :2 * self.units])
+        if self.implementation == 1:
+            matrix_x = x + K.dot(ctx_ * dp_mask[0], self.kernel)
+            if self.use_bias:
+                matrix_x = K.bias_add(matrix_x, self.bias)
+            matrix_inner = K.dot(h_tm1 * rec_dp_mask[0], self.recurrent_kernel[:, :2 * self.units])
 
-        x_z = matrix_x[:, :self.units]
-        x_r = matrix_x[:, self.units: 2 * self.units]
-        recurrent_z = matrix_inner[:, :self.units]
-        recurrent_r = matrix_inner[:, self.units: 2 * self.units]
+            x_z = matrix_x[:, :self.units]
+            x_r = matrix_x[:, self.units: 2 * self.units]
+            recurrent_z = matrix_inner[:, :self.units]
+            recurrent_r = matrix_inner[:, self.units: 2 * self.units]
 
-        z = self.recurrent_activation(x_z + recurrent_z)
-        r = self.recurrent_activation(x_r + recurrent_r)
+            z = self.recurrent_activation(x_z + recurrent_z)
+            r = self.recurrent_activation(x_r + recurrent_r)
 
-        x_h = matrix_x[:, 2 * self.units:]
-        recurrent_h = K.dot(r * h_tm1 * rec_dp_mask[0], self.recurrent_kernel[:, 2 * self.units:])
-        hh = self.activation(x_h + recurrent_h)
+            x_h = matrix_x[:, 2 * self.units:]
+            recurrent_h = K.dot(r * h_tm1 * rec_dp_mask[0], self.recurrent_kernel[:, 2 * self.units:])
+            hh = self.activation(x_h + recurrent_h)
+        else:
+            # The candidate depends on the reset gate: one product for the
+            # gates and one for the candidate
+            matrix_zr = x[:, :2 * self.units] + \
+                K.dot(K.concatenate([ctx_ * dp_mask[0], h_tm1 * rec_dp_mask[0]]),
+                      self.fused_kernel[:, :2 * self.units])
+            if self.use_bias:
+                matrix_zr = K.bias_add(matrix_zr, self.bias[:2 * self.units])
+            z = self.recurrent_activation(matrix_zr[:, :self.units])
+            r = self.recurrent_activation(matrix_zr[:, self.units: 2 * self.units])
+
+            matrix_h = x[:, 2 * self.units:] + \
+                K.dot(K.concatenate([ctx_ * dp_mask[0], r * h_tm1 * rec_dp_mask[0]]),
+                      self.fused_kernel[:, 2 * self.units:])
+            if self.use_bias:
+                matrix_h = K.bias_add(matrix_h, self.bias[2 * self.units:])
+            hh = self.activation(matrix_h)
         h = z * h_tm1 + (1 - z) * hh
         if 0 < self.dropout + self.recurrent_dropout:
             h._uses_learning_phase = True
@@ -3276,22 +3517,28 @@ class AttGRUCond(Recurrent):
             input_dim = self.context_dim
             ones = K.ones_like(K.reshape(self.context[:, :, 0], (-1, K.shape(self.context)[1], 1)))
             ones = K.concatenate([ones] * input_dim, axis=2)
-            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones)]
+            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones, training=training)]
             pctx = K.dot(self.context * B_Ua[0], self.attention_context_kernel)
         else:
             pctx = K.dot(self.context, self.attention_context_kernel)
         if self.use_bias:
             pctx = K.bias_add(pctx, self.bias_ba)
+
+        if mask_context is None:
+            mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
+            mask_context = K.cast(mask_context, K.floatx())
+        context = self.context
+        if K.ndim(mask_context) > 1:  # Mask the context once (only if necessary)
+            pctx = K.cast(mask_context[:, :, None], K.dtype(pctx)) * pctx
+            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+
         # States[7] - pctx_
         constants.append(pctx)
 
         # States[8] - context
-        constants.append(self.context)
+        constants.append(context)
 
         # States[9] - mask_context
-        if mask_context is None:
-            mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
-            mask_context = K.cast(mask_context, K.floatx())
         constants.append(mask_context)
 
         return constants
@@ -3354,13 +3601,14 @@ class AttGRUCond(Recurrent):
                   'conditional_dropout': self.conditional_dropout,
                   'attention_dropout': self.attention_dropout,
                   'mask_value': self.mask_value,
+                  'implementation': self.implementation,
                   'attention_mode': self.attention_mode
                   }
         base_config = super(AttGRUCond, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
 
-class AttConditionalGRUCond(Recurrent):
+class AttConditionalGRUCond(_IncrementalDecodingMixin, Recurrent):
     """Conditional Gated Recurrent Unit - Cho et al. 2014. with Attention + the previously generated word fed to the current timestep.
 
     You should give two inputs to this layer:
@@ -3479,6 +3727,14 @@ class AttConditionalGRUCond(Recurrent):
             Fraction of the units to drop for
             the linear transformation of the attention mechanism.
         num_inputs: Number of inputs of the layer.
+        implementation: Implementation mode, either 1 or 2.
+            Mode 1 multiplies each input of the step (the attended context and
+            the recurrent state) by its own kernel.
+            Mode 2 concatenates them and multiplies them by a single fused
+            kernel: one matrix product for the update and reset gates and one
+            for the candidate state, which depends on the reset gate.
+            The weights of both modes are interchangeable
+            when loading them (see `preprocess_weights_for_loading`).
 
     # References
         - [On the Properties of Neural Machine Translation: Encoder-Decoder Approaches](https://arxiv.org/abs/1409.1259)
@@ -3487,6 +3743,9 @@ class AttConditionalGRUCond(Recurrent):
         - [Nematus: a Toolkit for Neural Machine Translation](http://arxiv.org/abs/1703.04357)
     """
 
+    _num_recurrent_states = 1
+    _fused_kernels = ('kernel', 'recurrent_kernel')
+
     @interfaces.legacy_recurrent_support
     def __init__(self, units,
                  att_units=0,
@@ -3530,6 +3789,7 @@ class AttConditionalGRUCond(Recurrent):
                  conditional_dropout=0.,
                  attention_dropout=0.,
                  num_inputs=3,
+                 implementation=1,
                  **kwargs):
         super(AttConditionalGRUCond, self).__init__(**kwargs)
         self.return_extra_variables = return_extra_variables
@@ -3590,6 +3850,7 @@ class AttConditionalGRUCond(Recurrent):
         self.conditional_dropout = min(1., max(0., conditional_dropout)) if conditional_dropout is not None else 0.
         self.attention_dropout = min(1., max(0., attention_dropout)) if attention_dropout is not None else 0.
         self.num_inputs = num_inputs
+        self.implementation = implementation
         self.input_spec = [InputSpec(ndim=3), InputSpec(ndim=3)]
         for _ in range(len(self.input_spec), self.num_inputs):
             self.input_spec.append(InputSpec(ndim=2))
@@ -3608,17 +3869,27 @@ class AttConditionalGRUCond(Recurrent):
             # initial states: all-zero tensors of shape (units)
             self.states = [None, None]  # [h, x_att]
 
-        self.kernel = self.add_weight(shape=(self.context_dim, self.units * 3),
-                                      name='kernel',
-                                      initializer=self.kernel_initializer,
-                                      regularizer=self.kernel_regularizer,
-                                      constraint=self.kernel_constraint)
-        self.recurrent_kernel = self.add_weight(
-            shape=(self.units, self.units * 3),
-            name='recurrent_kernel',
-            initializer=self.recurrent_initializer,
-            regularizer=self.recurrent_regularizer,
-            constraint=self.recurrent_constraint)
+        if self.implementation == 1:
+            self.kernel = self.add_weight(shape=(self.context_dim, self.units * 3),
+                                          name='kernel',
+                                          initializer=self.kernel_initializer,
+                                          regularizer=self.kernel_regularizer,
+                                          constraint=self.kernel_constraint)
+            self.recurrent_kernel = self.add_weight(
+                shape=(self.units, self.units * 3),
+                name='recurrent_kernel',
+                initializer=self.recurrent_initializer,
+                regularizer=self.recurrent_regularizer,
+                constraint=self.recurrent_constraint)
+        else:
+            # [kernel; recurrent_kernel]
+            self.fused_kernel = add_fused_kernel(
+                self,
+                [(self.context_dim, self.kernel_initializer,
+                  self.kernel_regularizer, self.kernel_constraint),
+                 (self.units, self.recurrent_initializer,
+                  self.recurrent_regularizer, self.recurrent_constraint)],
+                self.units * 3)
 
         self.recurrent1_kernel = self.add_weight(
             shape=(self.units, self.units * 3),
@@ -3769,7 +4040,8 @@ class AttConditionalGRUCond(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[1, 2])
+                                             pos_extra_outputs_states=[1, 2],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             self.updates = []
             for i in range(len(states)):
@@ -3819,10 +4091,7 @@ class AttConditionalGRUCond(Recurrent):
         att_dp_mask = states[5]  # Dropout Wa
         pctx_ = states[6]  # Projected context (i.e. context * Ua + ba)
         context = states[7]  # Original context
-        mask_context = states[8]  # Context mask
-        if K.ndim(mask_context) > 1:  # Mask the context (only if necessary)
-            pctx_ = K.cast(mask_context[:, :, None], K.dtype(pctx_)) * pctx_
-            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+        mask_context = states[8]  # Context mask (already applied to pctx_ and context)
 
         # GRU_1
         matrix_x_ = x
@@ -3844,23 +4113,39 @@ class AttConditionalGRUCond(Recurrent):
                                          self.attention_context_wa, self.bias_ca, mask_context,
                                          attention_mode=self.attention_mode)
 
-        matrix_x = K.dot(ctx_ * dp_mask[0], self.kernel)
-        if self.use_bias:
-            matrix_x = K.bias_add(matrix_x, self.bias)
-        matrix_inner = K.dot(h_ * rec_dp_mask[0], self.recurrent_kernel[:, :2 * self.units])
+        if self.implementation == 1:
+            matrix_x = K.dot(ctx_ * dp_mask[0], self.kernel)
+            if self.use_bias:
+                matrix_x = K.bias_add(matrix_x, self.bias)
+            matrix_inner = K.dot(h_ * rec_dp_mask[0], self.recurrent_kernel[:, :2 * self.units])
 
-        x_z = matrix_x[:, :self.units]
-        x_r = matrix_x[:, self.units: 2 * self.units]
-        recurrent_z = matrix_inner[:, :self.units]
-        recurrent_r = matrix_inner[:, self.units: 2 * self.units]
+            x_z = matrix_x[:, :self.units]
+            x_r = matrix_x[:, self.units: 2 * self.units]
+            recurrent_z = matrix_inner[:, :self.units]
+            recurrent_r = matrix_inner[:, self.units: 2 * self.units]
 
-        z = self.recurrent_activation(x_z + recurrent_z)
-        r = self.recurrent_activation(x_r + recurrent_r)
+            z = self.recurrent_activation(x_z + recurrent_z)
+            r = self.recurrent_activation(x_r + recurrent_r)
 
-        x_h = matrix_x[:, 2 * self.units:]
-        recurrent_h = K.dot(r * h_tm1 * rec_dp_mask[0],
-                            self.recurrent_kernel[:, 2 * self.units:])
-        hh = self.activation(x_h + recurrent_h)
+            x_h = matrix_x[:, 2 * self.units:]
+            recurrent_h = K.dot(r * h_tm1 * rec_dp_mask[0],
+                                self.recurrent_kernel[:, 2 * self.units:])
+            hh = self.activation(x_h + recurrent_h)
+        else:
+            # The candidate depends on the reset gate: one product for the
+            # gates and one for the candidate
+            matrix_zr = K.dot(K.concatenate([ctx_ * dp_mask[0], h_ * rec_dp_mask[0]]),
+                              self.fused_kernel[:, :2 * self.units])
+            if self.use_bias:
+                matrix_zr = K.bias_add(matrix_zr, self.bias[:2 * self.units])
+            z = self.recurrent_activation(matrix_zr[:, :self.units])
+            r = self.recurrent_activation(matrix_zr[:, self.units: 2 * self.units])
+
+            matrix_h = K.dot(K.concatenate([ctx_ * dp_mask[0], r * h_tm1 * rec_dp_mask[0]]),
+                             self.fused_kernel[:, 2 * self.units:])
+            if self.use_bias:
+                matrix_h = K.bias_add(matrix_h, self.bias[2 * self.units:])
+            hh = self.activation(matrix_h)
         h = z * h_tm1 + (1 - z) * hh
         if 0 < self.dropout + self.recurrent_dropout:
             h._uses_learning_phase = True
@@ -3919,22 +4204,28 @@ class AttConditionalGRUCond(Recurrent):
             input_dim = self.context_dim
             ones = K.ones_like(K.reshape(self.context[:, :, 0], (-1, K.shape(self.context)[1], 1)))
             ones = K.concatenate([ones] * input_dim, axis=2)
-            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones)]
+            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones, training=training)]
             pctx = K.dot(self.context * B_Ua[0], self.attention_context_kernel)
         else:
             pctx = K.dot(self.context, self.attention_context_kernel)
         if self.use_bias:
             pctx = K.bias_add(pctx, self.bias_ba)
+
+        if mask_context is None:
+            mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
+            mask_context = K.cast(mask_context, K.floatx())
+        context = self.context
+        if K.ndim(mask_context) > 1:  # Mask the context once (only if necessary)
+            pctx = K.cast(mask_context[:, :, None], K.dtype(pctx)) * pctx
+            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+
         # States[7] - pctx_
         constants.append(pctx)
 
         # States[8] - context
-        constants.append(self.context)
+        constants.append(context)
 
         # States[9] - mask_context
-        if mask_context is None:
-            mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
-            mask_context = K.cast(mask_context, K.floatx())
         constants.append(mask_context)
 
         return constants
@@ -3999,6 +4290,7 @@ class AttConditionalGRUCond(Recurrent):
                   'conditional_dropout': self.conditional_dropout,
                   'attention_dropout': self.attention_dropout,
                   'num_inputs': self.num_inputs,
+                  'implementation': self.implementation,
                   'attention_mode': self.attention_mode
                   }
         base_config = super(AttConditionalGRUCond, self).get_config()
@@ -5407,7 +5699,8 @@ class AttLSTM(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[2, 3])
+                                             pos_extra_outputs_states=[2, 3],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             self.updates = []
             for i in range(len(states)):
@@ -5532,7 +5825,7 @@ class AttLSTM(Recurrent):
             input_dim = K.shape(inputs)[2]
             ones = K.ones_like(K.reshape(inputs[:, :, 0], (-1, K.shape(inputs)[1], 1)))
             ones = K.concatenate([ones] * input_dim, axis=2)
-            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones)]
+            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones, training=training)]
             pctx = K.dot(inputs * B_Ua[0], self.attention_context_kernel)
         else:
             pctx = K.dot(inputs, self.attention_context_kernel)
@@ -5607,7 +5900,7 @@ class AttLSTM(Recurrent):
         return dict(list(base_config.items()) + list(config.items()))
 
 
-class AttLSTMCond(Recurrent):
+class AttLSTMCond(_IncrementalDecodingMixin, Recurrent):
     """Long-Short Term Memory unit with Attention + the previously generated word fed to the current timestep.
 
     You should give two inputs to this layer:
@@ -5726,12 +6019,20 @@ class AttLSTMCond(Recurrent):
             Fraction of the units to drop for
             the linear transformation of the attention mechanism.
         num_inputs: Number of inputs of the layer.
+        implementation: Implementation mode, either 1 or 2.
+            Mode 1 multiplies each input of the step (the attended context and
+            the recurrent state) by its own kernel.
+            Mode 2 concatenates them and multiplies them by a single fused
+            kernel, running one larger matrix product per step instead of
+            several small ones. The weights of both modes are interchangeable
+            when loading them (see `preprocess_weights_for_loading`).
 
     # References
         - [On the Properties of Neural Machine Translation: Encoder-Decoder Approaches](https://arxiv.org/abs/1409.1259)
         - [Empirical Evaluation of Gated Recurrent Neural Networks on Sequence Modeling](http://arxiv.org/abs/1412.3555v1)
         - [A Theoretically Grounded Application of Dropout in Recurrent Neural Networks](http://arxiv.org/abs/1512.05287)
     """
+    _fused_kernels = ('kernel', 'recurrent_kernel')
 
     @interfaces.legacy_recurrent_support
     def __init__(self, units,
@@ -5777,6 +6078,7 @@ class AttLSTMCond(Recurrent):
                  conditional_dropout=0.,
                  attention_dropout=0.,
                  num_inputs=4,
+                 implementation=1,
                  **kwargs):
         super(AttLSTMCond, self).__init__(**kwargs)
         self.return_extra_variables = return_extra_variables
@@ -5831,6 +6133,7 @@ class AttLSTMCond(Recurrent):
         self.conditional_dropout = min(1., max(0., conditional_dropout)) if conditional_dropout is not None else 0.
         self.attention_dropout = min(1., max(0., attention_dropout)) if attention_dropout is not None else 0.
         self.num_inputs = num_inputs
+        self.implementation = implementation
         self.input_spec = [InputSpec(ndim=3), InputSpec(ndim=3)]
         for _ in range(len(self.input_spec), self.num_inputs):
             self.input_spec.append(InputSpec(ndim=2))
@@ -5849,17 +6152,27 @@ class AttLSTMCond(Recurrent):
             # initial states: all-zero tensors of shape (units)
             self.states = [None, None, None]  # [h, c, x_att]
 
-        self.kernel = self.add_weight(shape=(self.context_dim, self.units * 4),
-                                      name='kernel',
-                                      initializer=self.kernel_initializer,
-                                      regularizer=self.kernel_regularizer,
-                                      constraint=self.kernel_constraint)
-        self.recurrent_kernel = self.add_weight(
-            shape=(self.units, self.units * 4),
-            name='recurrent_kernel',
-            initializer=self.recurrent_initializer,
-            regularizer=self.recurrent_regularizer,
-            constraint=self.recurrent_constraint)
+        if self.implementation == 1:
+            self.kernel = self.add_weight(shape=(self.context_dim, self.units * 4),
+                                          name='kernel',
+                                          initializer=self.kernel_initializer,
+                                          regularizer=self.kernel_regularizer,
+                                          constraint=self.kernel_constraint)
+            self.recurrent_kernel = self.add_weight(
+                shape=(self.units, self.units * 4),
+                name='recurrent_kernel',
+                initializer=self.recurrent_initializer,
+                regularizer=self.recurrent_regularizer,
+                constraint=self.recurrent_constraint)
+        else:
+            # [kernel; recurrent_kernel]
+            self.fused_kernel = add_fused_kernel(
+                self,
+                [(self.context_dim, self.kernel_initializer,
+                  self.kernel_regularizer, self.kernel_constraint),
+                 (self.units, self.recurrent_initializer,
+                  self.recurrent_regularizer, self.recurrent_constraint)],
+                self.units * 4)
 
         self.conditional_kernel = self.add_weight(shape=(self.input_dim, self.units * 4),
                                                   name='conditional_kernel',
@@ -6017,7 +6330,8 @@ class AttLSTMCond(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[2, 3])
+                                             pos_extra_outputs_states=[2, 3],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             self.updates = []
             for i in range(len(states)):
@@ -6067,18 +6381,18 @@ class AttLSTMCond(Recurrent):
         att_dp_mask = states[6]  # Dropout Wa
         pctx_ = states[7]  # Projected context (i.e. context * Ua + ba)
         context = states[8]  # Original context
-        mask_context = states[9]  # Context mask
-        if K.ndim(mask_context) > 1:  # Mask the context (only if necessary)
-            pctx_ = K.cast(mask_context[:, :, None], K.dtype(pctx_)) * pctx_
-            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+        mask_context = states[9]  # Context mask (already applied to pctx_ and context)
 
         ctx_, alphas = compute_attention(h_tm1, pctx_, context, att_dp_mask, self.attention_recurrent_kernel,
                                          self.attention_context_wa, self.bias_ca, mask_context,
                                          attention_mode=self.attention_mode)
         # LSTM
-        z = x + \
-            K.dot(h_tm1 * rec_dp_mask[0], self.recurrent_kernel) + \
-            K.dot(ctx_ * dp_mask[0], self.kernel)
+        if self.implementation == 1:
+            z = x + \
+                K.dot(h_tm1 * rec_dp_mask[0], self.recurrent_kernel) + \
+                K.dot(ctx_ * dp_mask[0], self.kernel)
+        else:
+            z = x + K.dot(K.concatenate([ctx_ * dp_mask[0], h_tm1 * rec_dp_mask[0]]), self.fused_kernel)
         if self.use_bias:
             z = K.bias_add(z, self.bias)
         z0 = z[:, :self.units]
@@ -6145,22 +6459,28 @@ class AttLSTMCond(Recurrent):
             input_dim = self.context_dim
             ones = K.ones_like(K.reshape(self.context[:, :, 0], (-1, K.shape(self.context)[1], 1)))
             ones = K.concatenate([ones] * input_dim, axis=2)
-            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones)]
+            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones, training=training)]
             pctx = K.dot(self.context * B_Ua[0], self.attention_context_kernel)
         else:
             pctx = K.dot(self.context, self.attention_context_kernel)
         if self.use_bias:
             pctx = K.bias_add(pctx, self.bias_ba)
+
+        if mask_context is None:
+            mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
+            mask_context = K.cast(mask_context, K.floatx())
+        context = self.context
+        if K.ndim(mask_context) > 1:  # Mask the context once (only if necessary)
+            pctx = K.cast(mask_context[:, :, None], K.dtype(pctx)) * pctx
+            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+
         # States[7] - pctx_
         constants.append(pctx)
 
         # States[8] - context
-        constants.append(self.context)
+        constants.append(context)
 
         # States[9] - mask_context
-        if mask_context is None:
-            mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
-            mask_context = K.cast(mask_context, K.floatx())
         constants.append(mask_context)
 
         return constants
@@ -6235,13 +6555,14 @@ class AttLSTMCond(Recurrent):
                   'conditional_dropout': self.conditional_dropout,
                   'attention_dropout': self.attention_dropout,
                   'num_inputs': self.num_inputs,
+                  'implementation': self.implementation,
                   'attention_mode': self.attention_mode
                   }
         base_config = super(AttLSTMCond, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
 
-class AttConditionalLSTMCond(Recurrent):
+class AttConditionalLSTMCond(_IncrementalDecodingMixin, Recurrent):
     """Conditional Long-Short Term Memory unit with Attention + the previously generated word fed to the current timestep.
 
     You should give two inputs to this layer:
@@ -6361,6 +6682,13 @@ class AttConditionalLSTMCond(Recurrent):
             Fraction of the units to drop for
             the linear transformation of the attention mechanism.
         num_inputs: Number of inputs of the layer.
+        implementation: Implementation mode, either 1 or 2.
+            Mode 1 multiplies each input of the step (the attended context and
+            the recurrent state) by its own kernel.
+            Mode 2 concatenates them and multiplies them by a single fused
+            kernel, running one larger matrix product per step instead of
+            several small ones. The weights of both modes are interchangeable
+            when loading them (see `preprocess_weights_for_loading`).
 
     # References
         - [On the Properties of Neural Machine Translation: Encoder-Decoder Approaches](https://arxiv.org/abs/1409.1259)
@@ -6368,6 +6696,7 @@ class AttConditionalLSTMCond(Recurrent):
         - [A Theoretically Grounded Application of Dropout in Recurrent Neural Networks](http://arxiv.org/abs/1512.05287)
         - [Nematus: a Toolkit for Neural Machine Translation](http://arxiv.org/abs/1703.04357)
     """
+    _fused_kernels = ('kernel', 'recurrent_kernel')
 
     @interfaces.legacy_recurrent_support
     def __init__(self, units,
@@ -6413,6 +6742,7 @@ class AttConditionalLSTMCond(Recurrent):
                  conditional_dropout=0.,
                  attention_dropout=0.,
                  num_inputs=4,
+                 implementation=1,
                  **kwargs):
         super(AttConditionalLSTMCond, self).__init__(**kwargs)
 
@@ -6477,6 +6807,7 @@ class AttConditionalLSTMCond(Recurrent):
 
         # Inputs
         self.num_inputs = num_inputs
+        self.implementation = implementation
         self.input_spec = [InputSpec(ndim=3), InputSpec(ndim=3)]
         for _ in range(len(self.input_spec), self.num_inputs):
             self.input_spec.append(InputSpec(ndim=2))
@@ -6494,17 +6825,27 @@ class AttConditionalLSTMCond(Recurrent):
             # initial states: all-zero tensors of shape (units)
             self.states = [None, None, None]  # [h, c, x_att]
 
-        self.kernel = self.add_weight(shape=(self.context_dim, self.units * 4),
-                                      name='kernel',
-                                      initializer=self.kernel_initializer,
-                                      regularizer=self.kernel_regularizer,
-                                      constraint=self.kernel_constraint)
-        self.recurrent_kernel = self.add_weight(
-            shape=(self.units, self.units * 4),
-            name='recurrent_kernel',
-            initializer=self.recurrent_initializer,
-            regularizer=self.recurrent_regularizer,
-            constraint=self.recurrent_constraint)
+        if self.implementation == 1:
+            self.kernel = self.add_weight(shape=(self.context_dim, self.units * 4),
+                                          name='kernel',
+                                          initializer=self.kernel_initializer,
+                                          regularizer=self.kernel_regularizer,
+                                          constraint=self.kernel_constraint)
+            self.recurrent_kernel = self.add_weight(
+                shape=(self.units, self.units * 4),
+                name='recurrent_kernel',
+                initializer=self.recurrent_initializer,
+                regularizer=self.recurrent_regularizer,
+                constraint=self.recurrent_constraint)
+        else:
+            # [kernel; recurrent_kernel]
+            self.fused_kernel = add_fused_kernel(
+                self,
+                [(self.context_dim, self.kernel_initializer,
+                  self.kernel_regularizer, self.kernel_constraint),
+                 (self.units, self.recurrent_initializer,
+                  self.recurrent_regularizer, self.recurrent_constraint)],
+                self.units * 4)
 
         self.recurrent1_kernel = self.add_weight(
             shape=(self.units, self.units * 4),
@@ -6688,7 +7029,8 @@ class AttConditionalLSTMCond(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[2, 3])
+                                             pos_extra_outputs_states=[2, 3],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             updates = []
             for i in range(len(states)):
@@ -6740,10 +7082,7 @@ class AttConditionalLSTMCond(Recurrent):
         att_dp_mask = states[6]  # Dropout Wa
         pctx_ = states[7]  # Projected context (i.e. context * Ua + ba)
         context = states[8]  # Original context
-        mask_context = states[9]  # Context mask
-        if K.ndim(mask_context) > 1:  # Mask the context (only if necessary)
-            pctx_ = K.cast(mask_context[:, :, None], K.dtype(pctx_)) * pctx_
-            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+        mask_context = states[9]  # Context mask (already applied to pctx_ and context)
 
         # LSTM_1
         z_ = x + K.dot(h_tm1 * rec_dp_mask[0], self.recurrent1_kernel)
@@ -6764,8 +7103,11 @@ class AttConditionalLSTMCond(Recurrent):
                                          attention_mode=self.attention_mode)
 
         # LSTM
-        z = K.dot(h_ * rec_dp_mask[0], self.recurrent_kernel) + \
-            K.dot(ctx_ * ctx_dp_mask[0], self.kernel)
+        if self.implementation == 1:
+            z = K.dot(h_ * rec_dp_mask[0], self.recurrent_kernel) + \
+                K.dot(ctx_ * ctx_dp_mask[0], self.kernel)
+        else:
+            z = K.dot(K.concatenate([ctx_ * ctx_dp_mask[0], h_ * rec_dp_mask[0]]), self.fused_kernel)
         if self.use_bias:
             z = K.bias_add(z, self.bias)
         z0 = z[:, :self.units]
@@ -6832,22 +7174,28 @@ class AttConditionalLSTMCond(Recurrent):
             input_dim = self.context_dim
             ones = K.ones_like(K.reshape(self.context[:, :, 0], (-1, K.shape(self.context)[1], 1)))
             ones = K.concatenate([ones] * input_dim, axis=2)
-            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones)]
+            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones, training=training)]
             pctx = K.dot(self.context * B_Ua[0], self.attention_context_kernel)
         else:
             pctx = K.dot(self.context, self.attention_context_kernel)
         if self.use_bias:
             pctx = K.bias_add(pctx, self.bias_ba)
+
+        if mask_context is None:
+            mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
+            mask_context = K.cast(mask_context, K.floatx())
+        context = self.context
+        if K.ndim(mask_context) > 1:  # Mask the context once (only if necessary)
+            pctx = K.cast(mask_context[:, :, None], K.dtype(pctx)) * pctx
+            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+
         # States[7] - pctx_
         constants.append(pctx)
 
         # States[8] - context
-        constants.append(self.context)
+        constants.append(context)
 
         # States[9] - mask_context
-        if mask_context is None:
-            mask_context = K.not_equal(K.sum(self.context, axis=2), self.mask_value)
-            mask_context = K.cast(mask_context, K.floatx())
         constants.append(mask_context)
 
         return constants
@@ -6922,13 +7270,14 @@ class AttConditionalLSTMCond(Recurrent):
                   'conditional_dropout': self.conditional_dropout,
                   'attention_dropout': self.attention_dropout,
                   'num_inputs': self.num_inputs,
+                  'implementation': self.implementation,
                   'attention_mode': self.attention_mode
                   }
         base_config = super(AttConditionalLSTMCond, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
 
-class AttLSTMCond2Inputs(Recurrent):
+class AttLSTMCond2Inputs(_IncrementalDecodingMixin, Recurrent):
     """Long-Short Term Memory unit with the previously generated word fed to the current timestep
     and two input contexts (with two attention mechanisms).
 
@@ -7048,6 +7397,13 @@ class AttLSTMCond2Inputs(Recurrent):
             Fraction of the units to drop for
             the linear transformation of the attention mechanism.
         num_inputs: Number of inputs of the layer.
+        implementation: Implementation mode, either 1 or 2.
+            Mode 1 multiplies each input of the step (the attended contexts and
+            the recurrent state) by its own kernel.
+            Mode 2 concatenates them and multiplies them by a single fused
+            kernel, running one larger matrix product per step instead of
+            several small ones. The weights of both modes are interchangeable
+            when loading them (see `preprocess_weights_for_loading`).
 
     # References
         - [On the Properties of Neural Machine Translation: Encoder-Decoder Approaches](https://arxiv.org/abs/1409.1259)
@@ -7056,6 +7412,9 @@ class AttLSTMCond2Inputs(Recurrent):
         - [Egocentric Video Description based on Temporally-Linked Sequences](https://arxiv.org/abs/1704.02163)
     """
 
+    _context_attributes = ('context1', 'context2')
+    _fused_kernels = ('kernel', 'kernel2', 'recurrent_kernel')
+
     def __init__(self, units,
                  att_units1=0,
                  att_units2=0,
@@ -7123,6 +7482,7 @@ class AttLSTMCond2Inputs(Recurrent):
                  attention_dropout=0.,
                  attention_dropout2=0.,
                  num_inputs=5,
+                 implementation=1,
                  **kwargs):
 
         super(AttLSTMCond2Inputs, self).__init__(**kwargs)
@@ -7133,6 +7493,7 @@ class AttLSTMCond2Inputs(Recurrent):
         # Main parameters
         self.units = units
         self.num_inputs = num_inputs
+        self.implementation = implementation
         self.att_units1 = units if att_units1 == 0 else att_units1
         self.att_units2 = units if att_units2 == 0 else att_units2
         self.activation = activations.get(activation)
@@ -7208,8 +7569,10 @@ class AttLSTMCond2Inputs(Recurrent):
         self.attention_dropout = min(1., max(0., attention_dropout)) if attention_dropout is not None else 0.
         if self.attend_on_both:
             self.attention_dropout2 = min(1., max(0., attention_dropout2)) if attention_dropout2 is not None else 0.
+            self.input_spec = [InputSpec(ndim=3), InputSpec(ndim=3), InputSpec(ndim=3)]
+        else:
+            self.input_spec = [InputSpec(ndim=3), InputSpec(ndim=3), InputSpec(ndim=2)]
 
-        self.input_spec = [InputSpec(ndim=3), InputSpec(ndim=3), InputSpec(ndim=3)]
         for _ in range(len(self.input_spec), self.num_inputs):
             self.input_spec.append(InputSpec(ndim=2))
 
@@ -7226,41 +7589,53 @@ class AttLSTMCond2Inputs(Recurrent):
             self.states = [None, None, None, None]  # [h, c, x_att, x_att2]
 
         if self.attend_on_both:
-            assert K.ndim(self.input_spec[1]) == 3 and K.ndim(self.input_spec[2]), 'When using two attention models,' \
-                                                                                   'you should pass two 3D tensors' \
-                                                                                   'to AttLSTMCond2Inputs'
+            assert len(input_shape[1]) == 3 and len(input_shape[2]) == 3, \
+                'When using two attention models, you should pass two 3D tensors ' \
+                'to AttLSTMCond2Inputs'
         else:
-            assert K.ndim(self.input_spec[1]) == 3, 'When using an attention model, you should pass one 3D tensors' \
-                                                    'to AttLSTMCond2Inputs'
+            assert len(input_shape[1]) == 3, 'When using an attention model, you should pass one 3D tensors' \
+                                             'to AttLSTMCond2Inputs'
 
-        if K.ndim(self.input_spec[1]) == 3:
+        if len(input_shape[1]) == 3:
             self.context1_steps = input_shape[1][1]
             self.context1_dim = input_shape[1][2]
 
-        if K.ndim(self.input_spec[2]) == 3:
+        if len(input_shape[2]) == 3:
             self.context2_steps = input_shape[2][1]
             self.context2_dim = input_shape[2][2]
         else:
             self.context2_dim = input_shape[2][1]
 
-        self.kernel = self.add_weight(shape=(self.context1_dim, self.units * 4),
-                                      initializer=self.kernel_initializer,
-                                      name='kernel',
-                                      regularizer=self.kernel_regularizer,
-                                      constraint=self.kernel_constraint)
-
-        self.kernel2 = self.add_weight(shape=(self.context2_dim, self.units * 4),
-                                       initializer=self.kernel_initializer2,
-                                       name='kernel2',
-                                       regularizer=self.kernel_regularizer2,
-                                       constraint=self.kernel_constraint2)
-
-        self.recurrent_kernel = self.add_weight(
-            shape=(self.units, self.units * 4),
-            name='recurrent_kernel',
-            initializer=self.attention_recurrent_initializer,
-            regularizer=self.attention_recurrent_regularizer,
-            constraint=self.attention_recurrent_constraint)
+        if self.implementation == 1:
+            self.kernel = self.add_weight(shape=(self.context1_dim, self.units * 4),
+                                          initializer=self.kernel_initializer,
+                                          name='kernel',
+                                          regularizer=self.kernel_regularizer,
+                                          constraint=self.kernel_constraint)
+
+            self.kernel2 = self.add_weight(shape=(self.context2_dim, self.units * 4),
+                                           initializer=self.kernel_initializer2,
+                                           name='kernel2',
+                                           regularizer=self.kernel_regularizer2,
+                                           constraint=self.kernel_constraint2)
+
+            self.recurrent_kernel = self.add_weight(
+                shape=(self.units, self.units * 4),
+                name='recurrent_kernel',
+                initializer=self.attention_recurrent_initializer,
+                regularizer=self.attention_recurrent_regularizer,
+                constraint=self.attention_recurrent_constraint)
+        else:
+            # [kernel; kernel2; recurrent_kernel]
+            self.fused_kernel = add_fused_kernel(
+                self,
+                [(self.context1_dim, self.kernel_initializer,
+                  self.kernel_regularizer, self.kernel_constraint),
+                 (self.context2_dim, self.kernel_initializer2,
+                  self.kernel_regularizer2, self.kernel_constraint2),
+                 (self.units, self.attention_recurrent_initializer,
+                  self.attention_recurrent_regularizer, self.attention_recurrent_constraint)],
+                self.units * 4)
 
         self.conditional_kernel = self.add_weight(shape=(self.input_dim, self.units * 4),
                                                   name='conditional_kernel',
@@ -7467,7 +7842,8 @@ class AttLSTMCond2Inputs(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[2, 3, 4, 5])
+                                             pos_extra_outputs_states=[2, 3, 4, 5],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             self.updates = []
             for i in range(len(states)):
@@ -7542,35 +7918,33 @@ class AttLSTMCond2Inputs(Recurrent):
             context2 = states[pos_states + 3]  # Context 2
             mask_context2 = states[pos_states + 4]  # Context 2 mask
 
-        if K.ndim(mask_context1) > 1:  # Mask the context (only if necessary)
-            pctx_1 = mask_context1[:, :, None] * pctx_1
-            context1 = mask_context1[:, :, None] * context1
-
-        ctx_1, alphas1 = compute_attention(h_tm1, pctx_1, context, att_dp_mask, self.attention_recurrent_kernel,
+        ctx_1, alphas1 = compute_attention(h_tm1, pctx_1, context1, att_dp_mask, self.attention_recurrent_kernel,
                                            self.attention_context_wa, self.bias_ca, mask_context1,
                                            attention_mode=self.attention_mode)
 
         if self.attend_on_both:
-            if K.ndim(mask_context2) > 1:  # Mask the context2 (only if necessary)
-                pctx_2 = mask_context2[:, :, None] * pctx_2
-                context2 = mask_context2[:, :, None] * context2
 
             # Attention model 2 (see Formulation in class header)
-            ctx_2, alphas2 = compute_attention(h_tm1, pctx_1, context, att_dp_mask2, self.attention_recurrent_kernel2,
+            ctx_2, alphas2 = compute_attention(h_tm1, pctx_2, context2, att_dp_mask2, self.attention_recurrent_kernel2,
                                                self.attention_context_wa2, self.bias_ca2, mask_context2,
                                                attention_mode=self.attention_mode)
         else:
             ctx_2 = context2
             alphas2 = mask_context2
 
-        z = x + \
-            K.dot(h_tm1 * rec_dp_mask[0], self.recurrent_kernel) + \
-            K.dot(ctx_2 * dp_mask2[0], self.kernel2) + \
-            K.dot(ctx_1 * dp_mask[0], self.kernel)
+        if self.implementation == 1:
+            z = x + \
+                K.dot(h_tm1 * rec_dp_mask[0], self.recurrent_kernel) + \
+                K.dot(ctx_2 * dp_mask2[0], self.kernel2) + \
+                K.dot(ctx_1 * dp_mask[0], self.kernel)
+        else:
+            z = x + K.dot(K.concatenate([ctx_1 * dp_mask[0],
+                                         ctx_2 * dp_mask2[0],
+                                         h_tm1 * rec_dp_mask[0]]), self.fused_kernel)
         if self.use_bias:
             z = K.bias_add(z, self.bias)
             if self.attend_on_both:
-                z = K.bias_add(z_, self.bias2)
+                z = K.bias_add(z, self.bias2)
         z0 = z[:, :self.units]
         z1 = z[:, self.units: 2 * self.units]
         z2 = z[:, 2 * self.units: 3 * self.units]
@@ -7663,50 +8037,60 @@ class AttLSTMCond2Inputs(Recurrent):
             else:
                 constants.append([K.cast_to_floatx(1.)])
 
-        # States[11] - Context1
-        constants.append(self.context1)
-        # States[12] - MaskContext1
         if mask_context1 is None:
             mask_context1 = K.not_equal(K.sum(self.context1, axis=2), self.mask_value)
             mask_context1 = K.cast(mask_context1, K.floatx())
-        constants.append(mask_context1)
 
-        # States[13] - pctx_1
         if 0 < self.attention_dropout < 1:
             input_dim = self.context1_dim
             ones = K.ones_like(K.reshape(self.context1[:, :, 0], (-1, K.shape(self.context1)[1], 1)))
             ones = K.concatenate([ones] * input_dim, axis=2)
-            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones)]
+            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones, training=training)]
             pctx_1 = K.dot(self.context1 * B_Ua[0], self.attention_context_kernel)
         else:
             pctx_1 = K.dot(self.context1, self.attention_context_kernel)
         if self.use_bias:
             pctx_1 = K.bias_add(pctx_1, self.bias_ba)
+        context1 = self.context1
+        if K.ndim(mask_context1) > 1:  # Mask the context once (only if necessary)
+            pctx_1 = K.cast(mask_context1[:, :, None], K.dtype(pctx_1)) * pctx_1
+            context1 = K.cast(mask_context1[:, :, None], K.dtype(context1)) * context1
+
+        # States[11] - Context1
+        constants.append(context1)
+        # States[12] - MaskContext1
+        constants.append(mask_context1)
+        # States[13] - pctx_1
         constants.append(pctx_1)
 
         if self.attend_on_both:
-
-            # States[14] - Context2
-            constants.append(self.context2)
-            # States[15] - MaskContext2
-            if self.attend_on_both:
-                if mask_context2 is None:
-                    mask_context2 = K.not_equal(K.sum(self.context2, axis=2), self.mask_value)
-                    mask_context2 = K.cast(mask_context2, K.floatx())
-            else:
-                mask_context2 = K.ones_like(self.context2[:, 0])
-            constants.append(mask_context2)
-            # States[16] - pctx_2
+            if mask_context2 is None:
+                mask_context2 = K.not_equal(K.sum(self.context2, axis=2), self.mask_value)
+                mask_context2 = K.cast(mask_context2, K.floatx())
+        else:
+            mask_context2 = K.ones_like(self.context2[:, 0])
+        context2 = self.context2
+        if self.attend_on_both:
             if 0 < self.attention_dropout2 < 1:
                 input_dim = self.context2_dim
                 ones = K.ones_like(K.reshape(self.context2[:, :, 0], (-1, K.shape(self.context2)[1], 1)))
                 ones = K.concatenate([ones] * input_dim, axis=2)
-                B_Ua2 = [K.in_train_phase(K.dropout(ones, self.attention_dropout2), ones)]
+                B_Ua2 = [K.in_train_phase(K.dropout(ones, self.attention_dropout2), ones, training=training)]
                 pctx_2 = K.dot(self.context2 * B_Ua2[0], self.attention_context_kernel2)
             else:
                 pctx_2 = K.dot(self.context2, self.attention_context_kernel2)
             if self.use_bias:
                 pctx_2 = K.bias_add(pctx_2, self.bias_ba2)
+            if K.ndim(mask_context2) > 1:  # Mask the context once (only if necessary)
+                pctx_2 = K.cast(mask_context2[:, :, None], K.dtype(pctx_2)) * pctx_2
+                context2 = K.cast(mask_context2[:, :, None], K.dtype(context2)) * context2
+
+        # States[14] - Context2
+        constants.append(context2)
+        # States[15] - MaskContext2
+        constants.append(mask_context2)
+        if self.attend_on_both:
+            # States[16] - pctx_2
             constants.append(pctx_2)
 
         return constants
@@ -7815,13 +8199,14 @@ class AttLSTMCond2Inputs(Recurrent):
                   "conditional_dropout": self.conditional_dropout,
                   'attention_dropout': self.attention_dropout,
                   'attention_dropout2': self.attention_dropout2 if self.attend_on_both else None,
+                  'implementation': self.implementation,
                   'attention_mode': self.attention_mode
                   }
         base_config = super(AttLSTMCond2Inputs, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
 
-class AttConditionalLSTMCond2Inputs(Recurrent):
+class AttConditionalLSTMCond2Inputs(_IncrementalDecodingMixin, Recurrent):
     """Long-Short Term Memory unit with the previously generated word fed to the current timestep
     and two input contexts (with two attention mechanisms).
 
@@ -7941,6 +8326,13 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
             Fraction of the units to drop for
             the linear transformation of the attention mechanism.
         num_inputs: Number of inputs of the layer.
+        implementation: Implementation mode, either 1 or 2.
+            Mode 1 multiplies each input of the step (the attended contexts and
+            the recurrent state) by its own kernel.
+            Mode 2 concatenates them and multiplies them by a single fused
+            kernel, running one larger matrix product per step instead of
+            several small ones. The weights of both modes are interchangeable
+            when loading them (see `preprocess_weights_for_loading`).
 
     # References
         - [On the Properties of Neural Machine Translation: Encoder-Decoder Approaches](https://arxiv.org/abs/1409.1259)
@@ -7949,6 +8341,9 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
         - [Egocentric Video Description based on Temporally-Linked Sequences](https://arxiv.org/abs/1704.02163)
     """
 
+    _context_attributes = ('context1', 'context2')
+    _fused_kernels = ('kernel', 'kernel2', 'recurrent_kernel')
+
     def __init__(self, units,
                  att_units1=0,
                  att_units2=0,
@@ -8016,6 +8411,7 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
                  attention_dropout=0.,
                  attention_dropout2=0.,
                  num_inputs=5,
+                 implementation=1,
                  **kwargs):
 
         super(AttConditionalLSTMCond2Inputs, self).__init__(**kwargs)
@@ -8023,6 +8419,7 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
         # Main parameters
         self.units = units
         self.num_inputs = num_inputs
+        self.implementation = implementation
         self.att_units1 = units if att_units1 == 0 else att_units1
         self.att_units2 = units if att_units2 == 0 else att_units2
         self.activation = activations.get(activation)
@@ -8129,41 +8526,53 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
             self.states = [None, None, None, None]  # [h, c, x_att, x_att2]
 
         if self.attend_on_both:
-            assert K.ndim(self.input_spec[1]) == 3 and K.ndim(self.input_spec[2]), 'When using two attention models,' \
-                                                                                   'you should pass two 3D tensors' \
-                                                                                   'to AttLSTMCond2Inputs'
+            assert len(input_shape[1]) == 3 and len(input_shape[2]) == 3, \
+                'When using two attention models, you should pass two 3D tensors ' \
+                'to AttLSTMCond2Inputs'
         else:
-            assert K.ndim(self.input_spec[1]) == 3, 'When using an attention model, you should pass one 3D tensors' \
-                                                    'to AttLSTMCond2Inputs'
+            assert len(input_shape[1]) == 3, 'When using an attention model, you should pass one 3D tensors' \
+                                             'to AttLSTMCond2Inputs'
 
-        if K.ndim(self.input_spec[1]) == 3:
+        if len(input_shape[1]) == 3:
             self.context1_steps = input_shape[1][1]
             self.context1_dim = input_shape[1][2]
 
-        if K.ndim(self.input_spec[2]) == 3:
+        if len(input_shape[2]) == 3:
             self.context2_steps = input_shape[2][1]
             self.context2_dim = input_shape[2][2]
         else:
             self.context2_dim = input_shape[2][1]
 
-        self.kernel = self.add_weight(shape=(self.context1_dim, self.units * 4),
-                                      initializer=self.kernel_initializer,
-                                      name='kernel',
-                                      regularizer=self.kernel_regularizer,
-                                      constraint=self.kernel_constraint)
-
-        self.kernel2 = self.add_weight(shape=(self.context2_dim, self.units * 4),
-                                       initializer=self.kernel_initializer2,
-                                       name='kernel2',
-                                       regularizer=self.kernel_regularizer2,
-                                       constraint=self.kernel_constraint2)
-
-        self.recurrent_kernel = self.add_weight(
-            shape=(self.units, self.units * 4),
-            name='recurrent_kernel',
-            initializer=self.recurrent_initializer,
-            regularizer=self.recurrent_regularizer,
-            constraint=self.recurrent_constraint)
+        if self.implementation == 1:
+            self.kernel = self.add_weight(shape=(self.context1_dim, self.units * 4),
+                                          initializer=self.kernel_initializer,
+                                          name='kernel',
+                                          regularizer=self.kernel_regularizer,
+                                          constraint=self.kernel_constraint)
+
+            self.kernel2 = self.add_weight(shape=(self.context2_dim, self.units * 4),
+                                           initializer=self.kernel_initializer2,
+                                           name='kernel2',
+                                           regularizer=self.kernel_regularizer2,
+                                           constraint=self.kernel_constraint2)
+
+            self.recurrent_kernel = self.add_weight(
+                shape=(self.units, self.units * 4),
+                name='recurrent_kernel',
+                initializer=self.recurrent_initializer,
+                regularizer=self.recurrent_regularizer,
+                constraint=self.recurrent_constraint)
+        else:
+            # [kernel; kernel2; recurrent_kernel]
+            self.fused_kernel = add_fused_kernel(
+                self,
+                [(self.context1_dim, self.kernel_initializer,
+                  self.kernel_regularizer, self.kernel_constraint),
+                 (self.context2_dim, self.kernel_initializer2,
+                  self.kernel_regularizer2, self.kernel_constraint2),
+                 (self.units, self.recurrent_initializer,
+                  self.recurrent_regularizer, self.recurrent_constraint)],
+                self.units * 4)
 
         self.recurrent_kernel_conditional = self.add_weight(
             shape=(self.units, self.units * 4),
@@ -8410,7 +8819,8 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[2, 3, 4, 5])
+                                             pos_extra_outputs_states=[2, 3, 4, 5],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             self.updates = []
             for i in range(len(states)):
@@ -8487,10 +8897,6 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
             context2 = states[pos_states + 3]  # Context 2
             mask_context2 = states[pos_states + 4]  # Context 2 mask
 
-        if K.ndim(mask_context1) > 1:  # Mask the context (only if necessary)
-            pctx_1 = mask_context1[:, :, None] * pctx_1
-            context1 = mask_context1[:, :, None] * context1
-
         # LSTM_1
         z_ = x + K.dot(h_tm1 * rec_dp_mask[0], self.recurrent_kernel_conditional)
         if self.use_bias:
@@ -8509,16 +8915,13 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
         h_ = o_ * self.activation(c_)
 
         # Attention model 1 (see Formulation in class header)
-        ctx_, alphas = compute_attention(h_, pctx_1, context, att_dp_mask, self.attention_recurrent_kernel,
-                                         self.attention_context_wa, self.bias_ca, mask_context1,
-                                         attention_mode=self.attention_mode)
+        ctx_1, alphas1 = compute_attention(h_, pctx_1, context1, att_dp_mask, self.attention_recurrent_kernel,
+                                           self.attention_context_wa, self.bias_ca, mask_context1,
+                                           attention_mode=self.attention_mode)
 
         if self.attend_on_both:
-            if K.ndim(mask_context2) > 1:  # Mask the context2 (only if necessary)
-                pctx_2 = mask_context2[:, :, None] * pctx_2
-                context2 = mask_context2[:, :, None] * context2
             # Attention model 2 (see Formulation in class header)
-            ctx_2, alphas2 = compute_attention(h_, pctx_1, context, att_dp_mask2, self.attention_recurrent_kernel2,
+            ctx_2, alphas2 = compute_attention(h_, pctx_2, context2, att_dp_mask2, self.attention_recurrent_kernel2,
                                                self.attention_context_wa2, self.bias_ca2, mask_context2,
                                                attention_mode=self.attention_mode)
         else:
@@ -8526,10 +8929,15 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
             alphas2 = mask_context2
 
         # LSTM_2
-        z = x + \
-            K.dot(h_ * rec_dp_mask[0], self.recurrent_kernel) + \
-            K.dot(ctx_2 * dp_mask2[0], self.kernel2) + \
-            K.dot(ctx_1 * dp_mask[0], self.kernel)
+        if self.implementation == 1:
+            z = x + \
+                K.dot(h_ * rec_dp_mask[0], self.recurrent_kernel) + \
+                K.dot(ctx_2 * dp_mask2[0], self.kernel2) + \
+                K.dot(ctx_1 * dp_mask[0], self.kernel)
+        else:
+            z = x + K.dot(K.concatenate([ctx_1 * dp_mask[0],
+                                         ctx_2 * dp_mask2[0],
+                                         h_ * rec_dp_mask[0]]), self.fused_kernel)
         if self.use_bias:
             z = K.bias_add(z, self.bias)
             if self.attend_on_both:
@@ -8626,49 +9034,60 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
             else:
                 constants.append([K.cast_to_floatx(1.)])
 
-        # States[11] - Context1
-        constants.append(self.context1)
-        # States[12] - MaskContext1
         if mask_context1 is None:
             mask_context1 = K.not_equal(K.sum(self.context1, axis=2), self.mask_value)
             mask_context1 = K.cast(mask_context1, K.floatx())
-        constants.append(mask_context1)
 
-        # States[13] - pctx_1
         if 0 < self.attention_dropout < 1:
             input_dim = self.context1_dim
             ones = K.ones_like(K.reshape(self.context1[:, :, 0], (-1, K.shape(self.context1)[1], 1)))
             ones = K.concatenate([ones] * input_dim, axis=2)
-            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones)]
+            B_Ua = [K.in_train_phase(K.dropout(ones, self.attention_dropout), ones, training=training)]
             pctx_1 = K.dot(self.context1 * B_Ua[0], self.attention_context_kernel)
         else:
             pctx_1 = K.dot(self.context1, self.attention_context_kernel)
         if self.use_bias:
             pctx_1 = K.bias_add(pctx_1, self.bias_ba)
+        context1 = self.context1
+        if K.ndim(mask_context1) > 1:  # Mask the context once (only if necessary)
+            pctx_1 = K.cast(mask_context1[:, :, None], K.dtype(pctx_1)) * pctx_1
+            context1 = K.cast(mask_context1[:, :, None], K.dtype(context1)) * context1
+
+        # States[11] - Context1
+        constants.append(context1)
+        # States[12] - MaskContext1
+        constants.append(mask_context1)
+        # States[13] - pctx_1
         constants.append(pctx_1)
 
-        # States[14] - Context2
-        constants.append(self.context2)
-        # States[15] - MaskContext2
         if self.attend_on_both:
             if mask_context2 is None:
                 mask_context2 = K.not_equal(K.sum(self.context2, axis=2), self.mask_value)
                 mask_context2 = K.cast(mask_context2, K.floatx())
         else:
             mask_context2 = K.ones_like(self.context2[:, 0])
-        constants.append(mask_context2)
+        context2 = self.context2
         if self.attend_on_both:
-            # States[16] - pctx_2
             if 0 < self.attention_dropout2 < 1:
                 input_dim = self.context2_dim
                 ones = K.ones_like(K.reshape(self.context2[:, :, 0], (-1, K.shape(self.context2)[1], 1)))
                 ones = K.concatenate([ones] * input_dim, axis=2)
-                B_Ua2 = [K.in_train_phase(K.dropout(ones, self.attention_dropout2), ones)]
+                B_Ua2 = [K.in_train_phase(K.dropout(ones, self.attention_dropout2), ones, training=training)]
                 pctx_2 = K.dot(self.context2 * B_Ua2[0], self.attention_context_kernel2)
             else:
                 pctx_2 = K.dot(self.context2, self.attention_context_kernel2)
             if self.use_bias:
                 pctx_2 = K.bias_add(pctx_2, self.bias_ba2)
+            if K.ndim(mask_context2) > 1:  # Mask the context once (only if necessary)
+                pctx_2 = K.cast(mask_context2[:, :, None], K.dtype(pctx_2)) * pctx_2
+                context2 = K.cast(mask_context2[:, :, None], K.dtype(context2)) * context2
+
+        # States[14] - Context2
+        constants.append(context2)
+        # States[15] - MaskContext2
+        constants.append(mask_context2)
+        if self.attend_on_both:
+            # States[16] - pctx_2
             constants.append(pctx_2)
 
         return constants
@@ -8777,6 +9196,7 @@ class AttConditionalLSTMCond2Inputs(Recurrent):
                   "conditional_dropout": self.conditional_dropout,
                   'attention_dropout': self.attention_dropout,
                   'attention_dropout2': self.attention_dropout2 if self.attend_on_both else None,
+                  'implementation': self.implementation,
                   'attention_mode': self.attention_mode
                   }
         base_config = super(AttConditionalLSTMCond2Inputs, self).get_config()
@@ -9392,7 +9812,8 @@ class AttLSTMCond3Inputs(Recurrent):
                                              constants=constants,
                                              unroll=self.unroll,
                                              input_length=K.shape(state_below)[1],
-                                             pos_extra_outputs_states=[2, 3, 4, 5, 6, 7])
+                                             pos_extra_outputs_states=[2, 3, 4, 5, 6, 7],
+                                             accumulate_extra_outputs_states=self.return_extra_variables)
         if self.stateful:
             self.updates = []
             for i in range(len(states)):
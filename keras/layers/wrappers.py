@@ -342,9 +342,15 @@ class Bidirectional(Wrapper):
             One of {'sum', 'mul', 'concat', 'ave', None}.
             If None, the outputs will not be combined,
             they will be returned as a list.
+        fused: Boolean (default False). If True, the forward and backward
+            RNNs run in a single loop over time, with the two directions
+            stacked along the batch axis, instead of one loop each.
+            Only for `RNN` layers (built from a cell), and not supported
+            by the CNTK backend.
 
     # Raises
-        ValueError: In case of invalid `merge_mode` argument.
+        ValueError: In case of invalid `merge_mode` argument,
+            or if `fused` is set for an unsupported layer.
 
     # Examples
 
@@ -359,11 +365,19 @@ class Bidirectional(Wrapper):
     ```
     """
 
-    def __init__(self, layer, merge_mode='concat', weights=None, **kwargs):
+    def __init__(self, layer, merge_mode='concat', weights=None, fused=False,
+                 **kwargs):
         if merge_mode not in ['sum', 'mul', 'ave', 'concat', None]:
             raise ValueError('Invalid merge mode. '
                              'Merge mode should be one of '
                              '{"sum", "mul", "ave", "concat", None}')
+        if fused:
+            if not isinstance(layer, recurrent.RNN):
+                raise ValueError('`fused=True` requires an `RNN` layer, '
+                                 'found: ' + str(layer))
+            if K.backend() == 'cntk':
+                raise ValueError('`fused=True` is not supported '
+                                 'with the CNTK backend.')
         self.forward_layer = copy.copy(layer)
         config = layer.get_config()
         config['go_backwards'] = not config['go_backwards']
@@ -371,6 +385,7 @@ class Bidirectional(Wrapper):
         self.forward_layer.name = 'forward_' + self.forward_layer.name
         self.backward_layer.name = 'backward_' + self.backward_layer.name
         self.merge_mode = merge_mode
+        self.fused = fused
         if weights:
             nw = len(weights)
             self.forward_layer.initial_weights = weights[:nw // 2]
@@ -498,7 +513,30 @@ class Bidirectional(Wrapper):
         if has_arg(self.layer.call, 'constants'):
             kwargs['constants'] = constants
 
-        if initial_state is not None and has_arg(self.layer.call, 'initial_state'):
+        if self.fused:
+            forward_state = None
+            backward_state = None
+            if isinstance(inputs, list):
+                if initial_state is not None:
+                    pivot = len(initial_state) // 2 + 1
+                    forward_state = inputs[1:pivot]
+                    if self._num_constants is None:
+                        backward_state = inputs[pivot:]
+                    else:
+                        backward_state = inputs[pivot:-self._num_constants]
+                if self._num_constants is not None:
+                    constants = inputs[-self._num_constants:]
+                inputs = inputs[0]
+            elif initial_state is not None:
+                forward_state = initial_state[:len(initial_state) // 2]
+                backward_state = initial_state[len(initial_state) // 2:]
+            y, y_rev = self._fused_call(inputs,
+                                        mask=mask,
+                                        training=training,
+                                        forward_state=forward_state,
+                                        backward_state=backward_state,
+                                        constants=constants)
+        elif initial_state is not None and has_arg(self.layer.call, 'initial_state'):
             forward_inputs = [inputs[0]]
             backward_inputs = [inputs[0]]
             pivot = len(initial_state) // 2 + 1
@@ -557,6 +595,105 @@ class Bidirectional(Wrapper):
             return [output] + states
         return output
 
+    def _fused_call(self, inputs, mask=None, training=None,
+                    forward_state=None, backward_state=None, constants=None):
+        """Runs the forward and backward RNNs in a single `K.rnn` loop.
+
+        The two directions are stacked along the batch axis: at each
+        timestep, the first half of the batch goes through the cell of
+        the forward layer and the second half through the cell of the
+        backward layer, each with its own weights.
+
+        # Returns
+            The outputs of the forward and backward layers, as returned
+            by their `call`.
+        """
+        layers = [self.forward_layer, self.backward_layer]
+        initial_states = []
+        for layer, initial_state in zip(layers, [forward_state, backward_state]):
+            if initial_state:
+                pass
+            elif layer.stateful:
+                initial_state = layer.states
+            else:
+                initial_state = layer.get_initial_state(inputs)
+            initial_states.append(initial_state)
+            # The cells generate their dropout masks on the first step.
+            for attr in ['_dropout_mask', '_recurrent_dropout_mask']:
+                if hasattr(layer.cell, attr):
+                    setattr(layer.cell, attr, None)
+
+        # A backward layer reads the reversed sequence from the start,
+        # which is what `go_backwards` does.
+        stacked_inputs = K.concatenate(
+            [K.reverse(inputs, 1) if layer.go_backwards else inputs
+             for layer in layers], axis=0)
+        stacked_states = [K.concatenate(list(states), axis=0)
+                          for states in zip(*initial_states)]
+        if isinstance(mask, list):
+            mask = mask[0]
+        if mask is not None:
+            mask = K.concatenate(
+                [K.reverse(mask, 1) if layer.go_backwards else mask
+                 for layer in layers], axis=0)
+
+        batch_size = K.shape(inputs)[0]
+        num_states = len(stacked_states)
+        kwargs = {}
+        if has_arg(self.forward_layer.cell.call, 'training'):
+            kwargs['training'] = training
+        if constants:
+            if not has_arg(self.forward_layer.cell.call, 'constants'):
+                raise ValueError('RNN cell does not support constants')
+
+        def step(step_inputs, states):
+            cell_kwargs = dict(kwargs)
+            if constants:
+                cell_kwargs['constants'] = states[num_states:]
+            states = states[:num_states]
+            halves = [(step_inputs[:batch_size], [state[:batch_size] for state in states]),
+                      (step_inputs[batch_size:], [state[batch_size:] for state in states])]
+            outputs = []
+            new_states = []
+            for layer, (half_inputs, half_states) in zip(layers, halves):
+                output, half_states = layer.cell.call(half_inputs, half_states,
+                                                      **cell_kwargs)
+                outputs.append(output)
+                new_states.append(half_states)
+            output = K.concatenate(outputs, axis=0)
+            if any(getattr(x, '_uses_learning_phase', False) for x in outputs):
+                output._uses_learning_phase = True
+            return output, [K.concatenate([forward, backward], axis=0)
+                            for forward, backward in zip(*new_states)]
+
+        last_output, outputs, states = K.rnn(step,
+                                             stacked_inputs,
+                                             stacked_states,
+                                             constants=constants,
+                                             mask=mask,
+                                             unroll=self.forward_layer.unroll,
+                                             input_length=K.int_shape(inputs)[1])
+
+        results = []
+        for layer, half in zip(layers, [slice(None, batch_size),
+                                        slice(batch_size, None)]):
+            if self.return_sequences:
+                output = outputs[half]
+            else:
+                output = last_output[half]
+            layer_states = [state[half] for state in states]
+            if layer.stateful:
+                layer.add_update(list(zip(layer.states, layer_states)), inputs)
+            if getattr(last_output, '_uses_learning_phase', False):
+                output._uses_learning_phase = True
+                for state in layer_states:
+                    state._uses_learning_phase = True
+            if self.return_state:
+                results.append([output] + layer_states)
+            else:
+                results.append(output)
+        return results
+
     def reset_states(self):
         self.forward_layer.reset_states()
         self.backward_layer.reset_states()
@@ -635,7 +772,8 @@ class Bidirectional(Wrapper):
         return constraints
 
     def get_config(self):
-        config = {'merge_mode': self.merge_mode}
+        config = {'merge_mode': self.merge_mode,
+                  'fused': self.fused}
         if self._num_constants is not None:
             config['num_constants'] = self._num_constants
 
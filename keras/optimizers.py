@@ -69,6 +69,10 @@ class Optimizer(object):
             when their L2 norm exceeds this value.
         clipvalue: float >= 0. Gradients will be clipped
             when their absolute value exceeds this value.
+
+    The `accumulate_steps` attribute (set by `Model.compile`) is the number
+    of runs of the updates over which the gradients are accumulated before
+    the variables are updated: see `get_accumulated_gradients`.
     """
 
     def __init__(self, **kwargs):
@@ -80,12 +84,66 @@ class Optimizer(object):
         self.__dict__.update(kwargs)
         self.updates = []
         self.weights = []
+        self.accumulate_steps = 1
+        self._apply_updates = None
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
         raise NotImplementedError
 
     def get_gradients(self, loss, params):
+        return self._clip_gradients(self._unclipped_gradients(loss, params))
+
+    def get_accumulated_gradients(self, loss, params):
+        """Starts the updates, and returns the gradients to make them with.
+
+        `get_updates` calls it first: it resets `self.updates`. If
+        `accumulate_steps` is more than 1, the gradients of `loss` are
+        summed in buffers over `accumulate_steps` runs of the updates, and
+        the mean of the buffers is returned (clipped as by `get_gradients`).
+        The writes made with `_update` are then only applied at the last of
+        these runs, which also resets the buffers.
+
+        Subclasses can override it to accumulate the gradients differently.
+
+        # Arguments
+            loss: Loss tensor.
+            params: List of the parameters to train.
+
+        # Returns
+            The list of the gradients of the parameters.
+        """
+        self.updates = []
+        self._apply_updates = None
+        if self.accumulate_steps <= 1:
+            return self.get_gradients(loss, params)
+        with K.name_scope('gradient_accumulation'):
+            step = K.variable(0, dtype='int64', name='accumulation_step')
+            accumulators = [K.zeros(K.int_shape(p), dtype=K.dtype(p))
+                            for p in params]
+        # All the updates depend on `_apply_updates`, so that it is computed
+        # before any variable changes.
+        self._apply_updates = K.equal(step, self.accumulate_steps - 1)
+        self.updates.append(K.update(step, K.switch(self._apply_updates,
+                                                    K.zeros_like(step),
+                                                    step + 1)))
+        sums = [a + g for a, g in
+                zip(accumulators, self._unclipped_gradients(loss, params))]
+        for a, g_sum in zip(accumulators, sums):
+            self.updates.append(K.update(a, K.switch(self._apply_updates,
+                                                     K.zeros_like(g_sum),
+                                                     g_sum)))
+        return self._clip_gradients([g_sum / self.accumulate_steps
+                                     for g_sum in sums])
+
+    def _update(self, x, new_x):
+        """Update of the variable `x` to `new_x`, applied only at the last
+        of the `accumulate_steps` runs of the updates."""
+        if self._apply_updates is not None:
+            new_x = K.switch(self._apply_updates, new_x, x)
+        return K.update(x, new_x)
+
+    def _unclipped_gradients(self, loss, params):
         grads = K.gradients(loss, params)
         if None in grads:
             raise ValueError('An operation has `None` for gradient. '
@@ -93,6 +151,9 @@ class Optimizer(object):
                              'gradient defined (i.e. are differentiable). '
                              'Common ops without gradient: '
                              'K.argmax, K.round, K.eval.')
+        return grads
+
+    def _clip_gradients(self, grads):
         if hasattr(self, 'clipnorm') and self.clipnorm > 0:
             norm = K.sqrt(sum([K.sum(K.square(g)) for g in grads]))
             grads = [clip_norm(g, self.clipnorm, norm) for g in grads]
@@ -185,7 +246,7 @@ class PAS(Optimizer):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
+        grads = self.get_accumulated_gradients(loss, params)
         lr = self.lr
         C = self.c
         weights_init = self.get_weights()
@@ -200,7 +261,7 @@ class PAS(Optimizer):
             if getattr(wk, 'constraint', None) is not None:
                 new_wk = wk.constraint(new_wk)
 
-            self.updates.append(K.update(wk, new_wk))
+            self.updates.append(self._update(wk, new_wk))
         return self.updates
 
     def get_config(self):
@@ -224,7 +285,7 @@ class PAS2(PAS):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
+        grads = self.get_accumulated_gradients(loss, params)
         lr = self.lr
         weights_init = self.get_weights()
         l = self.loss_value
@@ -238,7 +299,7 @@ class PAS2(PAS):
             if getattr(wk, 'constraint', None) is not None:
                 new_wk = wk.constraint(new_wk)
 
-            self.updates.append(K.update(wk, new_wk))
+            self.updates.append(self._update(wk, new_wk))
         return self.updates
 
     def get_config(self):
@@ -262,7 +323,7 @@ class PPAS(PAS):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
+        grads = self.get_accumulated_gradients(loss, params)
         lr = self.lr
         weights_init = self.get_weights()
         l = self.loss_value
@@ -275,7 +336,7 @@ class PPAS(PAS):
             if getattr(new_wk, 'constraint', None) is not None:
                 p_new_wk = wk.constraint(p_new_wk)
 
-            self.updates.append(K.update(wk, p_new_wk))
+            self.updates.append(self._update(wk, p_new_wk))
         return self.updates
 
     def get_config(self):
@@ -311,8 +372,8 @@ class SGD(Optimizer):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
-        self.updates = [K.update_add(self.iterations, 1)]
+        grads = self.get_accumulated_gradients(loss, params)
+        self.updates.append(self._update(self.iterations, self.iterations + 1))
 
         lr = self.lr
         if self.initial_decay > 0:
@@ -324,7 +385,7 @@ class SGD(Optimizer):
         self.weights = [self.iterations] + moments
         for p, g, lmul, m in zip(params, grads, learning_rate_multipliers, moments):
             v = self.momentum * m - lr * lmul * g  # velocity
-            self.updates.append(K.update(m, v))
+            self.updates.append(self._update(m, v))
 
             if self.nesterov:
                 new_p = p + self.momentum * v - (lr * lmul) * g
@@ -335,7 +396,7 @@ class SGD(Optimizer):
             if getattr(p, 'constraint', None) is not None:
                 new_p = p.constraint(new_p)
 
-            self.updates.append(K.update(p, new_p))
+            self.updates.append(self._update(p, new_p))
         return self.updates
 
     def get_config(self):
@@ -382,10 +443,10 @@ class RMSprop(Optimizer):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
+        grads = self.get_accumulated_gradients(loss, params)
         accumulators = [K.zeros(K.int_shape(p), dtype=K.dtype(p)) for p in params]
         self.weights = accumulators
-        self.updates = [K.update_add(self.iterations, 1)]
+        self.updates.append(self._update(self.iterations, self.iterations + 1))
 
         lr = self.lr
         if self.initial_decay > 0:
@@ -395,14 +456,14 @@ class RMSprop(Optimizer):
         for p, g, a, lmul in zip(params, grads, accumulators, learning_rate_multipliers):
             # update accumulator
             new_a = self.rho * a + (1. - self.rho) * K.square(g)
-            self.updates.append(K.update(a, new_a))
+            self.updates.append(self._update(a, new_a))
             new_p = p - lr * lmul * g / (K.sqrt(new_a) + self.epsilon)
 
             # Apply constraints.
             if getattr(p, 'constraint', None) is not None:
                 new_p = p.constraint(new_p)
 
-            self.updates.append(K.update(p, new_p))
+            self.updates.append(self._update(p, new_p))
         return self.updates
 
     def get_config(self):
@@ -452,12 +513,12 @@ class Adagrad(Optimizer):
 
         # 0. Suffer lox f_1(x_t) -> loss
         # 1. Recieve subgradient g_t
-        grads = self.get_gradients(loss, params)
+        grads = self.get_accumulated_gradients(loss, params)
 
         shapes = [K.int_shape(p) for p in params]
         accumulators = [K.zeros(shape) for shape in shapes]
         self.weights = accumulators
-        self.updates = [K.update_add(self.iterations, 1)]
+        self.updates.append(self._update(self.iterations, self.iterations + 1))
 
         lr = self.lr
         if self.initial_decay > 0:
@@ -466,14 +527,14 @@ class Adagrad(Optimizer):
 
         for p, g, a, lmul in zip(params, grads, accumulators, learning_rate_multipliers):
             new_a = a + K.square(g)  # update accumulator G_t
-            self.updates.append(K.update(a, new_a))
+            self.updates.append(self._update(a, new_a))
             new_p = p - lr * lmul * g / (K.sqrt(new_a) + self.epsilon)
 
             # Apply constraints.
             if getattr(p, 'constraint', None) is not None:
                 new_p = p.constraint(new_p)
 
-            self.updates.append(K.update(p, new_p))
+            self.updates.append(self._update(p, new_p))
         return self.updates
 
     def get_config(self):
@@ -525,12 +586,12 @@ class Adadelta(Optimizer):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
+        grads = self.get_accumulated_gradients(loss, params)
         shapes = [K.int_shape(p) for p in params]
         accumulators = [K.zeros(shape) for shape in shapes]
         delta_accumulators = [K.zeros(shape) for shape in shapes]
         self.weights = accumulators + delta_accumulators
-        self.updates = [K.update_add(self.iterations, 1)]
+        self.updates.append(self._update(self.iterations, self.iterations + 1))
 
         lr = self.lr
         if self.initial_decay > 0:
@@ -540,7 +601,7 @@ class Adadelta(Optimizer):
         for p, g, a, d_a, lmul in zip(params, grads, accumulators, delta_accumulators, learning_rate_multipliers):
             # update accumulator
             new_a = self.rho * a + (1. - self.rho) * K.square(g)
-            self.updates.append(K.update(a, new_a))
+            self.updates.append(self._update(a, new_a))
 
             # use the new accumulator and the *old* delta_accumulator
             update = g * K.sqrt(d_a + self.epsilon) / K.sqrt(new_a + self.epsilon)
@@ -550,11 +611,11 @@ class Adadelta(Optimizer):
             if getattr(p, 'constraint', None) is not None:
                 new_p = p.constraint(new_p)
 
-            self.updates.append(K.update(p, new_p))
+            self.updates.append(self._update(p, new_p))
 
             # update delta_accumulator
             new_d_a = self.rho * d_a + (1 - self.rho) * K.square(update)
-            self.updates.append(K.update(d_a, new_d_a))
+            self.updates.append(self._update(d_a, new_d_a))
         return self.updates
 
     def get_config(self):
@@ -603,8 +664,8 @@ class Adam(Optimizer):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
-        self.updates = [K.update_add(self.iterations, 1)]
+        grads = self.get_accumulated_gradients(loss, params)
+        self.updates.append(self._update(self.iterations, self.iterations + 1))
 
         lr = self.lr
         if self.initial_decay > 0:
@@ -629,19 +690,19 @@ class Adam(Optimizer):
             if self.amsgrad:
                 vhat_t = K.maximum(vhat, v_t)
                 p_t = p - lr_t * m_t * lmul / (K.sqrt(vhat_t) + self.epsilon)
-                self.updates.append(K.update(vhat, vhat_t))
+                self.updates.append(self._update(vhat, vhat_t))
             else:
                 p_t = p - lr_t * m_t * lmul / (K.sqrt(v_t) + self.epsilon)
 
-            self.updates.append(K.update(m, m_t))
-            self.updates.append(K.update(v, v_t))
+            self.updates.append(self._update(m, m_t))
+            self.updates.append(self._update(v, v_t))
             new_p = p_t
 
             # Apply constraints.
             if getattr(p, 'constraint', None) is not None:
                 new_p = p.constraint(new_p)
 
-            self.updates.append(K.update(p, new_p))
+            self.updates.append(self._update(p, new_p))
         return self.updates
 
     def get_config(self):
@@ -687,8 +748,8 @@ class Adamax(Optimizer):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
-        self.updates = [K.update_add(self.iterations, 1)]
+        grads = self.get_accumulated_gradients(loss, params)
+        self.updates.append(self._update(self.iterations, self.iterations + 1))
 
         lr = self.lr
         if self.initial_decay > 0:
@@ -711,15 +772,15 @@ class Adamax(Optimizer):
             u_t = K.maximum(self.beta_2 * u, K.abs(g))
             p_t = p - (lr_t * lmul) * m_t / (u_t + self.epsilon)
 
-            self.updates.append(K.update(m, m_t))
-            self.updates.append(K.update(u, u_t))
+            self.updates.append(self._update(m, m_t))
+            self.updates.append(self._update(u, u_t))
             new_p = p_t
 
             # Apply constraints.
             if getattr(p, 'constraint', None) is not None:
                 new_p = p.constraint(new_p)
 
-            self.updates.append(K.update(p, new_p))
+            self.updates.append(self._update(p, new_p))
         return self.updates
 
     def get_config(self):
@@ -768,8 +829,8 @@ class Nadam(Optimizer):
 
     @interfaces.legacy_get_updates_support
     def get_updates(self, loss, params, learning_rate_multipliers):
-        grads = self.get_gradients(loss, params)
-        self.updates = [K.update_add(self.iterations, 1)]
+        grads = self.get_accumulated_gradients(loss, params)
+        self.updates.append(self._update(self.iterations, self.iterations + 1))
 
         t = K.cast(self.iterations, K.floatx()) + 1
 
@@ -780,7 +841,7 @@ class Nadam(Optimizer):
             1. - 0.5 * (K.pow(K.cast_to_floatx(0.96), (t + 1) * self.schedule_decay)))
         m_schedule_new = self.m_schedule * momentum_cache_t
         m_schedule_next = self.m_schedule * momentum_cache_t * momentum_cache_t_1
-        self.updates.append((self.m_schedule, m_schedule_new))
+        self.updates.append(self._update(self.m_schedule, m_schedule_new))
 
         shapes = [K.int_shape(p) for p in params]
         ms = [K.zeros(shape) for shape in shapes]
@@ -797,8 +858,8 @@ class Nadam(Optimizer):
             v_t_prime = v_t / (1. - K.pow(self.beta_2, t))
             m_t_bar = (1. - momentum_cache_t) * g_prime + momentum_cache_t_1 * m_t_prime
 
-            self.updates.append(K.update(m, m_t))
-            self.updates.append(K.update(v, v_t))
+            self.updates.append(self._update(m, m_t))
+            self.updates.append(self._update(v, v_t))
 
             p_t = p - (self.lr * lmul) * m_t_bar / (K.sqrt(v_t_prime) + self.epsilon)
             new_p = p_t
@@ -807,7 +868,7 @@ class Nadam(Optimizer):
             if getattr(p, 'constraint', None) is not None:
                 new_p = p.constraint(new_p)
 
-            self.updates.append(K.update(p, new_p))
+            self.updates.append(self._update(p, new_p))
         return self.updates
 
     def get_config(self):
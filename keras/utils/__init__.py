@@ -4,11 +4,14 @@ from . import generic_utils
 from . import data_utils
 from . import io_utils
 from . import conv_utils
+from . import decoding
+from . import inference_utils
 
 # Globally-importable utils.
 from .io_utils import HDF5Matrix
 from .data_utils import get_file
 from .data_utils import Sequence
+from .data_utils import BucketedSequence
 from .data_utils import GeneratorEnqueuer
 from .data_utils import OrderedEnqueuer
 from .generic_utils import CustomObjectScope
@@ -24,3 +27,7 @@ from .vis_utils import plot_model
 from .np_utils import to_categorical
 from .np_utils import normalize
 from .multi_gpu_utils import multi_gpu_model
+from .decoding import beam_search
+from .inference_utils import fold_batch_normalization
+from .inference_utils import optimize_for_inference
+from .inference_utils import quantize_model
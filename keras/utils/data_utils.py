@@ -373,6 +373,198 @@ class Sequence(object):
             yield item
 
 
+def _is_sequence_data(data):
+    """Whether `data` holds variable-length sequences (padded per batch)."""
+    if isinstance(data, np.ndarray):
+        return data.dtype == object
+    return isinstance(data, (list, tuple))
+
+
+def _pad_batch(sequences, value=0., padding='post'):
+    """Pads a list of sequences to the length of the longest one.
+
+    # Arguments
+        sequences: List of sequences (lists or Numpy arrays of shape
+            `(length, ...)`).
+        value: Value used for the padding.
+        padding: `'pre'` or `'post'`, pad before or after each sequence.
+
+    # Returns
+        Numpy array of shape `(len(sequences), max_length, ...)`.
+    """
+    sequences = [np.asarray(sequence) for sequence in sequences]
+    max_length = max(len(sequence) for sequence in sequences)
+    sample = next((sequence for sequence in sequences if len(sequence)),
+                  sequences[0])
+    batch = np.full((len(sequences), max_length) + sample.shape[1:], value,
+                    dtype=sample.dtype)
+    for i, sequence in enumerate(sequences):
+        if not len(sequence):
+            continue
+        if padding == 'post':
+            batch[i, :len(sequence)] = sequence
+        else:
+            batch[i, -len(sequence):] = sequence
+    return batch
+
+
+class BucketedSequence(Sequence):
+    """Batches of variable-length sequences grouped by length.
+
+    The samples are grouped into buckets of similar lengths and each batch
+    is made of samples of a single bucket. Each batch is padded to the
+    length of its own longest sequence, so the recurrent layers spend much
+    less time on masked padding steps than with batches of random samples.
+
+    At the end of every epoch (if `shuffle=True`), the samples are shuffled
+    within their bucket and the batches are shuffled across buckets.
+
+    # Arguments
+        x: Input data. Either a list of sequences (lists or Numpy arrays of
+            shape `(length, ...)`), padded per batch, or a Numpy array with
+            one row per sample, which is not padded.
+            Models with several inputs take a dict mapping input names to
+            input data.
+        y: Target data, in the same formats as `x`, or `None`.
+        batch_size: Maximum number of samples per batch.
+        bucket_boundaries: Increasing list of lengths. The bucket `i` holds
+            the samples of length in `(bucket_boundaries[i - 1],
+            bucket_boundaries[i]]`. Longer samples go to a last bucket.
+        lengths: Length of each sample, used to choose its bucket.
+            By default, the length of the longest sequence of the sample.
+        sample_weight: Optional Numpy array of weights for the samples.
+        padding_value: Value used to pad the sequences.
+        padding: `'pre'` or `'post'`, pad before or after each sequence.
+        shuffle: Whether to shuffle the samples and the batches at the end
+            of each epoch.
+        verbose: If 1, prints the padding efficiency of each epoch.
+
+    # Example
+
+    ```python
+        sequence = BucketedSequence({'source_text': x_src, 'state_below': x_trg},
+                                    y_trg, batch_size=50,
+                                    bucket_boundaries=[10, 20, 30, 50])
+        model.fit_generator(sequence, epochs=10, workers=4)
+        print(sequence.padding_efficiency)
+    ```
+
+    # Raises
+        ValueError: In case of invalid arguments.
+    """
+
+    def __init__(self, x, y, batch_size, bucket_boundaries, lengths=None,
+                 sample_weight=None, padding_value=0., padding='post',
+                 shuffle=True, verbose=0):
+        if padding not in {'pre', 'post'}:
+            raise ValueError('`padding` should be "pre" or "post". '
+                             'Received: ' + str(padding))
+        if list(bucket_boundaries) != sorted(bucket_boundaries):
+            raise ValueError('`bucket_boundaries` should be increasing. '
+                             'Received: ' + str(bucket_boundaries))
+        self.x = x
+        self.y = y
+        self.sample_weight = sample_weight
+        self.batch_size = batch_size
+        self.bucket_boundaries = list(bucket_boundaries)
+        self.padding_value = padding_value
+        self.padding = padding
+        self.shuffle = shuffle
+        self.verbose = verbose
+
+        all_data = self._flatten(x) + self._flatten(y)
+        num_samples = set(len(data) for data in all_data)
+        if sample_weight is not None:
+            num_samples.add(len(sample_weight))
+        if len(num_samples) != 1:
+            raise ValueError('All the data should have the same number of '
+                             'samples. Found: ' + str(sorted(num_samples)))
+        self.num_samples = num_samples.pop()
+
+        self.sequence_data = [data for data in all_data if _is_sequence_data(data)]
+        self.sequence_lengths = [np.array([len(sequence) for sequence in data])
+                                 for data in self.sequence_data]
+        if lengths is None:
+            if not self.sequence_data:
+                raise ValueError('`BucketedSequence` needs sequence data or '
+                                 '`lengths` to bucket the samples.')
+            lengths = np.max(self.sequence_lengths, axis=0)
+        self.lengths = np.asarray(lengths)
+        if len(self.lengths) != self.num_samples:
+            raise ValueError('`lengths` should have one value per sample. '
+                             'Found %d values for %d samples.' %
+                             (len(self.lengths), self.num_samples))
+
+        bucket_ids = np.searchsorted(self.bucket_boundaries, self.lengths)
+        self.buckets = [np.nonzero(bucket_ids == i)[0]
+                        for i in range(len(self.bucket_boundaries) + 1)]
+        self.buckets = [bucket for bucket in self.buckets if len(bucket)]
+        self.padding_efficiency = None
+        self._make_batches()
+
+    @staticmethod
+    def _flatten(data):
+        if data is None:
+            return []
+        if isinstance(data, dict):
+            return [data[key] for key in sorted(data)]
+        return [data]
+
+    def _make_batches(self):
+        """Splits the buckets into batches, shuffling them if necessary."""
+        batches = []
+        for bucket in self.buckets:
+            if self.shuffle:
+                bucket = np.random.permutation(bucket)
+            for start in range(0, len(bucket), self.batch_size):
+                batches.append(bucket[start:start + self.batch_size])
+        if self.shuffle:
+            np.random.shuffle(batches)
+        self.batches = batches
+
+        # Fraction of the padded elements which are actual data.
+        num_elements = 0
+        num_padded_elements = 0
+        for lengths in self.sequence_lengths:
+            for batch in batches:
+                batch_lengths = lengths[batch]
+                num_elements += np.sum(batch_lengths)
+                num_padded_elements += len(batch) * np.max(batch_lengths)
+        if num_padded_elements:
+            self.padding_efficiency = num_elements / float(num_padded_elements)
+
+    def _get_data(self, data, batch):
+        if isinstance(data, dict):
+            return dict((key, self._get_data(value, batch))
+                        for key, value in data.items())
+        if _is_sequence_data(data):
+            return _pad_batch([data[i] for i in batch],
+                              value=self.padding_value,
+                              padding=self.padding)
+        return data[batch]
+
+    def __getitem__(self, index):
+        batch = self.batches[index]
+        batch_x = self._get_data(self.x, batch)
+        if self.y is None:
+            return batch_x
+        batch_y = self._get_data(self.y, batch)
+        if self.sample_weight is None:
+            return batch_x, batch_y
+        return batch_x, batch_y, self.sample_weight[batch]
+
+    def __len__(self):
+        return len(self.batches)
+
+    def on_epoch_end(self):
+        if self.verbose and self.padding_efficiency is not None:
+            print('Padding efficiency: %.2f%% of the padded elements are data '
+                  '(%d buckets, %d batches)' %
+                  (100. * self.padding_efficiency, len(self.buckets),
+                   len(self.batches)))
+        self._make_batches()
+
+
 # Global variables to be shared across processes
 _SHARED_SEQUENCES = {}
 # We use a Value to provide unique id to different processes.
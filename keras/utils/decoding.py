@@ -0,0 +1,204 @@
+"""Batched decoding utilities for the attention-conditional recurrent layers."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+
+def _take(arrays, indices):
+    """Gathers the rows `indices` of each array of a list."""
+    return [array[indices] for array in arrays]
+
+
+def beam_search(step_function, states, start_index, end_index,
+                constants=None, beam_size=5, max_length=50,
+                length_normalization=0., return_n_best=False):
+    """Decodes a batch of samples with beam search.
+
+    All the hypotheses of all the samples are expanded at once by a single
+    call to `step_function` per timestep. The top-k selection is vectorized
+    over the samples, the states are reordered by gathering them along the
+    backpointers of the selected hypotheses, and finished hypotheses are
+    removed from the batch, which shrinks as decoding progresses.
+
+    # Example
+
+    ```python
+        layer = model.get_layer('decoder')  # E.g. an `AttLSTMCond` layer
+        step_function = get_attention_step_function(
+            layer,
+            embedding_function=lambda words: embedding_weights[words],
+            output_function=lambda prev_word_emb, outputs: probs_fn([outputs[0]])[0])
+        sequences, scores = beam_search(step_function,
+                                        states=[h_0, c_0],
+                                        constants=layer.preprocess_context(context),
+                                        start_index=0,
+                                        end_index=eos_index)
+    ```
+
+    # Arguments
+        step_function: Function with signature
+            `(prev_words, states, constants) -> (log_probs, new_states)`,
+            where `prev_words` is an integer array of shape `(n,)` with the
+            last word of each hypothesis, `states` and `constants` are lists
+            of arrays of shape `(n, ...)`, `log_probs` is an array of shape
+            `(n, vocabulary_size)` with the log-probabilities of the next word
+            and `new_states` is a list of arrays of shape `(n, ...)`.
+        states: List of arrays of shape `(num_samples, ...)` with the
+            initial states of each sample.
+        start_index: Index of the word fed at the first timestep.
+        end_index: Index of the end-of-sequence word.
+        constants: List of arrays of shape `(num_samples, ...)` which do not
+            change during decoding (e.g. the cached contexts returned by
+            `preprocess_context`).
+        beam_size: Number of hypotheses kept for each sample.
+        max_length: Maximum length of the decoded sequences.
+        length_normalization: Float. The scores of the finished hypotheses are
+            divided by `length ** length_normalization` before ranking them.
+            `0.` ranks by the sum of log-probabilities and `1.` by the
+            average log-probability of the words.
+        return_n_best: Whether to return all the finished hypotheses of each
+            sample instead of the best one.
+
+    # Returns
+        A tuple `(sequences, scores)`. `sequences[i]` is an integer array with
+        the best sequence of the sample `i` (including the end-of-sequence
+        word, if generated) and `scores[i]` its normalized score.
+        If `return_n_best` is `True`, `sequences[i]` and `scores[i]` are lists
+        with the hypotheses of the sample `i`, sorted from best to worst.
+
+    # Raises
+        ValueError: if neither `states` nor `constants` are provided.
+    """
+    if not isinstance(states, list):
+        states = [states]
+    if constants is None:
+        constants = []
+    elif not isinstance(constants, list):
+        constants = [constants]
+    if not states and not constants:
+        raise ValueError('`beam_search` needs at least one state or constant '
+                         'to know the number of samples.')
+    num_samples = (states or constants)[0].shape[0]
+
+    finished = [[] for _ in range(num_samples)]
+    num_finished = np.zeros((num_samples,), dtype='int32')
+
+    # Active hypotheses, grouped by sample.
+    sample_ids = np.arange(num_samples)
+    prev_words = np.full((num_samples,), start_index, dtype='int32')
+    scores = np.zeros((num_samples,))
+    sequences = np.zeros((num_samples, 0), dtype='int32')
+    active_constants = constants
+    constants_ids = sample_ids
+
+    for t in range(max_length):
+        # The constants only need to be gathered when the hypotheses change.
+        if not np.array_equal(constants_ids, sample_ids):
+            active_constants = _take(constants, sample_ids)
+            constants_ids = sample_ids
+        log_probs, states = step_function(prev_words, states, active_constants)
+        states = list(states)
+        vocabulary_size = log_probs.shape[1]
+        candidate_scores = scores[:, None] + log_probs
+
+        # Lay out the candidates of each sample in a row of `all_scores`.
+        samples, hyp_starts, hyp_counts = np.unique(sample_ids,
+                                                    return_index=True,
+                                                    return_counts=True)
+        rows = np.searchsorted(samples, sample_ids)
+        positions = np.arange(len(sample_ids)) - hyp_starts[rows]
+        all_scores = np.full((len(samples), np.max(hyp_counts), vocabulary_size),
+                             -np.inf)
+        all_scores[rows, positions] = candidate_scores
+        all_scores = all_scores.reshape((len(samples), -1))
+
+        # Top-k selection for all the samples at once.
+        k = min(beam_size, all_scores.shape[1])
+        row_indices = np.arange(len(samples))[:, None]
+        best = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        best_scores = all_scores[row_indices, best]
+        order = np.argsort(-best_scores, axis=1)
+        best = best[row_indices, order]
+        best_scores = best_scores[row_indices, order]
+        keep = np.arange(k)[None, :] < (beam_size - num_finished[samples])[:, None]
+        keep &= np.isfinite(best_scores)
+        kept_rows, kept_cols = np.nonzero(keep)
+
+        # Reorder the hypotheses by their backpointers.
+        backpointers = (hyp_starts[kept_rows] +
+                        best[kept_rows, kept_cols] // vocabulary_size)
+        words = (best[kept_rows, kept_cols] % vocabulary_size).astype('int32')
+        scores = best_scores[kept_rows, kept_cols]
+        sample_ids = sample_ids[backpointers]
+        sequences = np.concatenate([sequences[backpointers], words[:, None]], axis=1)
+        states = _take(states, backpointers)
+
+        # Move the finished hypotheses out of the batch.
+        if t == max_length - 1:
+            is_finished = np.ones_like(words, dtype=bool)
+        else:
+            is_finished = words == end_index
+        length_penalty = float(sequences.shape[1]) ** length_normalization
+        for i in np.nonzero(is_finished)[0]:
+            finished[sample_ids[i]].append((sequences[i],
+                                            scores[i] / length_penalty))
+            num_finished[sample_ids[i]] += 1
+        active = np.logical_not(is_finished)
+        if not np.any(active):
+            break
+        sample_ids = sample_ids[active]
+        prev_words = words[active]
+        scores = scores[active]
+        sequences = sequences[active]
+        states = _take(states, active)
+
+    best_sequences = []
+    best_scores = []
+    for hypotheses in finished:
+        hypotheses = sorted(hypotheses, key=lambda hypothesis: -hypothesis[1])
+        if not hypotheses:
+            hypotheses = [(np.zeros((0,), dtype='int32'), -np.inf)]
+        if return_n_best:
+            best_sequences.append([sequence for sequence, _ in hypotheses])
+            best_scores.append([score for _, score in hypotheses])
+        else:
+            best_sequences.append(hypotheses[0][0])
+            best_scores.append(hypotheses[0][1])
+    return best_sequences, best_scores
+
+
+def get_attention_step_function(decoder_layer, embedding_function,
+                                output_function, epsilon=1e-12):
+    """Builds a `beam_search` step function from an attention-conditional layer.
+
+    # Arguments
+        decoder_layer: A built attention-conditional recurrent layer
+            (e.g. `AttLSTMCond` or `AttConditionalLSTMCond`).
+        embedding_function: Function mapping an integer array of shape `(n,)`
+            with the previous words to their embeddings, of shape
+            `(n, input_dim)`.
+        output_function: Function with signature
+            `(prev_word_emb, decoder_outputs) -> probs`, where
+            `decoder_outputs` is the list returned by the step function of the
+            layer (new states, attended contexts and attention weights)
+            and `probs` is an array of shape `(n, vocabulary_size)`.
+        epsilon: Constant added to the probabilities before taking their log.
+
+    # Returns
+        A step function for `beam_search`. The `states` of the search are the
+        recurrent states of the layer and its `constants` are the ones
+        returned by `decoder_layer.preprocess_context`.
+    """
+    layer_step_function = decoder_layer.get_step_function()
+    num_states = decoder_layer._num_recurrent_states
+
+    def step_function(prev_words, states, constants):
+        prev_word_emb = embedding_function(prev_words)
+        decoder_outputs = layer_step_function([prev_word_emb] + list(states) +
+                                              list(constants))
+        probs = output_function(prev_word_emb, decoder_outputs)
+        return np.log(probs + epsilon), decoder_outputs[:num_states]
+
+    return step_function
@@ -0,0 +1,357 @@
+"""Model transforms that speed up inference.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+
+# Layers whose outputs are an affine function of their kernel and bias,
+# along the channel axis.
+_FOLDABLE_LAYERS = ('Dense', 'Conv1D', 'Conv2D', 'Conv3D', 'DepthwiseConv2D',
+                    'SeparableConv1D', 'SeparableConv2D')
+
+
+def _to_functional(model):
+    """Returns `model` as a graph network, with a functional config."""
+    from ..models import Model
+    if model.__class__.__name__ == 'Sequential':
+        return Model(model.inputs, model.outputs, name=model.name)
+    return model
+
+
+def _build_model(config, weights, custom_objects=None):
+    """Builds a `Model` from a config and the weights of its layers by name."""
+    from ..models import Model
+    model = Model.from_config(config, custom_objects=custom_objects)
+    for layer in model.layers:
+        if weights.get(layer.name):
+            layer.set_weights(weights[layer.name])
+    return model
+
+
+def _consumers(config):
+    """Maps each layer name to the list of layers (or model outputs) using it."""
+    consumers = {}
+    for layer_config in config['layers']:
+        for node in layer_config['inbound_nodes']:
+            for inbound in node:
+                consumers.setdefault(inbound[0], []).append(layer_config['name'])
+    for output in config['output_layers']:
+        consumers.setdefault(output[0], []).append(None)
+    return consumers
+
+
+def _bypass(config, layer_config):
+    """Removes a layer, connecting its consumers to its inputs.
+
+    Each node of the layer must have a single input.
+    """
+    inputs = [node[0] for node in layer_config['inbound_nodes']]
+    config['layers'].remove(layer_config)
+    entries = [inbound for other_config in config['layers']
+               for node in other_config['inbound_nodes'] for inbound in node]
+    for entry in entries + config['output_layers']:
+        if entry[0] == layer_config['name']:
+            entry[:3] = inputs[entry[1]][:3]
+
+
+def _normalization_coefficients(layer_config, weights):
+    """Per-channel `(scale, offset)` of a `BatchNormalization` or `Scale`."""
+    if layer_config['class_name'] == 'Scale':
+        gamma, beta = weights
+        return gamma, beta
+    bn_config = layer_config['config']
+    weights = list(weights)
+    gamma = weights.pop(0) if bn_config['scale'] else 1.
+    beta = weights.pop(0) if bn_config['center'] else 0.
+    mean, variance = weights
+    scale = gamma / np.sqrt(variance + bn_config['epsilon'])
+    return scale, beta - mean * scale
+
+
+def _fold(layer_config, weights, scale, offset):
+    """Folds a per-channel affine transform into the weights of a layer."""
+    kernel_index = 1 if layer_config['class_name'].startswith('Separable') else 0
+    kernel = weights[kernel_index]
+    if layer_config['class_name'] == 'DepthwiseConv2D':
+        # The output channels are the input channels times the depth multiplier.
+        kernel = kernel * np.reshape(scale, kernel.shape[-2:])
+    else:
+        kernel = kernel * scale
+    if layer_config['config']['use_bias']:
+        bias = weights[-1] * scale + offset
+        weights = weights[:-1]
+    else:
+        bias = offset * np.ones_like(scale)
+    weights = list(weights)
+    weights[kernel_index] = kernel
+    layer_config['config']['use_bias'] = True
+    return weights + [bias.astype(kernel.dtype)]
+
+
+def fold_batch_normalization(model, custom_objects=None):
+    """Folds the `BatchNormalization` and `Scale` layers into the preceding layers.
+
+    At inference time, a `BatchNormalization` layer (with its moving
+    statistics) and a `Scale` layer are per-channel affine transforms.
+    When such a layer directly follows a `Dense`, convolution or
+    depthwise convolution layer with a linear activation, whose output
+    is not used elsewhere, the transform is folded into the kernel and
+    bias of that layer and the normalization layer is removed. Chains
+    such as the `BatchNormalization` + `Scale` pairs of the models
+    converted from Caffe by `keras.caffe.convert` are folded entirely.
+
+    # Arguments
+        model: A `Sequential` or functional `Model` instance.
+            It is not modified.
+        custom_objects: Optional dictionary mapping names
+            (strings) to the custom classes used in the model.
+
+    # Returns
+        A new `Model` with the same predictions (up to rounding) and
+        without the folded layers. It should only be used for inference:
+        the batch statistics are no longer computed in training.
+    """
+    model = _to_functional(model)
+    config = model.get_config()
+    weights = {layer.name: layer.get_weights() for layer in model.layers}
+    output_ndims = {layer.name: len(layer.output_shape) for layer in model.layers
+                    if len(layer._inbound_nodes) == 1 and
+                    not isinstance(layer.output_shape, list)}
+    layer_configs = {layer_config['name']: layer_config
+                     for layer_config in config['layers']}
+
+    folded = True
+    while folded:
+        folded = False
+        consumers = _consumers(config)
+        for layer_config in config['layers']:
+            if layer_config['class_name'] not in ('BatchNormalization', 'Scale'):
+                continue
+            nodes = layer_config['inbound_nodes']
+            if len(nodes) != 1 or len(nodes[0]) != 1:
+                continue
+            previous_name = nodes[0][0][0]
+            previous_config = layer_configs[previous_name]
+            if (previous_config['class_name'] not in _FOLDABLE_LAYERS or
+                    len(previous_config['inbound_nodes']) != 1 or
+                    len(consumers[previous_name]) != 1 or
+                    previous_config['config']['activation'] != 'linear'):
+                continue
+            ndim = output_ndims.get(previous_name)
+            if ndim is None:
+                continue
+            if previous_config['config'].get('data_format') == 'channels_first':
+                channel_axis = 1
+            else:
+                channel_axis = ndim - 1
+            if layer_config['config']['axis'] % ndim != channel_axis:
+                continue
+
+            scale, offset = _normalization_coefficients(
+                layer_config, weights[layer_config['name']])
+            weights[previous_name] = _fold(previous_config,
+                                           weights[previous_name],
+                                           scale, offset)
+            _bypass(config, layer_config)
+            folded = True
+            break
+
+    return _build_model(config, weights, custom_objects=custom_objects)
+
+
+# Layers that are the identity at inference time.
+_TRAINING_ONLY_LAYERS = ('Dropout', 'SpatialDropout1D', 'SpatialDropout2D',
+                         'SpatialDropout3D', 'GaussianNoise', 'GaussianDropout',
+                         'AlphaDropout')
+
+
+def _is_identity(layer_config, layer, input_shape):
+    """Whether a layer does nothing at inference time."""
+    class_name = layer_config['class_name']
+    if class_name in _TRAINING_ONLY_LAYERS:
+        # Unless it is called with `training=True`, e.g. for MC dropout.
+        return not any(inbound[3].get('training')
+                       for node in layer_config['inbound_nodes']
+                       for inbound in node)
+    if class_name == 'Activation':
+        return layer_config['config']['activation'] == 'linear'
+    if class_name == 'RemoveMask':
+        return all(mask is None for node in layer._inbound_nodes
+                   for mask in node.input_masks)
+    if class_name == 'Permute':
+        dims = tuple(layer_config['config']['dims'])
+        return dims == tuple(range(1, len(dims) + 1))
+    if class_name == 'Reshape' and input_shape is not None:
+        target_shape = tuple(layer_config['config']['target_shape'])
+        return (None not in input_shape[1:] and
+                tuple(input_shape[1:]) == target_shape)
+    return False
+
+
+def _merge(layer_config, previous_config, weights):
+    """Merges a layer with the layer before it, if they compose into one.
+
+    # Returns
+        The weights of the merged layer (which keeps the config and the name
+        of `layer_config`), or None if the layers cannot be merged.
+    """
+    class_name = layer_config['class_name']
+    if previous_config['class_name'] != class_name:
+        return None
+    if class_name == 'Reshape':
+        return []
+    if class_name == 'Permute':
+        previous_dims = previous_config['config']['dims']
+        layer_config['config']['dims'] = [previous_dims[i - 1]
+                                          for i in layer_config['config']['dims']]
+        return []
+    if class_name == 'Dense' and previous_config['config']['activation'] == 'linear':
+        # (x . W1 + b1) . W2 + b2 = x . (W1 . W2) + (b1 . W2 + b2)
+        previous_weights = weights[previous_config['name']]
+        layer_weights = weights[layer_config['name']]
+        input_dim, hidden_dim = previous_weights[0].shape
+        units = layer_weights[0].shape[1]
+        # A bottleneck is cheaper than its product.
+        if input_dim * units > (input_dim + units) * hidden_dim:
+            return None
+        kernel = np.dot(previous_weights[0], layer_weights[0])
+        bias = np.zeros(units, dtype=kernel.dtype)
+        if previous_config['config']['use_bias']:
+            bias += np.dot(previous_weights[1], layer_weights[0])
+        if layer_config['config']['use_bias']:
+            bias += layer_weights[1]
+        layer_config['config']['use_bias'] = True
+        return [kernel, bias]
+    return None
+
+
+def optimize_for_inference(model, fold_normalization=True, custom_objects=None):
+    """Removes the layers of a model that are not needed for inference.
+
+    The model is rewritten as follows:
+
+    - the layers that are the identity at inference time are removed:
+        `Dropout`, `SpatialDropout*`, `GaussianNoise`, `GaussianDropout`
+        and `AlphaDropout` (unless called with `training=True`),
+        `Activation('linear')`, `RemoveMask` when its input has no mask,
+        and `Reshape`/`Permute` layers that do not change their input;
+    - consecutive `Reshape` layers, and consecutive `Permute` layers,
+        are collapsed into one;
+    - a `Dense` layer with a linear activation followed by another
+        `Dense` layer are merged into one, unless the first one is a
+        bottleneck (the merged kernel would have more weights);
+    - if `fold_normalization` is True, the normalization layers are
+        folded with `fold_batch_normalization`.
+
+    Only the layers whose output is used by a single layer are collapsed
+    or merged.
+
+    # Arguments
+        model: A `Sequential` or functional `Model` instance.
+            It is not modified.
+        fold_normalization: Whether to also fold the `BatchNormalization`
+            and `Scale` layers into the preceding layers.
+        custom_objects: Optional dictionary mapping names
+            (strings) to the custom classes used in the model.
+
+    # Returns
+        A new `Model` with the same predictions (up to rounding), to be
+        used for inference only.
+    """
+    model = _to_functional(model)
+    config = model.get_config()
+    weights = {layer.name: layer.get_weights() for layer in model.layers}
+    layers = {layer.name: layer for layer in model.layers}
+    input_shapes = {layer.name: layer.input_shape for layer in model.layers
+                    if len(layer._inbound_nodes) == 1 and
+                    not isinstance(layer.input_shape, list)}
+
+    rewritten = True
+    while rewritten:
+        rewritten = False
+        consumers = _consumers(config)
+        layer_configs = {layer_config['name']: layer_config
+                         for layer_config in config['layers']}
+        for layer_config in config['layers']:
+            name = layer_config['name']
+            nodes = layer_config['inbound_nodes']
+            if not nodes or any(len(node) != 1 for node in nodes):
+                continue
+            if _is_identity(layer_config, layers[name], input_shapes.get(name)):
+                _bypass(config, layer_config)
+                rewritten = True
+                break
+
+            previous_name = nodes[0][0][0]
+            previous_config = layer_configs[previous_name]
+            if (len(nodes) != 1 or
+                    len(previous_config['inbound_nodes']) != 1 or
+                    len(previous_config['inbound_nodes'][0]) != 1 or
+                    len(consumers[previous_name]) != 1):
+                continue
+            merged_weights = _merge(layer_config, previous_config, weights)
+            if merged_weights is not None:
+                weights[name] = merged_weights
+                input_shapes[name] = input_shapes.get(previous_name)
+                _bypass(config, previous_config)
+                rewritten = True
+                break
+
+    model = _build_model(config, weights, custom_objects=custom_objects)
+    if fold_normalization:
+        model = fold_batch_normalization(model, custom_objects=custom_objects)
+    return model
+
+
+# Layers with an int8 variant, in `keras.layers.quantized`.
+_QUANTIZED_LAYERS = {'Dense': 'QuantizedDense',
+                     'Embedding': 'QuantizedEmbedding',
+                     'AttLSTMCond': 'QuantizedAttLSTMCond'}
+
+
+def quantize_model(model, layer_names=None, custom_objects=None):
+    """Stores the weight matrices of a model as int8, for inference.
+
+    The `Dense`, `Embedding` and `AttLSTMCond` layers are replaced by
+    their variants of `keras.layers.quantized`, whose kernels are int8
+    arrays with one float scale per output unit (per index for
+    `Embedding`), quantized symmetrically from the original weights.
+    The kernels take 4 times less memory, in the model and in the files
+    written by `save_model` (which `load_model` reads back). They are
+    dequantized on the fly: the computations still run in float.
+
+    # Arguments
+        model: A `Sequential` or functional `Model` instance.
+            It is not modified.
+        layer_names: Optional list of the names of the layers to quantize.
+            Defaults to all the layers that can be quantized.
+        custom_objects: Optional dictionary mapping names
+            (strings) to the custom classes used in the model.
+
+    # Returns
+        A new `Model` with the same predictions up to the quantization
+        error, to be used for inference only.
+    """
+    model = _to_functional(model)
+    config = model.get_config()
+    for layer_config in config['layers']:
+        if layer_names is not None and layer_config['name'] not in layer_names:
+            continue
+        class_name = layer_config['class_name']
+        layer_config['class_name'] = _QUANTIZED_LAYERS.get(class_name, class_name)
+
+    from ..models import Model
+    quantized_model = Model.from_config(config, custom_objects=custom_objects)
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if not weights:
+            continue
+        quantized_layer = quantized_model.get_layer(layer.name)
+        if hasattr(quantized_layer, 'set_float_weights'):
+            quantized_layer.set_float_weights(weights)
+        else:
+            quantized_layer.set_weights(weights)
+    return quantized_model
@@ -2,6 +2,7 @@ import pytest
 from numpy.testing import assert_allclose
 import numpy as np
 import scipy.sparse as sparse
+import time
 import warnings
 from keras.utils.test_utils import keras_test
 
@@ -311,6 +312,32 @@ class TestBackend(object):
             y = K.tile(x, n)
             assert y._keras_shape == (None, 12)
 
+    def test_split_merge_heads(self):
+        n_heads, dim = 4, 3
+        x = np.random.random((2, 5, n_heads * dim))
+        # Heads stacked along the batch axis, in the order of the slice-concat version.
+        expected = np.concatenate([x[:, :, i * dim:(i + 1) * dim]
+                                   for i in range(n_heads)], axis=0)
+        for k in [KTH, KTF]:
+            if k not in BACKENDS:
+                continue
+            heads = k.split_heads(k.variable(x), n_heads)
+            assert_allclose(k.eval(heads), expected, atol=1e-05)
+            assert_allclose(k.eval(k.merge_heads(heads, n_heads)), x, atol=1e-05)
+
+    def test_count_sketch(self):
+        n, d = 6, 4
+        h = np.random.randint(0, d, size=(n,))
+        s = np.random.randint(0, 2, size=(n,)) * 2 - 1
+        x = np.random.random((3, n))
+        expected = np.zeros((3, d))
+        for i in range(n):
+            expected[:, h[i]] += s[i] * x[:, i]
+        for k in BACKENDS:
+            sketch = k.count_sketch(k.variable(h, dtype='int64'), k.variable(s, dtype='int64'),
+                                    k.variable(x), d)
+            assert_allclose(k.eval(sketch), expected, atol=1e-05)
+
     def test_gather(self):
         shape = (10, 2, 3)
         ref = np.arange(np.prod(shape)).reshape(shape)
@@ -531,6 +558,26 @@ class TestBackend(object):
         output = f([b'test'])
         assert output == [b'test']
 
+    def test_function_tf_fed_and_fetched(self):
+        # An input that is also an output of the function (e.g. the
+        # `preprocessed_input` of the optimized conditional models) must
+        # be run through the callable path as well.
+        x_placeholder = KTF.placeholder(shape=(2,))
+        y_placeholder = KTF.placeholder(shape=(2,))
+
+        f = KTF.function(inputs=[x_placeholder, y_placeholder],
+                         outputs=[x_placeholder + y_placeholder, y_placeholder])
+        output = f([np.array([1., 2.]), np.array([3., 4.])])
+        assert_allclose(output[0], [4., 6.])
+        assert_allclose(output[1], [3., 4.])
+        if hasattr(KTF.get_session(), '_make_callable_from_options'):
+            assert f._callable_fn is not None
+            assert not f._use_legacy_call
+
+        output = f([np.array([0., 0.]), np.array([5., 6.])])
+        assert_allclose(output[0], [5., 6.])
+        assert_allclose(output[1], [5., 6.])
+
     def test_rnn(self):
         # implement a simple RNN
         num_samples = 4
@@ -705,6 +752,37 @@ class TestBackend(object):
         assert_allclose(last_y1, last_y2, atol=1e-05)
         assert_allclose(y1, y2, atol=1e-05)
 
+    @pytest.mark.skipif(K.backend() == 'cntk', reason='Not supported.')
+    def test_rnn_extra_outputs_states(self):
+        # a simple RNN returning its pre-activations as an extra state
+        num_samples, timesteps, input_dim, output_dim = 4, 5, 3, 2
+        _, x = parse_shape_or_val((num_samples, timesteps, input_dim))
+        _, wi = parse_shape_or_val((input_dim, output_dim))
+        _, wh = parse_shape_or_val((output_dim, output_dim))
+        x_k = K.variable(x)
+        wi_k = K.variable(wi)
+        wh_k = K.variable(wh)
+
+        def rnn_fn(x_k, states):
+            h_tm1 = states[0]
+            z = K.dot(x_k, wi_k) + K.dot(h_tm1, wh_k)
+            h = K.tanh(z)
+            return h, [h, z]
+
+        initial_states = [K.zeros((num_samples, output_dim)),
+                          K.zeros((num_samples, output_dim))]
+        last_y1, y1, h1 = K.rnn(rnn_fn, x_k, initial_states,
+                                pos_extra_outputs_states=[1])
+        last_y2, y2, h2 = K.rnn(rnn_fn, x_k, initial_states,
+                                pos_extra_outputs_states=[1],
+                                accumulate_extra_outputs_states=False)
+
+        assert_allclose(K.eval(last_y1), K.eval(last_y2), atol=1e-05)
+        assert_allclose(K.eval(y1), K.eval(y2), atol=1e-05)
+        assert_allclose(K.eval(h1[0]), K.eval(h2[0]), atol=1e-05)
+        assert K.eval(h1[1]).shape == (timesteps, num_samples, output_dim)
+        assert_allclose(K.eval(h2[1]), np.zeros((num_samples, output_dim)))
+
     def legacy_test_rnn(self):
         # implement a simple RNN
         num_samples = 4
@@ -1409,16 +1487,9 @@ class TestBackend(object):
             assert zth.shape == ztf.shape
             assert zth.shape == zc.shape
 
-    # the Theano and TensorFlow CTC code use different methods to ensure
-    # numerical stability.  The Theano code subtracts out the max
-    # before the final log, so the results are different but scale
-    # identically and still train properly
     @pytest.mark.skipif(K.backend() == 'cntk', reason='Not supported.')
     def test_ctc(self):
-        if K.backend() == 'theano':
-            ref = [1.73308, 3.81351]
-        else:
-            ref = [3.34211, 5.42262]
+        ref = [3.34211, 5.42262]
         # simplified version of TensorFlow's test
 
         label_lens = np.expand_dims(np.asarray([5, 4]), 1)
@@ -1444,14 +1515,11 @@ class TestBackend(object):
         k_input_lens = K.variable(input_lens, dtype="int32")
         k_label_lens = K.variable(label_lens, dtype="int32")
         res = K.eval(K.ctc_batch_cost(k_labels, k_inputs, k_input_lens, k_label_lens))
-        assert_allclose(res[0, :] if K.backend() == 'theano' else res[:, 0], ref, atol=1e-05)
+        assert_allclose(res[:, 0], ref, atol=1e-05)
 
         # test when batch_size = 1, that is, one sample only
         # get only first sample from above test case
-        if K.backend() == 'theano':
-            ref = [1.73308]
-        else:
-            ref = [3.34211]
+        ref = [3.34211]
 
         input_lens = np.expand_dims(np.asarray([5]), 1)
         label_lens = np.expand_dims(np.asarray([5]), 1)
@@ -1470,7 +1538,34 @@ class TestBackend(object):
         k_input_lens = K.variable(input_lens, dtype="int32")
         k_label_lens = K.variable(label_lens, dtype="int32")
         res = K.eval(K.ctc_batch_cost(k_labels, k_inputs, k_input_lens, k_label_lens))
-        assert_allclose(res[0, :] if K.backend() == 'theano' else res[:, 0], ref, atol=1e-05)
+        assert_allclose(res[:, 0], ref, atol=1e-05)
+
+    @pytest.mark.skipif(K.backend() == 'cntk', reason='Not supported.')
+    def test_ctc_gradient(self):
+        # padded labels and inputs of different lengths
+        labels = np.asarray([[1, 2, 2, 0], [3, 1, -1, -1], [0, -1, -1, -1]])
+        label_lens = np.asarray([[4], [2], [1]])
+        input_lens = np.asarray([[7], [4], [6]])
+        logits = np.random.random((3, 7, 5))
+
+        k_logits = K.placeholder(shape=logits.shape)
+        loss = K.sum(K.ctc_batch_cost(K.constant(labels, dtype='int32'),
+                                      K.softmax_3d(k_logits),
+                                      K.constant(input_lens, dtype='int32'),
+                                      K.constant(label_lens, dtype='int32')))
+        f = K.function([k_logits], [loss, K.gradients(loss, [k_logits])[0]])
+        _, grad = f([logits])
+
+        eps = 1e-2
+        numeric_grad = np.zeros_like(logits)
+        for idx in np.ndindex(*logits.shape):
+            delta = np.zeros_like(logits)
+            delta[idx] = eps
+            numeric_grad[idx] = (f([logits + delta])[0] - f([logits - delta])[0]) / (2 * eps)
+        assert_allclose(grad, numeric_grad, rtol=1e-2, atol=1e-3)
+        # the time steps after the input lengths do not contribute
+        assert_allclose(grad[1, 4:], 0)
+        assert_allclose(grad[2, 6:], 0)
 
     '''only tensorflow tested, need special handle'''
 
@@ -1800,5 +1895,129 @@ class TestBackend(object):
                 K.variable('', dtype='unsupported')
 
 
+def function_call_benchmark(num_calls=2000, batch_size=8, dim=64):
+    """Compares the per-call latency of the callable and legacy paths
+    of the TensorFlow backend `Function`.
+    """
+    print('####### K.function per-call latency')
+    x_placeholder = KTF.placeholder(shape=(None, dim))
+    w = KTF.variable(np.random.random((dim, dim)))
+    f = KTF.function(inputs=[x_placeholder],
+                     outputs=[KTF.dot(x_placeholder, w), x_placeholder])
+    x = np.random.random((batch_size, dim)).astype(KTF.floatx())
+
+    for name, call in [('legacy', f._legacy_call), ('callable', f._call)]:
+        call([x])  # Warm-up
+        start_time = time.time()
+        for _ in range(num_calls):
+            call([x])
+        total_time = time.time() - start_time
+        print('%s call: %.1f us' % (name, 1e6 * total_time / num_calls))
+
+
+def ctc_benchmark(batch_size=32, time_steps=100, num_categories=64,
+                  label_length=20, repeats=10):
+    """Compares the Theano `ctc_batch_cost` with the per-sample scan it replaces."""
+    import theano
+    from theano import tensor as T
+
+    # The previous implementation, with the path probabilities of each
+    # sample computed in its own scan.
+    def ctc_interleave_blanks(Y):
+        Y_ = T.alloc(-1, Y.shape[0] * 2 + 1)
+        Y_ = T.set_subtensor(Y_[T.arange(Y.shape[0]) * 2 + 1], Y)
+        return Y_
+
+    def ctc_create_skip_idxs(Y):
+        skip_idxs = T.arange((Y.shape[0] - 3) // 2) * 2 + 1
+        non_repeats = T.neq(Y[skip_idxs], Y[skip_idxs + 2])
+        return skip_idxs[non_repeats.nonzero()]
+
+    def ctc_update_log_p(skip_idxs, zeros, active, log_p_curr, log_p_prev):
+        active_skip_idxs = skip_idxs[(skip_idxs < active).nonzero()]
+        active_next = T.cast(T.minimum(
+            T.maximum(
+                active + 1,
+                T.max(T.concatenate([active_skip_idxs, [-1]])) + 2 + 1
+            ), log_p_curr.shape[0]), 'int32')
+
+        common_factor = T.max(log_p_prev[:active])
+        p_prev = T.exp(log_p_prev[:active] - common_factor)
+        _p_prev = zeros[:active_next]
+        # copy over
+        _p_prev = T.set_subtensor(_p_prev[:active], p_prev)
+        # previous transitions
+        _p_prev = T.inc_subtensor(_p_prev[1:], _p_prev[:-1])
+        # skip transitions
+        _p_prev = T.inc_subtensor(_p_prev[active_skip_idxs + 2], p_prev[active_skip_idxs])
+        updated_log_p_prev = T.log(_p_prev) + common_factor
+
+        log_p_next = T.set_subtensor(
+            zeros[:active_next],
+            log_p_curr[:active_next] + updated_log_p_prev
+        )
+        return active_next, log_p_next
+
+    def ctc_path_probs(predict, Y, alpha=1e-4):
+        smoothed_predict = (1 - alpha) * predict[:, Y] + alpha * np.float32(1.) / Y.shape[0]
+        L = T.log(smoothed_predict)
+        zeros = T.zeros_like(L[0])
+        log_first = zeros
+
+        f_skip_idxs = ctc_create_skip_idxs(Y)
+        b_skip_idxs = ctc_create_skip_idxs(Y[::-1])  # there should be a shortcut to calculating this
+
+        def step(log_f_curr, log_b_curr, f_active, log_f_prev, b_active, log_b_prev):
+            f_active_next, log_f_next = ctc_update_log_p(f_skip_idxs, zeros, f_active, log_f_curr, log_f_prev)
+            b_active_next, log_b_next = ctc_update_log_p(b_skip_idxs, zeros, b_active, log_b_curr, log_b_prev)
+            return f_active_next, log_f_next, b_active_next, log_b_next
+
+        [f_active, log_f_probs, b_active, log_b_probs], _ = theano.scan(
+            step, sequences=[L, L[::-1, ::-1]], outputs_info=[np.int32(1), log_first, np.int32(1), log_first])
+
+        idxs = T.arange(L.shape[1]).dimshuffle('x', 0)
+        mask = (idxs < f_active.dimshuffle(0, 'x')) & (idxs < b_active.dimshuffle(0, 'x'))[::-1, ::-1]
+        log_probs = log_f_probs + log_b_probs[::-1, ::-1] - L
+        return log_probs, mask
+
+    def ctc_cost(predict, Y):
+        log_probs, mask = ctc_path_probs(predict, ctc_interleave_blanks(Y))
+        common_factor = T.max(log_probs)
+        total_log_prob = T.log(T.sum(T.exp(log_probs - common_factor)[mask.nonzero()])) + common_factor
+        return -total_log_prob
+
+    def scan_ctc_batch_cost(y_true, y_pred, input_length, label_length):
+        def ctc_step(y_true_step, y_pred_step, input_length_step, label_length_step):
+            y_pred_step = y_pred_step[0: input_length_step[0]]
+            y_true_step = y_true_step[0:label_length_step[0]]
+            return ctc_cost(y_pred_step, y_true_step)
+
+        costs, _ = theano.scan(ctc_step, sequences=[y_true, y_pred, input_length, label_length])
+        return costs.dimshuffle(0, 'x')
+
+    labels = np.random.randint(0, num_categories - 1, (batch_size, label_length))
+    label_lens = np.random.randint(label_length // 2, label_length + 1, (batch_size, 1))
+    input_lens = np.random.randint(time_steps // 2, time_steps + 1, (batch_size, 1))
+    logits = np.random.random((batch_size, time_steps, num_categories)).astype(KTH.floatx())
+
+    k_labels = KTH.placeholder(shape=labels.shape, dtype='int32')
+    k_label_lens = KTH.placeholder(shape=label_lens.shape, dtype='int32')
+    k_input_lens = KTH.placeholder(shape=input_lens.shape, dtype='int32')
+    k_logits = KTH.placeholder(shape=logits.shape)
+    inputs = [k_labels, KTH.softmax(k_logits), k_input_lens, k_label_lens]
+    for name, cost in [('per-sample scan', scan_ctc_batch_cost(*inputs)),
+                       ('batched', KTH.ctc_batch_cost(*inputs))]:
+        loss = KTH.sum(cost)
+        function = KTH.function([k_labels, k_logits, k_input_lens, k_label_lens],
+                                [loss, KTH.gradients(loss, [k_logits])[0]])
+        function([labels, logits, input_lens, label_lens])
+        start_time = time.time()
+        for _ in range(repeats):
+            function([labels, logits, input_lens, label_lens])
+        total_time = (time.time() - start_time) / repeats
+        print('%s: %.1f ms/batch, %.0f samples/s (forward+backward)' %
+              (name, total_time * 1000, batch_size / total_time))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
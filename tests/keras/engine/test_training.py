@@ -9,6 +9,7 @@ import scipy.sparse as sparse
 
 import keras
 from keras import losses
+from keras import optimizers
 from keras.layers import Activation, Dense, Dropout, Conv2D, Concatenate
 from keras.engine import Input
 from keras.engine.training import Model
@@ -114,6 +115,37 @@ def testslice_arrays():
     slice_arrays(input_a, stop=2)
 
 
+def test_block_shuffle():
+    index_array = np.arange(103)
+    shuffled = training_utils.block_shuffle(index_array.copy(), 10)
+    assert sorted(shuffled) == list(index_array)
+    # A batch overlaps at most 3 blocks (e.g. one shorter block between two others).
+    for batch_start in range(0, len(shuffled), 10):
+        batch_ids = shuffled[batch_start:batch_start + 10]
+        runs, order = training_utils.contiguous_runs(batch_ids)
+        assert len(runs) <= 3
+        ids = [i for start, stop in runs for i in range(start, stop)]
+        assert ids == sorted(batch_ids)
+    _, order = training_utils.contiguous_runs(shuffled)
+    assert_allclose(shuffled[order], index_array)
+
+    shuffled = training_utils.block_shuffle(index_array.copy(), 10, window_size=5)
+    assert sorted(shuffled) == list(index_array)
+    assert training_utils.contiguous_runs(np.arange(3, 9)) == ([(3, 9)], None)
+
+
+@keras_test
+def test_fit_block_shuffle():
+    x = np.random.random((50, 3))
+    y = np.random.random((50, 2))
+    model = Sequential([Dense(2, input_shape=(3,))])
+    model.compile('sgd', 'mse')
+    model.fit(x, y, batch_size=8, shuffle='block', epochs=2)
+    model.fit(sparse.csr_matrix(x), y, batch_size=8, shuffle=('block', 16, 2))
+    with pytest.raises(ValueError):
+        model.fit(x, y, batch_size=8, shuffle=('batch', 16))
+
+
 @keras_test
 def test_weighted_masked_objective():
     a = Input(shape=(3,), name='input_a')
@@ -641,6 +673,85 @@ def test_sparse_placeholder_fit():
     model.evaluate(test_inputs, test_outputs, batch_size=2)
 
 
+@keras_test
+def test_prefetch():
+    x = [sparse.random(20, 3, density=0.25).tocsr(), np.random.random((20, 3))]
+    y = np.random.randint(0, 2, (20, 4))
+    in1 = Input(shape=(3,))
+    in2 = Input(shape=(3,))
+    out = Dense(4, name='dense_1')(Concatenate()([in1, in2]))
+    model = Model([in1, in2], out)
+    model.compile('sgd', 'mse')
+    initial_weights = model.get_weights()
+
+    predictions = model.predict(x, batch_size=3)
+    assert_allclose(model.predict(x, batch_size=3, prefetch=2), predictions)
+    loss = model.evaluate(x, y, batch_size=3)
+    assert_allclose(model.evaluate(x, y, batch_size=3, prefetch=2), loss)
+
+    # Same updates, in the same order.
+    history = model.fit(x, y, batch_size=3, epochs=2, shuffle=False,
+                        validation_split=0.2)
+    weights = model.get_weights()
+    model.set_weights(initial_weights)
+    prefetch_history = model.fit(x, y, batch_size=3, epochs=2, shuffle=False,
+                                 validation_split=0.2, prefetch=3)
+    for weight, prefetch_weight in zip(weights, model.get_weights()):
+        assert_allclose(prefetch_weight, weight, rtol=1e-5)
+    assert_allclose(prefetch_history.history['val_loss'],
+                    history.history['val_loss'], rtol=1e-5)
+
+    # The background thread is stopped when the training stops early.
+    num_threads = threading.active_count()
+    stop = LambdaCallback(on_batch_end=lambda batch, logs: setattr(
+        model, 'stop_training', batch == 1))
+    model.fit(x, y, batch_size=3, epochs=2, prefetch=1, callbacks=[stop])
+    assert threading.active_count() == num_threads
+
+
+@keras_test
+def test_steps_per_execution():
+    x = np.random.random((20, 3))
+    y = np.random.random((20, 2))
+    if K.backend() != 'theano':
+        model = Sequential([Dense(2, input_shape=(3,))])
+        with pytest.raises(ValueError):
+            model.compile('sgd', 'mse', steps_per_execution=3)
+        return
+
+    initial_weights = []
+    results = []
+    for steps_per_execution in [1, 3]:
+        model = Sequential([Dense(4, input_shape=(3,), activation='tanh'),
+                            Dense(2)])
+        if initial_weights:
+            model.set_weights(initial_weights)
+        else:
+            initial_weights.extend(model.get_weights())
+        model.compile(optimizers.SGD(lr=0.1, momentum=0.9), 'mse',
+                      metrics=['mae'],
+                      steps_per_execution=steps_per_execution)
+        batch_ends = []
+        counter = LambdaCallback(
+            on_batch_end=lambda batch, logs: batch_ends.append(logs))
+        history = model.fit(x, y, batch_size=3, epochs=2, shuffle=False,
+                            callbacks=[counter])
+        results.append((model.get_weights(), history.history, batch_ends))
+
+    weights, history, batch_ends = results[0]
+    stacked_weights, stacked_history, stacked_batch_ends = results[1]
+    for weight, stacked_weight in zip(weights, stacked_weights):
+        assert_allclose(stacked_weight, weight, rtol=1e-5, atol=1e-6)
+    for name in ['loss', 'mean_absolute_error']:
+        assert_allclose(stacked_history[name], history[name], rtol=1e-5)
+    # 7 batches per epoch: 2 blocks of 3 batches and the last (smaller) batch.
+    assert len(batch_ends) == 14
+    assert len(stacked_batch_ends) == 6
+    assert [logs['size'] for logs in stacked_batch_ends[:3]] == [9, 9, 2]
+    assert_allclose(stacked_batch_ends[0]['loss'],
+                    np.mean([logs['loss'] for logs in batch_ends[:3]]), rtol=1e-5)
+
+
 @keras_test
 def test_trainable_argument():
     x = np.random.random((5, 3))
@@ -1559,5 +1670,40 @@ def test_dynamic_set_inputs():
     assert preds4.shape == (1, 19)
 
 
+def prefetch_benchmark(num_samples=20000, input_dim=5000, batch_size=128):
+    """Compares the time of an epoch on sparse data with and without prefetching."""
+    import time
+    x = sparse.random(num_samples, input_dim, density=0.05).tocsr()
+    y = np.random.random((num_samples, 10))
+    model = Sequential([Dense(256, activation='relu', input_shape=(input_dim,)),
+                        Dense(10)])
+    model.compile('sgd', 'mse')
+    model.fit(x[:batch_size], y[:batch_size], batch_size=batch_size, verbose=0)
+    for prefetch in [0, 1, 4]:
+        start_time = time.time()
+        model.fit(x, y, batch_size=batch_size, verbose=0, prefetch=prefetch)
+        print('prefetch=%d: %.2f s/epoch' % (prefetch, time.time() - start_time))
+
+
+def steps_per_execution_benchmark(num_samples=50000, batch_size=32):
+    """Compares the time of an epoch of a small model for several
+    `steps_per_execution` (Theano only)."""
+    import time
+    x = np.random.random((num_samples, 10))
+    y = np.random.random((num_samples, 1))
+    for steps_per_execution in [1, 4, 16, 64]:
+        model = Sequential([Dense(16, activation='relu', input_shape=(10,)),
+                            Dense(1)])
+        model.compile('sgd', 'mse', steps_per_execution=steps_per_execution)
+        # Compiles the train functions.
+        num_warmup = batch_size * steps_per_execution
+        model.fit(x[:num_warmup], y[:num_warmup],
+                  batch_size=batch_size, verbose=0)
+        start_time = time.time()
+        model.fit(x, y, batch_size=batch_size, verbose=0)
+        print('steps_per_execution=%d: %.2f s/epoch' %
+              (steps_per_execution, time.time() - start_time))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,173 @@
+import time
+
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from keras.utils.test_utils import keras_test
+from keras.layers import MultiHeadAttention
+from keras.layers import Masking
+from keras.engine import Input
+from keras.models import Model
+from keras import backend as K
+
+pytestmark = pytest.mark.skipif(
+    K.backend() == 'cntk',
+    reason='MultiHeadAttention uses backend ops missing in CNTK.')
+
+num_samples, query_steps, key_steps, input_dim = 3, 7, 5, 6
+
+
+def multi_head_attention_model(query_steps, key_steps, input_dim, **kwargs):
+    query = Input(shape=(query_steps, input_dim))
+    key = Input(shape=(key_steps, input_dim))
+    layer = MultiHeadAttention(**kwargs)
+    output = layer([Masking()(query), Masking()(key)])
+    return Model([query, key], output)
+
+
+def random_inputs(num_samples, query_steps, key_steps, input_dim):
+    query = np.random.random((num_samples, query_steps, input_dim))
+    key = np.random.random((num_samples, key_steps, input_dim))
+    query[0, -2:] = 0.  # Padded timesteps
+    key[1, -3:] = 0.
+    key[2] = 0.  # All the keys are masked
+    return [query, key]
+
+
+def multi_head_attention_reference(layer, query, key):
+    """Numpy version of `MultiHeadAttention`, with one loop per head."""
+    linear_q, linear_k, linear_v, linear_o = [
+        K.get_value(w) for w in (layer.linear_q, layer.linear_k,
+                                 layer.linear_v, layer.linear_o)]
+    relu = lambda x: np.maximum(x, 0.)
+    query_masks = np.any(query != 0, axis=-1)
+    key_masks = np.any(key != 0, axis=-1)
+    queries = relu(query.dot(linear_q))
+    keys, values = relu(key.dot(linear_k)), relu(key.dot(linear_v))
+    heads = []
+    for i in range(layer.n_heads):
+        head_slice = slice(i * layer.dk, (i + 1) * layer.dk)
+        scores = np.einsum('nqd,nkd->nqk', queries[:, :, head_slice],
+                           keys[:, :, head_slice])
+        scores /= np.sqrt(layer.dk)
+        score_masks = np.repeat(key_masks[:, None, :], query.shape[1], axis=1)
+        if layer.mask_future:
+            future_masks = np.tril(np.ones((query.shape[1], key.shape[1]),
+                                           dtype=bool))
+            score_masks &= future_masks[None]
+        scores = np.where(score_masks, scores, -2. ** 32 + 1)
+        alphas = np.exp(scores - np.max(scores, axis=-1, keepdims=True))
+        alphas /= np.sum(alphas, axis=-1, keepdims=True)
+        head = np.einsum('nqk,nkd->nqd', alphas, values[:, :, head_slice])
+        heads.append(head * query_masks[:, :, None])
+    return relu(np.concatenate(heads, axis=-1).dot(linear_o))
+
+
+@keras_test
+@pytest.mark.parametrize('mask_future', [False, True])
+def test_multi_head_attention(mask_future):
+    inputs = random_inputs(num_samples, query_steps, key_steps, input_dim)
+    model = multi_head_attention_model(query_steps, key_steps, input_dim,
+                                       n_heads=3, dmodel=6, mask_future=mask_future)
+    expected = multi_head_attention_reference(model.layers[-1], *inputs)
+    assert_allclose(model.predict(inputs), expected, atol=1e-5)
+
+
+@keras_test
+@pytest.mark.parametrize('mask_future', [False, True])
+@pytest.mark.parametrize('chunk_size', [1, 3, 8])
+def test_multi_head_attention_chunks(mask_future, chunk_size):
+    inputs = random_inputs(num_samples, query_steps, key_steps, input_dim)
+    model = multi_head_attention_model(query_steps, key_steps, input_dim,
+                                       n_heads=2, dmodel=4,
+                                       mask_future=mask_future)
+    chunked_model = multi_head_attention_model(query_steps, key_steps, input_dim,
+                                               n_heads=2, dmodel=4,
+                                               mask_future=mask_future,
+                                               chunk_size=chunk_size)
+    chunked_model.set_weights(model.get_weights())
+    assert_allclose(chunked_model.predict(inputs), model.predict(inputs),
+                    atol=1e-5)
+    assert chunked_model.layers[-1].get_config()['chunk_size'] == chunk_size
+
+
+@keras_test
+def test_multi_head_attention_step_function():
+    inputs = random_inputs(num_samples, query_steps, key_steps, input_dim)
+    query = inputs[0]
+    query[0, -2:] = np.random.random((2, input_dim))  # No padding when decoding
+    model = multi_head_attention_model(query_steps, query_steps, input_dim,
+                                       n_heads=2, dmodel=4, mask_future=True)
+    layer = model.layers[-1]
+    expected = model.predict([query, query])
+
+    step_function = layer.get_step_function()
+    cache = layer.get_initial_cache(num_samples)
+    for t in range(query_steps):
+        outputs = step_function([query[:, t], query[:, t]] + cache)
+        output, cache = outputs[0], outputs[1:]
+        assert_allclose(output, expected[:, t], atol=1e-5)
+        assert cache[0].shape == (num_samples, t + 1, 4)
+
+    # Reordering the cache along beam backpointers.
+    backpointers = np.array([2, 2, 0])
+    reordered = layer.reorder_cache(cache, backpointers)
+    assert_allclose(reordered[0], cache[0][backpointers])
+
+
+@keras_test
+def test_multi_head_attention_cache_function():
+    inputs = random_inputs(num_samples, query_steps, key_steps, input_dim)
+    inputs[0][0, -2:] = np.random.random((2, input_dim))
+    model = multi_head_attention_model(query_steps, key_steps, input_dim,
+                                       n_heads=2, dmodel=4)
+    layer = model.layers[-1]
+    expected = model.predict(inputs)
+
+    cache = layer.get_cache_function()([inputs[1]])
+    step_function = layer.get_step_function()
+    for t in range(query_steps):
+        output = step_function([inputs[0][:, t]] + cache)[0]
+        assert_allclose(output, expected[:, t], atol=1e-5)
+
+
+def multi_head_attention_benchmark(num_samples=64, steps=50, dmodel=512,
+                                   repeats=20):
+    """Compares the fused head split/merge with slicing and concatenating."""
+    def split_heads_concat(x, n_heads):
+        dim = K.int_shape(x)[-1] // n_heads
+        return K.concatenate([x[:, :, i * dim:(i + 1) * dim]
+                              for i in range(n_heads)], axis=0)
+
+    def merge_heads_concat(x, n_heads):
+        nb_samples = K.shape(x)[0] // n_heads
+        return K.concatenate([x[i * nb_samples:(i + 1) * nb_samples]
+                              for i in range(n_heads)], axis=2)
+
+    def time_function(inputs, outputs, values):
+        function = K.function(inputs, outputs)
+        function(values)
+        start_time = time.time()
+        for _ in range(repeats):
+            function(values)
+        return (time.time() - start_time) / repeats * 1000
+
+    x_value = np.random.random((num_samples, steps, dmodel)).astype(K.floatx())
+    for n_heads in [8, 16]:
+        print('####### %d heads' % n_heads)
+        for name, split, merge in [
+                ('slice-concat', split_heads_concat, merge_heads_concat),
+                ('fused', K.split_heads, K.merge_heads)]:
+            x = K.placeholder(ndim=3)
+            x._keras_shape = (None, None, dmodel)
+            heads = split(x, n_heads)
+            output = merge(heads * 2., n_heads)
+            gradient = K.gradients(K.sum(output), [x])[0]
+            print('%s split/merge: forward %.2f ms, forward+backward %.2f ms' %
+                  (name, time_function([x], [output], [x_value]),
+                   time_function([x], [gradient], [x_value])))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -152,5 +152,42 @@ def test_convolutional_recurrent():
                     layer.compute_output_shape(inputs.shape))
 
 
+@pytest.mark.parametrize('data_format', ['channels_first', 'channels_last'])
+def test_convolutional_recurrent_implementation(data_format):
+    if data_format == 'channels_first':
+        input_shape = (2, 3, 5, 4)
+    else:
+        input_shape = (2, 5, 4, 3)
+    inputs = np.random.random((2,) + input_shape)
+
+    outputs = []
+    for implementation in [1, 2]:
+        model = Sequential()
+        model.add(convolutional_recurrent.ConvLSTM2D(filters=4,
+                                                     kernel_size=(3, 3),
+                                                     padding='same',
+                                                     data_format=data_format,
+                                                     return_sequences=True,
+                                                     implementation=implementation,
+                                                     input_shape=input_shape))
+        if outputs:
+            # the weights of a mode 1 layer load in a mode 2 layer
+            model.set_weights(weights)
+        weights = model.get_weights()
+        outputs.append(model.predict(inputs))
+    assert_allclose(outputs[1], outputs[0], atol=1e-5)
+
+    layer_test(convolutional_recurrent.ConvLSTM2D,
+               kwargs={'data_format': data_format,
+                       'return_sequences': True,
+                       'filters': 4,
+                       'kernel_size': (3, 3),
+                       'padding': 'same',
+                       'dropout': 0.1,
+                       'recurrent_dropout': 0.1,
+                       'implementation': 2},
+               input_shape=(2,) + input_shape)
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -1,3 +1,5 @@
+import time
+
 import pytest
 import numpy as np
 from numpy.testing import assert_allclose
@@ -7,6 +9,8 @@ from keras.utils.test_utils import keras_test
 from keras import backend as K
 from keras.layers import convolutional
 from keras.models import Sequential
+from keras.models import Model
+from keras.layers import Input
 
 
 # TensorFlow does not support full convolution.
@@ -1137,5 +1141,70 @@ def test_conv_float64(input_shape, conv_class):
     K.set_floatx('float32')
 
 
+def count_sketch_reference(layer, inputs):
+    """Numpy count sketches of `CountSketch` and `CompactBilinearPooling`."""
+    sketches = []
+    for h, s, x in zip(layer.h, layer.s, inputs):
+        sketch = np.zeros((x.shape[0], layer.d))
+        np.add.at(sketch.T, K.get_value(h), (K.get_value(s) * x).T)
+        sketches.append(sketch)
+    return sketches
+
+
+@keras_test
+def test_count_sketch():
+    inputs = [np.random.random((3, 5)), np.random.random((3, 4))]
+    x = [Input(shape=(5,)), Input(shape=(4,))]
+    layer = convolutional.CountSketch(3)
+    model = Model(x, layer(x))
+    for output, expected in zip(model.predict(inputs),
+                                count_sketch_reference(layer, inputs)):
+        assert_allclose(output, expected, atol=1e-5)
+
+
+@keras_test
+@pytest.mark.parametrize('d', [16, 17])
+def test_compact_bilinear_pooling(d):
+    inputs = [np.random.random((3, 5)), np.random.random((3, 4))]
+    x = [Input(shape=(5,)), Input(shape=(4,))]
+    fft_layer = convolutional.CompactBilinearPooling(d, conv_type='fft')
+    fft_model = Model(x, fft_layer(x))
+    sketches = count_sketch_reference(fft_layer, inputs)
+    # Circular convolution of the count sketches
+    expected = np.real(np.fft.ifft(np.fft.fft(sketches[0]) *
+                                   np.fft.fft(sketches[1])))
+    assert_allclose(fft_model.predict(inputs), expected, atol=1e-5)
+
+    if K.backend() == 'theano':
+        conv_layer = convolutional.CompactBilinearPooling(d, conv_type='conv')
+        conv_layer.h, conv_layer.s = list(fft_layer.h), list(fft_layer.s)
+        conv_model = Model(x, conv_layer(x))
+        assert_allclose(conv_model.predict(inputs), expected, atol=1e-5)
+    else:
+        with pytest.raises(ValueError):
+            convolutional.CompactBilinearPooling(d, conv_type='conv')
+
+
+def compact_bilinear_pooling_benchmark(num_samples=8, input_dims=(512, 512),
+                                       d=16000, repeats=5):
+    """Compares the forward time of the conv and fft `CompactBilinearPooling`.
+
+    The conv version is only timed on the Theano backend.
+    """
+    inputs = [np.random.random((num_samples, input_dim))
+              for input_dim in input_dims]
+    x = [Input(shape=(input_dim,)) for input_dim in input_dims]
+    conv_types = ['conv', 'fft'] if K.backend() == 'theano' else ['fft']
+    for conv_type in conv_types:
+        layer = convolutional.CompactBilinearPooling(d, conv_type=conv_type)
+        model = Model(x, layer(x))
+        model.predict(inputs, batch_size=num_samples)
+        start_time = time.time()
+        for _ in range(repeats):
+            model.predict(inputs, batch_size=num_samples)
+        print('%s: %.1f ms/batch' %
+              (conv_type, (time.time() - start_time) / repeats * 1000))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
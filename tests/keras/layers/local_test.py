@@ -1,8 +1,14 @@
+import time
+
 import pytest
+import numpy as np
+from numpy.testing import assert_allclose
 
 from keras.utils.test_utils import layer_test
 from keras.utils.test_utils import keras_test
 from keras.layers import local
+from keras.models import Sequential
+from keras import backend as K
 
 
 @keras_test
@@ -59,5 +65,78 @@ def test_locallyconnected_2d():
                    input_shape=(num_samples, stack_size, num_row, num_col))
 
 
+@keras_test
+@pytest.mark.parametrize('implementation', [2, 3])
+def test_locallyconnected_implementation(implementation):
+    if implementation == 3 and K.backend() == 'cntk':
+        # No sparse matmul in CNTK.
+        for layer_class in [local.LocallyConnected1D, local.LocallyConnected2D]:
+            with pytest.raises(ValueError):
+                layer_class(4, 3, implementation=implementation)
+        return
+
+    layer_test(local.LocallyConnected1D,
+               kwargs={'filters': 4,
+                       'kernel_size': 3,
+                       'strides': 2,
+                       'implementation': implementation},
+               input_shape=(2, 8, 5))
+
+    inputs = np.random.random((2, 8, 5))
+    outputs = []
+    for mode in [1, implementation]:
+        layer = local.LocallyConnected1D(4, 3, strides=2, implementation=mode,
+                                         input_shape=inputs.shape[1:])
+        model = Sequential([layer])
+        if outputs:
+            model.set_weights(weights)
+        weights = model.get_weights()
+        outputs.append(model.predict(inputs))
+    assert_allclose(outputs[1], outputs[0], atol=1e-5)
+
+    for data_format, input_shape in [('channels_last', (7, 6, 4)),
+                                     ('channels_first', (4, 7, 6))]:
+        inputs = np.random.random((2,) + input_shape)
+        outputs = []
+        for mode in [1, implementation]:
+            layer = local.LocallyConnected2D(3, (3, 2), strides=(2, 1),
+                                             data_format=data_format,
+                                             implementation=mode,
+                                             input_shape=input_shape)
+            model = Sequential([layer])
+            if outputs:
+                model.set_weights(weights)
+            weights = model.get_weights()
+            outputs.append(model.predict(inputs))
+        assert_allclose(outputs[1], outputs[0], atol=1e-5)
+
+
+def locallyconnected_benchmark(batch_size=32, input_shape=(32, 32, 3),
+                               filters=16, kernel_size=(3, 3), repeats=10):
+    """Reports the build and training step times of each
+    `LocallyConnected2D` implementation."""
+    x = np.random.random((batch_size,) + input_shape)
+    y = np.random.random((batch_size, input_shape[0] - kernel_size[0] + 1,
+                          input_shape[1] - kernel_size[1] + 1, filters))
+    for implementation in [1, 2, 3]:
+        if implementation == 3 and K.backend() == 'cntk':
+            continue
+        start_time = time.time()
+        layer = local.LocallyConnected2D(filters, kernel_size,
+                                         data_format='channels_last',
+                                         implementation=implementation,
+                                         input_shape=input_shape)
+        model = Sequential([layer])
+        model.compile('sgd', 'mse')
+        model.train_on_batch(x, y)
+        build_time = time.time() - start_time
+        start_time = time.time()
+        for _ in range(repeats):
+            model.train_on_batch(x, y)
+        print('implementation %d: build %.2f s, step %.1f ms' %
+              (implementation, build_time,
+               (time.time() - start_time) / repeats * 1000))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
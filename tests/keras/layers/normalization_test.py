@@ -246,5 +246,90 @@ def test_batchnorm_trainable():
     assert_allclose((input_4 - np.mean(input_4)) / np.std(input_4), out, atol=1e-3)
 
 
+def lrn_reference(x, alpha, k, beta, n):
+    """Numpy LRN over the axis 1, with the loop of sliced adds of the Caffe layer."""
+    half_n = n // 2
+    channels = x.shape[1]
+    x_sqr = np.zeros((x.shape[0], channels + n - 1) + x.shape[2:])
+    x_sqr[:, half_n:half_n + channels] = x ** 2
+    scale = k
+    for i in range(n):
+        scale = scale + alpha / n * x_sqr[:, i:i + channels]
+    return x / scale ** beta
+
+
+@keras_test
+@pytest.mark.skipif((K.backend() == 'cntk'),
+                    reason='No local_response_normalization in CNTK.')
+@pytest.mark.parametrize('data_format', ['channels_first', 'channels_last'])
+@pytest.mark.parametrize('n', [1, 4, 5])
+def test_lrn(data_format, n):
+    kwargs = {'alpha': 0.1, 'k': 2., 'beta': 0.75, 'n': n,
+              'data_format': data_format}
+    layer_test(normalization.LRN, kwargs=kwargs, input_shape=(2, 6, 3, 4))
+
+    x = np.random.random((2, 6, 3, 4)) * 10
+    model = Sequential([normalization.LRN(input_shape=x.shape[1:], **kwargs)])
+    if data_format == 'channels_first':
+        expected = lrn_reference(x, 0.1, 2., 0.75, n)
+    else:
+        expected = lrn_reference(np.moveaxis(x, -1, 1), 0.1, 2., 0.75, n)
+        expected = np.moveaxis(expected, 1, -1)
+    assert_allclose(model.predict(x), expected, rtol=1e-5)
+
+
+@keras_test
+@pytest.mark.skipif((K.backend() == 'cntk'),
+                    reason='No local_response_normalization in CNTK.')
+def test_lrn_legacy_config():
+    # Saved before `data_format`, by layers that normalized over the axis 1.
+    config = {'name': 'lrn', 'trainable': True,
+              'alpha': 0.1, 'k': 2., 'beta': 0.75, 'n': 4}
+    layer = normalization.LRN.from_config(dict(config))
+    assert layer.data_format == 'channels_first'
+
+    from keras.caffe.extra_layers import LRN2D
+    from keras.layers.googlenet_custom_layers import LRN
+    for layer_class in [LRN2D, LRN]:
+        assert layer_class(n=4).data_format == 'channels_first'
+        layer = layer_class.from_config(dict(config))
+        assert layer.data_format == 'channels_first'
+        x = np.random.random((2, 6, 3, 4)) * 10
+        model = Sequential([layer_class(input_shape=x.shape[1:], **config)])
+        assert_allclose(model.predict(x), lrn_reference(x, 0.1, 2., 0.75, 4),
+                        rtol=1e-5)
+
+
+def lrn_benchmark(batch_size=32, shape=(96, 55, 55), repeats=10):
+    """Compares `LRN` with the loop of sliced adds it replaces
+    (AlexNet norm1)."""
+    import time
+
+    def sliced_adds_lrn(x, alpha=1e-4, k=1, beta=0.75, n=5):
+        half_n = n // 2
+        channels = K.int_shape(x)[1]
+        x_sqr = K.spatial_3d_padding(K.expand_dims(K.square(x), 1),
+                                     ((half_n, n - 1 - half_n), (0, 0), (0, 0)),
+                                     data_format='channels_first')[:, 0]
+        scale = k
+        for i in range(n):
+            scale += alpha / n * x_sqr[:, i:i + channels]
+        return x / scale ** beta
+
+    x = np.random.random((batch_size,) + shape).astype(K.floatx())
+    inputs = K.placeholder(shape=(None,) + shape)
+    lrn = normalization.LRN(data_format='channels_first')
+    for name, output in [('sliced adds', sliced_adds_lrn(inputs)),
+                         ('LRN', lrn(inputs))]:
+        gradient = K.gradients(K.sum(output), [inputs])[0]
+        function = K.function([inputs], [output, gradient])
+        function([x])
+        start_time = time.time()
+        for _ in range(repeats):
+            function([x])
+        print('%s: %.1f ms/batch (forward+backward)' %
+              (name, (time.time() - start_time) / repeats * 1000))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
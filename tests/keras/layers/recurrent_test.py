@@ -1,3 +1,5 @@
+import time
+
 import pytest
 import numpy as np
 from numpy.testing import assert_allclose
@@ -897,5 +899,175 @@ def test_rnn_cell_identity_initializer(layer_class):
                           np.concatenate([np.identity(units)] * num_kernels, axis=1))
 
 
+@keras_test
+@pytest.mark.skipif((K.backend() == 'cntk'),
+                    reason='CNTK rnn has no extra output states.')
+@pytest.mark.parametrize('layer_class,context_shapes,attend_on_both', [
+    (recurrent.AttGRUCond, [(6, 5)], None),
+    (recurrent.AttConditionalGRUCond, [(6, 5)], None),
+    (recurrent.AttLSTMCond, [(6, 5)], None),
+    (recurrent.AttConditionalLSTMCond, [(6, 5)], None),
+    (recurrent.AttLSTMCond2Inputs, [(6, 5), (4, 3)], True),
+    (recurrent.AttLSTMCond2Inputs, [(6, 5), (3,)], False),
+    (recurrent.AttConditionalLSTMCond2Inputs, [(6, 5), (4, 3)], True),
+    (recurrent.AttConditionalLSTMCond2Inputs, [(6, 5), (3,)], False)
+])
+def test_attention_step_function(layer_class, context_shapes, attend_on_both):
+    state_below = Input(shape=(timesteps, embedding_dim))
+    contexts = [Input(shape=shape) for shape in context_shapes]
+    kwargs = {} if attend_on_both is None else {'attend_on_both': attend_on_both}
+    layer = layer_class(units, return_sequences=True,
+                        num_inputs=1 + len(contexts), **kwargs)
+    masked_state_below = Masking()(state_below)
+    model = Model([state_below] + contexts,
+                  layer([masked_state_below] + contexts))
+
+    state_below_np = np.random.random((num_samples, timesteps, embedding_dim))
+    contexts_np = [np.random.random((num_samples,) + shape)
+                   for shape in context_shapes]
+    contexts_np[0][:, -2:] = 0.  # Padded positions of the context
+    outputs = model.predict([state_below_np] + contexts_np)
+
+    cached_context = layer.preprocess_context(contexts_np)
+    step_function = layer.get_step_function()
+    states = [np.zeros((num_samples, units))
+              for _ in range(layer._num_recurrent_states)]
+    for t in range(timesteps):
+        step_outputs = step_function([state_below_np[:, t]] + states +
+                                     cached_context)
+        states = step_outputs[:layer._num_recurrent_states]
+        assert_allclose(states[0], outputs[:, t], atol=1e-5)
+        extra_outputs = step_outputs[layer._num_recurrent_states:]
+        for shape, ctx, alphas in zip(context_shapes, extra_outputs[::2],
+                                      extra_outputs[1::2]):
+            assert ctx.shape == (num_samples, shape[-1])
+            if len(shape) == 2:
+                assert alphas.shape == (num_samples, shape[0])
+
+
+@keras_test
+@pytest.mark.skipif((K.backend() == 'cntk'),
+                    reason='CNTK rnn has no extra output states.')
+@pytest.mark.parametrize('layer_class,num_contexts', [
+    (recurrent.AttGRUCond, 1),
+    (recurrent.AttConditionalGRUCond, 1),
+    (recurrent.AttLSTMCond, 1),
+    (recurrent.AttConditionalLSTMCond, 1),
+    (recurrent.AttLSTMCond2Inputs, 2),
+    (recurrent.AttConditionalLSTMCond2Inputs, 2)
+])
+def test_attention_fused_kernel(layer_class, num_contexts):
+    from keras.engine.saving import preprocess_weights_for_loading
+    context_shapes = [(6, 5), (4, 3)][:num_contexts]
+    state_below_np = np.random.random((num_samples, timesteps, embedding_dim))
+    contexts_np = [np.random.random((num_samples,) + shape)
+                   for shape in context_shapes]
+    contexts_np[0][:, -2:] = 0.  # Padded positions of the context
+
+    models = []
+    for implementation in [1, 2]:
+        state_below = Input(shape=(timesteps, embedding_dim))
+        contexts = [Input(shape=shape) for shape in context_shapes]
+        kwargs = {'attend_on_both': True} if num_contexts == 2 else {}
+        layer = layer_class(units, return_sequences=True,
+                            num_inputs=1 + num_contexts,
+                            implementation=implementation, **kwargs)
+        outputs = layer([Masking()(state_below)] + contexts)
+        models.append(Model([state_below] + contexts, outputs))
+    split_layer, fused_layer = models[0].layers[-1], models[1].layers[-1]
+    assert len(fused_layer.weights) == len(split_layer.weights) - num_contexts
+
+    split_weights = split_layer.get_weights()
+    fused_layer.set_weights(preprocess_weights_for_loading(fused_layer,
+                                                           split_weights))
+    expected = models[0].predict([state_below_np] + contexts_np)
+    assert_allclose(models[1].predict([state_below_np] + contexts_np), expected,
+                    atol=1e-5)
+
+    # Fused weights load back in the split layout.
+    converted = preprocess_weights_for_loading(split_layer,
+                                               fused_layer.get_weights())
+    for converted_weight, split_weight in zip(converted, split_weights):
+        assert_allclose(converted_weight, split_weight)
+
+
+@keras_test
+@pytest.mark.skipif((K.backend() == 'cntk'),
+                    reason='CNTK rnn has no extra output states.')
+@pytest.mark.parametrize('layer_class', [
+    recurrent.AttGRUCond,
+    recurrent.AttLSTMCond,
+    recurrent.AttConditionalLSTMCond
+])
+def test_attention_extra_variables(layer_class):
+    context_steps, context_dim = 6, 5
+    state_below_np = np.random.random((num_samples, timesteps, embedding_dim))
+    context_np = np.random.random((num_samples, context_steps, context_dim))
+
+    state_below = Input(shape=(timesteps, embedding_dim))
+    context = Input(shape=(context_steps, context_dim))
+    layer = layer_class(units, return_sequences=True,
+                        return_extra_variables=True, num_inputs=2)
+    outputs = layer([Masking()(state_below), context])
+    extra_outputs = K.function([state_below, context],
+                               outputs)([state_below_np, context_np])
+    assert extra_outputs[1].shape[-1] == context_dim
+    assert extra_outputs[2].shape[-1] == context_steps
+
+    # Without the extra variables, the attention is not accumulated over
+    # the timesteps.
+    lean_layer = layer_class(units, return_sequences=True,
+                             return_extra_variables=False, num_inputs=2)
+    lean_model = Model([state_below, context],
+                       lean_layer([Masking()(state_below), context]))
+    lean_layer.set_weights(layer.get_weights())
+    assert_allclose(lean_model.predict([state_below_np, context_np]),
+                    extra_outputs[0], atol=1e-5)
+
+
+class _PerStepMaskingAttLSTMCond(recurrent.AttLSTMCond):
+    """`AttLSTMCond` masking its contexts at every step, as it used to."""
+
+    def step(self, x, states):
+        pctx_, context, mask_context = states[7:10]
+        if K.ndim(mask_context) > 1:
+            pctx_ = K.cast(mask_context[:, :, None], K.dtype(pctx_)) * pctx_
+            context = K.cast(mask_context[:, :, None], K.dtype(context)) * context
+        states = list(states[:7]) + [pctx_, context] + list(states[9:])
+        return super(_PerStepMaskingAttLSTMCond, self).step(x, states)
+
+
+def attention_step_benchmark(batch_size=50, units=512, context_dim=512,
+                             num_steps=100):
+    """Reports the time per step of `AttLSTMCond` for several source lengths.
+
+    The context mask is applied once per sequence (when the context is
+    preprocessed), instead of at every step as it used to be.
+    """
+    print('####### AttLSTMCond step time (mask per step / mask once)')
+    for context_steps in [10, 50, 100, 200]:
+        context_np = np.random.random((batch_size, context_steps, context_dim))
+        context_np[:, context_steps // 2:] = 0.  # Padded half of the context
+        x = np.random.random((batch_size, units))
+        step_times = []
+        for layer_class in [_PerStepMaskingAttLSTMCond, recurrent.AttLSTMCond]:
+            state_below = Input(shape=(None, units))
+            context = Input(shape=(context_steps, context_dim))
+            layer = layer_class(units, return_sequences=True, num_inputs=2)
+            Model([state_below, context],
+                  layer([Masking()(state_below), context]))
+
+            cached_context = layer.preprocess_context(context_np)
+            step_function = layer.get_step_function()
+            states = [np.zeros((batch_size, units)), np.zeros((batch_size, units))]
+            step_function([x] + states + cached_context)  # Warm-up
+            start_time = time.time()
+            for _ in range(num_steps):
+                states = step_function([x] + states + cached_context)[:2]
+            step_times.append((time.time() - start_time) / num_steps)
+        print('source length %d: %.2f / %.2f ms/step' %
+              (context_steps, step_times[0] * 1000, step_times[1] * 1000))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -377,6 +377,60 @@ def test_Bidirectional_merged_value(merge_mode):
         assert_allclose(state_birnn, state_inner, atol=1e-5)
 
 
+@keras_test
+@pytest.mark.skipif((K.backend() == 'cntk'),
+                    reason='Fused Bidirectional not supported in CNTK.')
+@pytest.mark.parametrize('merge_mode', ['sum', 'concat', None])
+@pytest.mark.parametrize('rnn', [layers.SimpleRNN, layers.GRU, layers.LSTM])
+def test_Bidirectional_fused(rnn, merge_mode):
+    samples = 3
+    dim = 4
+    timesteps = 5
+    units = 3
+    x = np.random.rand(samples, timesteps, dim)
+    # padded sequences of different lengths
+    x[0, 3:] = 0
+    x[1, 1:] = 0
+
+    for return_sequences in [True, False]:
+        inputs = Input((timesteps, dim))
+        masked_inputs = layers.Masking()(inputs)
+        outputs = []
+        for fused in [False, True]:
+            layer = wrappers.Bidirectional(rnn(units,
+                                               return_sequences=return_sequences,
+                                               return_state=True),
+                                           merge_mode=merge_mode,
+                                           fused=fused)
+            f = K.function([inputs], layer(masked_inputs))
+            if fused:
+                layer.set_weights(weights)
+            weights = layer.get_weights()
+            outputs.append(f([x]))
+        assert len(outputs[1]) == len(outputs[0])
+        for y_fused, y in zip(outputs[1], outputs[0]):
+            assert_allclose(y_fused, y, atol=1e-5)
+
+    # training and serialization
+    inputs = Input((timesteps, dim))
+    outputs = wrappers.Bidirectional(rnn(units, return_sequences=True),
+                                     merge_mode=merge_mode,
+                                     fused=True)(inputs)
+    if merge_mode is not None:
+        outputs = wrappers.Bidirectional(rnn(units, go_backwards=True),
+                                         merge_mode=merge_mode,
+                                         fused=True)(outputs)
+    model = Model(inputs, outputs)
+    if merge_mode is not None:
+        model.compile(loss='mse', optimizer='sgd')
+        model.fit(x, model.predict(x), epochs=1, batch_size=2)
+    model = model_from_json(model.to_json())
+    assert model.layers[1].fused
+
+    with pytest.raises(ValueError):
+        wrappers.Bidirectional(layers.Dense(units), fused=True)
+
+
 @keras_test
 @pytest.mark.skipif(K.backend() == 'theano', reason='Not supported.')
 @pytest.mark.parametrize('merge_mode', ['sum', 'concat', None])
@@ -139,6 +139,50 @@ def test_clipvalue():
     _test_optimizer(sgd)
 
 
+@keras_test
+@pytest.mark.parametrize('optimizer_factory', [
+    lambda shapes: optimizers.SGD(lr=0.1, momentum=0.9, nesterov=True),
+    lambda shapes: optimizers.Adam(decay=1e-3),
+    lambda shapes: optimizers.Nadam(),
+    lambda shapes: optimizers.RMSprop(clipnorm=0.1),
+    lambda shapes: optimizers.PAS(shapes),
+    lambda shapes: optimizers.PAS2(shapes),
+])
+def test_accumulate_steps(optimizer_factory):
+    x_train, y_train = get_test_data()
+    x_train, y_train = x_train[:32], y_train[:32]
+
+    initial_weights = []
+
+    def fit(batch_size, accumulate_steps):
+        model = Sequential()
+        model.add(Dense(4, input_shape=(x_train.shape[1],), activation='tanh'))
+        model.add(Dense(y_train.shape[1]))
+        if initial_weights:
+            model.set_weights(initial_weights)
+        else:
+            initial_weights.extend(model.get_weights())
+        shapes = [('pas_weight_%d' % i, K.int_shape(w))
+                  for i, w in enumerate(model.trainable_weights)]
+        optimizer = optimizer_factory(shapes)
+        model.compile(loss='mse', optimizer=optimizer,
+                      accumulate_steps=accumulate_steps)
+        model.fit(x_train, y_train, batch_size=batch_size, epochs=2,
+                  shuffle=False, verbose=0)
+        return model, optimizer
+
+    model, _ = fit(batch_size=8, accumulate_steps=1)
+    accumulated_model, optimizer = fit(batch_size=2, accumulate_steps=4)
+    for weight, accumulated_weight in zip(model.get_weights(),
+                                          accumulated_model.get_weights()):
+        assert_allclose(accumulated_weight, weight, rtol=1e-4, atol=1e-6)
+    if hasattr(optimizer, 'iterations'):
+        assert K.get_value(optimizer.iterations) == 8
+
+    with pytest.raises(ValueError):
+        model.compile(loss='mse', optimizer='sgd', accumulate_steps=0)
+
+
 @keras_test
 @pytest.mark.skipif((K.backend() != 'tensorflow'),
                     reason='Requires TensorFlow backend')
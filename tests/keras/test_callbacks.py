@@ -972,6 +972,42 @@ def test_LambdaCallback():
     assert not p.is_alive()
 
 
+@keras_test
+def test_CallbackList_dispatch(capsys):
+    class EpochCounter(callbacks.Callback):
+        def __init__(self):
+            self.epochs = 0
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.epochs += 1
+
+    batches = []
+    counter = EpochCounter()
+    lambda_callback = callbacks.LambdaCallback(
+        on_batch_end=lambda batch, logs: batches.append(batch))
+    callback_list = callbacks.CallbackList([counter])
+    # Hooks which are not overridden are skipped
+    assert callback_list._hook('on_batch_end') == []
+    assert len(callback_list._hook('on_epoch_end')) == 1
+    callback_list.append(lambda_callback)
+    assert len(callback_list._hook('on_batch_end')) == 1
+
+    model = Sequential()
+    model.add(Dense(num_classes, input_dim=input_dim, activation='softmax'))
+    model.compile(loss='categorical_crossentropy', optimizer='sgd')
+    X_train = np.random.random((train_samples, input_dim))
+    y_train = np_utils.to_categorical(np.random.randint(num_classes,
+                                                        size=train_samples))
+    model.fit(X_train, y_train, batch_size=batch_size, epochs=2, verbose=0,
+              callbacks=[counter, lambda_callback], profile_callbacks=True)
+    assert counter.epochs == 2
+    assert len(batches) == 2 * train_samples // batch_size
+    out, _ = capsys.readouterr()
+    assert 'Time spent in callbacks (8 batches)' in out
+    for class_name in ['BaseLogger', 'EpochCounter', 'LambdaCallback', 'History']:
+        assert class_name in out
+
+
 @keras_test
 def test_TensorBoard_with_ReduceLROnPlateau(tmpdir):
     import shutil
@@ -1054,5 +1090,27 @@ def tests_RemoteMonitorWithJsonPayload():
                   validation_data=(X_test, y_test), callbacks=cbks, epochs=1)
 
 
+def callback_dispatch_benchmark(num_batches=100000):
+    """Times the dispatch of the batch hooks of the callbacks used by `fit`."""
+    import time
+
+    cbks = [callbacks.BaseLogger(), callbacks.History(),
+            callbacks.EarlyStopping(), callbacks.ModelCheckpoint('unused.h5')]
+    for profile in [False, True]:
+        callback_list = callbacks.CallbackList(cbks, profile=profile)
+        callback_list.set_params({'metrics': ['loss']})
+        callback_list.on_train_begin()
+        callback_list.on_epoch_begin(0)
+        logs = {'batch': 0, 'size': 32, 'loss': 0.5}
+        start_time = time.time()
+        for batch in range(num_batches):
+            callback_list.on_batch_begin(batch, logs)
+            callback_list.on_batch_end(batch, logs)
+        print('profile=%s: %.2f us/batch' %
+              (profile, (time.time() - start_time) / num_batches * 1e6))
+        if profile:
+            callback_list.print_timings()
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
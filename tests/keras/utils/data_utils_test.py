@@ -16,6 +16,7 @@ from six.moves.urllib.request import pathname2url
 from keras.utils import GeneratorEnqueuer
 from keras.utils import OrderedEnqueuer
 from keras.utils import Sequence
+from keras.utils import BucketedSequence
 from keras.utils.data_utils import _hash_file
 from keras.utils.data_utils import get_file
 from keras.utils.data_utils import validate_file
@@ -384,5 +385,78 @@ def test_finite_generator_enqueuer_processes():
     enqueuer.stop()
 
 
+def random_sequences(num_samples, max_length, low=1, high=20):
+    lengths = np.random.randint(1, max_length + 1, size=num_samples)
+    return [list(np.random.randint(low, high, size=length)) for length in lengths]
+
+
+def test_bucketed_sequence():
+    np.random.seed(1337)
+    x = random_sequences(100, 30)
+    y = np.arange(100)
+    sequence = BucketedSequence(x, y, batch_size=8, bucket_boundaries=[5, 10, 20])
+    for epoch in range(2):
+        seen = []
+        for i in range(len(sequence)):
+            batch_x, batch_y = sequence[i]
+            assert len(batch_x) == len(batch_y) <= 8
+            lengths = [len(x[j]) for j in batch_y]
+            # Padded to the longest sequence of the batch, from a single bucket.
+            assert batch_x.shape == (len(batch_y), max(lengths))
+            assert len(set(np.searchsorted([5, 10, 20], lengths))) == 1
+            for row, j in zip(batch_x, batch_y):
+                assert list(row[:len(x[j])]) == x[j]
+                assert not np.any(row[len(x[j]):])
+            seen.extend(batch_y)
+        assert sorted(seen) == list(range(100))
+        sequence.on_epoch_end()
+
+    num_elements = sum(len(sequence) for sequence in x)
+    num_padded_elements = sum(sequence[i][0].size for i in range(len(sequence)))
+    assert np.isclose(sequence.padding_efficiency,
+                      num_elements / float(num_padded_elements))
+
+
+def test_bucketed_sequence_dict_inputs_and_enqueuer():
+    np.random.seed(1337)
+    x_src = random_sequences(50, 12)
+    x_trg = random_sequences(50, 15)
+    sample_weight = np.random.random(50)
+    sequence = BucketedSequence({'source': x_src, 'target': x_trg}, x_trg,
+                                batch_size=4, bucket_boundaries=[4, 8],
+                                sample_weight=sample_weight,
+                                padding='pre', shuffle=False)
+    batch_x, batch_y, batch_weights = sequence[0]
+    assert sorted(batch_x) == ['source', 'target']
+    assert batch_x['target'].shape == batch_y.shape
+    assert batch_weights.shape == (len(batch_y),)
+
+    enqueuer = OrderedEnqueuer(sequence, use_multiprocessing=False)
+    enqueuer.start(3, 10)
+    gen_output = enqueuer.get()
+    for i in range(2 * len(sequence)):
+        batch = next(gen_output)
+        expected = sequence[i % len(sequence)]
+        np.testing.assert_array_equal(batch[0]['source'], expected[0]['source'])
+    enqueuer.stop()
+
+    with pytest.raises(ValueError):
+        BucketedSequence(x_src, x_trg[:10], batch_size=4, bucket_boundaries=[4])
+
+
+def test_bucketed_sequence_fit_generator(capsys):
+    from keras.models import Sequential
+    from keras.layers import Embedding, LSTM, Dense
+    np.random.seed(1337)
+    x = random_sequences(40, 10)
+    y = np.random.random((40, 1))
+    model = Sequential([Embedding(20, 4, mask_zero=True), LSTM(3), Dense(1)])
+    model.compile('sgd', 'mse')
+    sequence = BucketedSequence(x, y, batch_size=8, bucket_boundaries=[3, 6],
+                                verbose=1)
+    model.fit_generator(sequence, epochs=2, verbose=0)
+    assert 'Padding efficiency' in capsys.readouterr()[0]
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,181 @@
+import itertools
+import time
+
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from keras.utils.decoding import beam_search
+from keras.utils.decoding import get_attention_step_function
+from keras.layers import recurrent
+from keras.layers import Masking
+from keras.engine import Input
+from keras.models import Model
+from keras.utils.test_utils import keras_test
+from keras import backend as K
+
+
+def markov_step_function(transitions):
+    """Step function of a first-order Markov model over the words."""
+    log_transitions = np.log(transitions)
+
+    def step_function(prev_words, states, constants):
+        offsets = constants[0][:, 0]
+        log_probs = log_transitions[prev_words] + offsets[:, None]
+        return log_probs, [states[0] + 1]
+
+    return step_function
+
+
+def sequence_log_prob(transitions, sequence, start_index):
+    prev_words = [start_index] + list(sequence[:-1])
+    return np.sum(np.log(transitions[prev_words, sequence]))
+
+
+def random_transitions(vocabulary_size):
+    transitions = np.random.random((vocabulary_size, vocabulary_size)) + 0.1
+    return transitions / np.sum(transitions, axis=1, keepdims=True)
+
+
+def test_beam_search_finds_best_sequence():
+    np.random.seed(1337)
+    vocabulary_size, max_length, num_samples = 4, 3, 3
+    end_index = 0
+    transitions = random_transitions(vocabulary_size)
+    step_function = markov_step_function(transitions)
+    states = [np.zeros((num_samples, 1))]
+    constants = [np.zeros((num_samples, 1))]
+
+    # A beam as large as the search space is an exhaustive search.
+    sequences, scores = beam_search(step_function, states,
+                                    start_index=1, end_index=end_index,
+                                    constants=constants,
+                                    beam_size=vocabulary_size ** max_length,
+                                    max_length=max_length)
+    best_score = -np.inf
+    for length in range(1, max_length + 1):
+        for sequence in itertools.product(range(vocabulary_size), repeat=length):
+            if end_index in sequence[:-1]:
+                continue
+            if length < max_length and sequence[-1] != end_index:
+                continue
+            best_score = max(best_score,
+                             sequence_log_prob(transitions, sequence, start_index=1))
+    assert len(sequences) == num_samples
+    for sequence, score in zip(sequences, scores):
+        assert_allclose(score, best_score, rtol=1e-6)
+        assert_allclose(sequence_log_prob(transitions, sequence, start_index=1),
+                        best_score, rtol=1e-6)
+
+
+def test_beam_search_greedy():
+    np.random.seed(1337)
+    vocabulary_size, max_length = 6, 5
+    transitions = random_transitions(vocabulary_size)
+    step_function = markov_step_function(transitions)
+    states = [np.zeros((1, 1))]
+    constants = [np.zeros((1, 1))]
+    sequences, _ = beam_search(step_function, states,
+                               start_index=0, end_index=-1,
+                               constants=constants,
+                               beam_size=1, max_length=max_length)
+    greedy = []
+    prev_word = 0
+    for _ in range(max_length):
+        prev_word = np.argmax(transitions[prev_word])
+        greedy.append(prev_word)
+    assert list(sequences[0]) == greedy
+
+
+def test_beam_search_states_and_constants():
+    np.random.seed(1337)
+    vocabulary_size, num_samples, beam_size = 5, 4, 3
+    transitions = random_transitions(vocabulary_size)
+    step_function = markov_step_function(transitions)
+    # A large offset in the constants of a sample must not leak to the others.
+    constants = [np.array([[0.], [-100.], [0.], [-100.]])]
+    sequences, scores = beam_search(step_function, [np.zeros((num_samples, 1))],
+                                    start_index=0, end_index=2,
+                                    constants=constants,
+                                    beam_size=beam_size, max_length=4,
+                                    return_n_best=True)
+    for i in range(num_samples):
+        assert 0 < len(sequences[i]) <= beam_size
+        assert scores[i] == sorted(scores[i], reverse=True)
+        for sequence, score in zip(sequences[i], scores[i]):
+            expected = (sequence_log_prob(transitions, sequence, start_index=0) +
+                        constants[0][i, 0] * len(sequence))
+            assert_allclose(score, expected, rtol=1e-6)
+
+
+def test_beam_search_length_normalization():
+    np.random.seed(1337)
+    transitions = random_transitions(5)
+    step_function = markov_step_function(transitions)
+    sequences, scores = beam_search(step_function, [np.zeros((2, 1))],
+                                    start_index=0, end_index=3,
+                                    constants=[np.zeros((2, 1))],
+                                    beam_size=4, max_length=6,
+                                    length_normalization=1.)
+    for sequence, score in zip(sequences, scores):
+        assert_allclose(score * len(sequence),
+                        sequence_log_prob(transitions, sequence, start_index=0),
+                        rtol=1e-6)
+
+
+@keras_test
+@pytest.mark.skipif((K.backend() == 'cntk'),
+                    reason='CNTK rnn has no extra output states.')
+def test_attention_step_function():
+    num_samples, context_steps, context_dim = 3, 4, 5
+    embedding_dim, units, vocabulary_size = 4, 3, 7
+    state_below = Input(shape=(None, embedding_dim))
+    context = Input(shape=(context_steps, context_dim))
+    layer = recurrent.AttLSTMCond(units, return_sequences=True, num_inputs=2)
+    Model([state_below, context], layer([Masking()(state_below), context]))
+
+    embedding_weights = np.random.random((vocabulary_size, embedding_dim))
+    output_weights = np.random.random((units, vocabulary_size))
+
+    def output_function(prev_word_emb, decoder_outputs):
+        logits = np.dot(decoder_outputs[0], output_weights)
+        probs = np.exp(logits - np.max(logits, axis=1, keepdims=True))
+        return probs / np.sum(probs, axis=1, keepdims=True)
+
+    step_function = get_attention_step_function(
+        layer,
+        embedding_function=lambda words: embedding_weights[words],
+        output_function=output_function)
+    context_np = np.random.random((num_samples, context_steps, context_dim))
+    states = [np.zeros((num_samples, units)), np.zeros((num_samples, units))]
+    sequences, scores = beam_search(step_function, states,
+                                    start_index=0, end_index=1,
+                                    constants=layer.preprocess_context(context_np),
+                                    beam_size=3, max_length=5)
+    assert len(sequences) == num_samples
+    assert all(0 < len(sequence) <= 5 for sequence in sequences)
+    assert all(np.isfinite(score) for score in scores)
+
+
+def beam_search_benchmark(num_samples=500, beam_size=6, vocabulary_size=30000,
+                          max_length=30):
+    """Reports the decoding throughput of `beam_search` in sentences/second."""
+    print('####### beam_search throughput')
+    transitions = random_transitions(vocabulary_size // 100)
+    transitions = np.tile(transitions, (100, 100)) / 100.
+
+    for batch_size in [1, 10, 100]:
+        step_function = markov_step_function(transitions)
+        start_time = time.time()
+        for start in range(0, num_samples, batch_size):
+            beam_search(step_function, [np.zeros((batch_size, 1))],
+                        start_index=0, end_index=0,
+                        constants=[np.zeros((batch_size, 1))],
+                        beam_size=beam_size, max_length=max_length)
+        total_time = time.time() - start_time
+        print('batch size %d: %.1f sentences/s' %
+              (batch_size, num_samples / total_time))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
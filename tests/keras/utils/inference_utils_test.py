@@ -0,0 +1,234 @@
+import time
+
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from keras import backend as K
+from keras.layers import Input, Dense, Conv2D, DepthwiseConv2D, Activation
+from keras.layers import BatchNormalization, Scale, Flatten, Add
+from keras.layers import Dropout, SpatialDropout1D, GaussianNoise, RemoveMask
+from keras.layers import Reshape, Permute, Concatenate, Embedding
+from keras.layers import recurrent
+from keras.layers.quantized import quantize_weights
+from keras.models import Model, Sequential, save_model, load_model
+from keras.utils.inference_utils import fold_batch_normalization
+from keras.utils.inference_utils import optimize_for_inference
+from keras.utils.inference_utils import quantize_model
+from keras.utils.test_utils import keras_test
+
+
+def _randomize_normalization(model):
+    """Gives random statistics and affine weights to the normalization layers."""
+    for layer in model.layers:
+        if isinstance(layer, (BatchNormalization, Scale)):
+            weights = [np.random.uniform(0.5, 1.5, w.shape)
+                       for w in layer.get_weights()]
+            layer.set_weights(weights)
+
+
+def _count(model, layer_class):
+    return len([layer for layer in model.layers if isinstance(layer, layer_class)])
+
+
+@keras_test
+@pytest.mark.parametrize('data_format', ['channels_first', 'channels_last'])
+def test_fold_batch_normalization(data_format):
+    channel_axis = 1 if data_format == 'channels_first' else -1
+    if data_format == 'channels_first':
+        input_shape = (3, 8, 8)
+    else:
+        input_shape = (8, 8, 3)
+
+    inputs = Input(input_shape)
+    x = Conv2D(4, (3, 3), data_format=data_format)(inputs)
+    x = BatchNormalization(axis=channel_axis)(x)
+    x = Activation('relu')(x)
+    # Caffe-style BatchNormalization + Scale pair after a conv without bias
+    x = Conv2D(4, (3, 3), use_bias=False, data_format=data_format)(x)
+    x = BatchNormalization(axis=channel_axis, center=False, scale=False)(x)
+    x = Scale(axis=channel_axis)(x)
+    y = DepthwiseConv2D((3, 3), depth_multiplier=2, padding='same',
+                        data_format=data_format)(x)
+    y = BatchNormalization(axis=channel_axis)(y)
+    # not foldable: the conv output is used twice
+    z = Conv2D(8, (1, 1), data_format=data_format)(x)
+    y = Add()([y, BatchNormalization(axis=channel_axis)(z)])
+    # not foldable: non-linear activation
+    y = Conv2D(2, (1, 1), activation='relu', data_format=data_format)(y)
+    y = BatchNormalization(axis=channel_axis)(y)
+    y = Flatten()(y)
+    y = Dense(3)(y)
+    outputs = BatchNormalization()(y)
+    model = Model(inputs, [outputs, z])
+    _randomize_normalization(model)
+
+    folded = fold_batch_normalization(model)
+    assert _count(folded, BatchNormalization) == 2
+    assert _count(folded, Scale) == 0
+    x = np.random.random((4,) + input_shape)
+    for y_folded, y in zip(folded.predict(x), model.predict(x)):
+        assert_allclose(y_folded, y, rtol=1e-4, atol=1e-4)
+    # the original model is unchanged
+    assert _count(model, BatchNormalization) == 6
+
+
+@keras_test
+def test_fold_batch_normalization_sequential():
+    model = Sequential([Dense(5, use_bias=False, input_shape=(4,)),
+                        BatchNormalization(),
+                        Activation('tanh'),
+                        Dense(3),
+                        BatchNormalization()])
+    _randomize_normalization(model)
+    folded = fold_batch_normalization(model)
+    assert _count(folded, BatchNormalization) == 0
+    x = np.random.random((6, 4))
+    assert_allclose(folded.predict(x), model.predict(x), rtol=1e-4, atol=1e-5)
+
+
+@keras_test
+def test_optimize_for_inference():
+    inputs = Input((6, 4))
+    x = GaussianNoise(0.5)(inputs)
+    x = SpatialDropout1D(0.5)(x)
+    x = Dense(8)(x)
+    x = Dense(3)(x)
+    x = RemoveMask()(x)
+    x = Activation('linear')(x)
+    x = Permute((2, 1))(x)
+    x = Permute((2, 1))(x)
+    x = Reshape((3, 6))(x)
+    x = Reshape((18,))(x)
+    x = Dropout(0.5)(x)
+    # not merged: the first Dense is a bottleneck
+    y = Dense(2)(x)
+    y = Dense(20, activation='tanh')(y)
+    # not merged: the output of the first Dense is used twice
+    z = Dense(5)(x)
+    z = Concatenate()([Dense(4)(z), z, Reshape((18,))(Reshape((6, 3))(x))])
+    x = BatchNormalization()(Dense(7)(z))
+    model = Model(inputs, [y, x])
+    _randomize_normalization(model)
+
+    optimized = optimize_for_inference(model)
+    class_names = [layer.__class__.__name__ for layer in optimized.layers]
+    assert class_names.count('Dense') == 6
+    assert class_names.count('Reshape') == 1
+    for class_name in ['GaussianNoise', 'SpatialDropout1D', 'Dropout', 'RemoveMask',
+                       'Activation', 'Permute', 'BatchNormalization']:
+        assert class_name not in class_names
+    x = np.random.random((3, 6, 4))
+    for y_optimized, y in zip(optimized.predict(x), model.predict(x)):
+        assert_allclose(y_optimized, y, rtol=1e-4, atol=1e-5)
+
+    # Monte-Carlo dropout is kept
+    inputs = Input((4,))
+    model = Model(inputs, Dense(2)(Dropout(0.5)(inputs, training=True)))
+    optimized = optimize_for_inference(model)
+    assert any(isinstance(layer, Dropout) for layer in optimized.layers)
+
+
+def _attention_model(vocabulary_size=20, units=8, embedding_dim=6,
+                     context_steps=5, context_dim=4):
+    words = Input(shape=(None,), dtype='int32')
+    context = Input(shape=(context_steps, context_dim))
+    state_below = Embedding(vocabulary_size, embedding_dim, mask_zero=True)(words)
+    x = recurrent.AttLSTMCond(units, return_sequences=True,
+                              num_inputs=2)([state_below, context])
+    outputs = Dense(vocabulary_size, activation='softmax')(x)
+    return Model([words, context], outputs)
+
+
+@keras_test
+@pytest.mark.skipif((K.backend() == 'cntk'),
+                    reason='Attention RNNs not supported in CNTK.')
+def test_quantize_model(tmpdir):
+    weights = np.random.uniform(-1, 1, (6, 4))
+    weights[:, 2] = 0.
+    quantized, scale = quantize_weights(weights)
+    assert quantized.dtype == np.int8
+    assert scale.shape == (4,)
+    assert np.abs(quantized).max() == 127
+    assert_allclose(quantized * scale, weights, atol=np.max(scale) / 2 + 1e-7)
+
+    model = _attention_model()
+    words = np.random.randint(1, 20, (3, 7))
+    words[0, 5:] = 0
+    x = [words, np.random.random((3, 5, 4))]
+
+    quantized_model = quantize_model(model)
+    class_names = [layer.__class__.__name__ for layer in quantized_model.layers]
+    for class_name in ['QuantizedEmbedding', 'QuantizedAttLSTMCond',
+                       'QuantizedDense']:
+        assert class_name in class_names
+    for layer in quantized_model.layers:
+        if layer.__class__.__name__.startswith('Quantized'):
+            assert any(K.dtype(w) == 'int8' for w in layer.weights)
+    y = model.predict(x)
+    assert_allclose(quantized_model.predict(x), y, atol=2e-2)
+
+    filename = str(tmpdir / 'quantized.h5')
+    save_model(quantized_model, filename)
+    loaded_model = load_model(filename)
+    for w, loaded_w in zip(quantized_model.get_weights(),
+                           loaded_model.get_weights()):
+        assert loaded_w.dtype == w.dtype
+    assert_allclose(loaded_model.predict(x), quantized_model.predict(x),
+                    atol=1e-6)
+
+    # Only the given layers are quantized
+    partial_model = quantize_model(model, layer_names=[model.layers[-1].name])
+    class_names = [layer.__class__.__name__ for layer in partial_model.layers]
+    assert class_names.count('QuantizedDense') == 1
+    assert 'QuantizedAttLSTMCond' not in class_names
+
+    # Variable-length source context (scalar attention bias)
+    model = _attention_model(context_steps=None)
+    quantized_model = quantize_model(model)
+    for context_steps in [5, 9]:
+        x = [words, np.random.random((3, context_steps, 4))]
+        assert_allclose(quantized_model.predict(x), model.predict(x),
+                        atol=2e-2)
+
+
+def quantize_model_benchmark(units=512, vocabulary_size=30000, batch_size=50):
+    """Reports the size and prediction error of an attention model
+    once quantized."""
+    model = _attention_model(vocabulary_size=vocabulary_size, units=units,
+                             embedding_dim=units, context_steps=20,
+                             context_dim=units)
+    quantized_model = quantize_model(model)
+    x = [np.random.randint(1, vocabulary_size, (batch_size, 30)),
+         np.random.random((batch_size, 20, units))]
+    for name, m in [('float', model), ('int8', quantized_model)]:
+        size = sum(w.nbytes for w in m.get_weights())
+        print('%s model: %.1f MB' % (name, size / 2. ** 20))
+    y, y_quantized = model.predict(x), quantized_model.predict(x)
+    print('max abs difference of the probabilities: %.2e' %
+          np.abs(y_quantized - y).max())
+    print('same most likely word: %.1f%%' %
+          (100. * np.mean(y_quantized.argmax(-1) == y.argmax(-1))))
+
+
+def fold_batch_normalization_benchmark(batch_size=16, repeats=10):
+    """Compares the inference time of ResNet50 before and after folding."""
+    from keras.applications import ResNet50
+
+    model = ResNet50(weights=None)
+    _randomize_normalization(model)
+    folded = fold_batch_normalization(model)
+    x = np.random.random((batch_size,) + model.input_shape[1:])
+    difference = np.abs(folded.predict(x) - model.predict(x)).max()
+    print('max abs difference: %.2e' % difference)
+    for name, m in [('ResNet50', model), ('folded ResNet50', folded)]:
+        m.predict(x, batch_size=batch_size)
+        start_time = time.time()
+        for _ in range(repeats):
+            m.predict(x, batch_size=batch_size)
+        print('%s: %d layers, %.1f ms/batch' %
+              (name, len(m.layers), (time.time() - start_time) / repeats * 1000))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -72,8 +72,11 @@ def test_io_utils(in_tmpdir):
 
     model.compile(loss='binary_crossentropy', optimizer='sgd')
 
-    # Note: you have to use shuffle='batch' or False with HDF5Matrix
+    # Note: you have to use shuffle='batch', 'block' or False with HDF5Matrix
     model.fit(X_train, y_train, batch_size=32, shuffle='batch', verbose=False)
+    model.fit(X_train, y_train, batch_size=32, shuffle='block', verbose=False)
+    model.fit(X_train, y_train, batch_size=32, shuffle=('block', 64, 4),
+              verbose=False)
     # test that evalutation and prediction don't crash and
     # return reasonable results
     out_pred = model.predict(X_test, batch_size=32, verbose=False)
@@ -134,5 +137,35 @@ def test_ask_to_proceed_with_overwrite():
         assert not ask_to_proceed_with_overwrite('/tmp/not_exists')
 
 
+def shuffle_benchmark(num_samples=100000, input_dim=1000, batch_size=64):
+    """Reports the training throughput of the shuffling modes.
+
+    The data are read from memory and from an HDF5 file
+    (where `shuffle=True` is not supported).
+    """
+    import tempfile
+    import time
+    h5_path = os.path.join(tempfile.mkdtemp(), 'shuffle_benchmark.h5')
+    x = np.random.random((num_samples, input_dim)).astype('float32')
+    y = np.random.random((num_samples, 1)).astype('float32')
+    with h5py.File(h5_path, 'w') as f:
+        f.create_dataset('x', data=x)
+        f.create_dataset('y', data=y)
+    model = Sequential([Dense(1, input_shape=(input_dim,))])
+    model.compile(loss='mse', optimizer='sgd')
+    data = [('memory', x, y),
+            ('HDF5', HDF5Matrix(h5_path, 'x'), HDF5Matrix(h5_path, 'y'))]
+    for name, x_data, y_data in data:
+        for shuffle in [False, True, 'batch', 'block', ('block', 8 * batch_size, 4)]:
+            if name == 'HDF5' and shuffle is True:
+                continue
+            start_time = time.time()
+            model.fit(x_data, y_data, batch_size=batch_size, shuffle=shuffle,
+                      verbose=0)
+            print('%s, shuffle=%s: %d samples/s' %
+                  (name, shuffle, num_samples / (time.time() - start_time)))
+    os.remove(h5_path)
+
+
 if __name__ == '__main__':
     pytest.main([__file__])